@@ -7,12 +7,38 @@ from fastapi.staticfiles import StaticFiles
 
 from src.api.v1 import api_router
 from src.core.database import init_db
+from src.services.answer_buffer import answer_buffer
+from src.services.attempt_sweeper import attempt_sweeper
+from src.services.generation_jobs import generation_jobs
+from src.services.quiz_pool import generated_quiz_pool
+from src.helpers.llm import llm_client
+from src.helpers.rank_index import leaderboard_ranks
+from src.helpers.leaderboard_snapshot import leaderboard_snapshots
+from src.helpers.password import PasswordHandler
+from src.services.quiz import QuizService
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await init_db()
+    # Квизы, созданные до материализованных агрегатов, досчитываем один раз
+    await QuizService().rebuild_quiz_stats(only_missing=True)
+    await answer_buffer.start()
+    await leaderboard_ranks.start()
+    await leaderboard_snapshots.start()
+    await attempt_sweeper.start()
+    await llm_client.start()
+    await generation_jobs.start()
+    await generated_quiz_pool.start()
     yield
+    await generated_quiz_pool.stop()
+    await generation_jobs.stop()
+    await llm_client.stop()
+    await attempt_sweeper.stop()
+    await leaderboard_snapshots.stop()
+    await leaderboard_ranks.stop()
+    await answer_buffer.stop()
+    PasswordHandler.shutdown()
 
 
 def make_app():
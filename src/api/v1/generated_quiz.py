@@ -1,10 +1,13 @@
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import List
+from src.core.settings import settings
 from src.services.generated_quiz import QuizGeneratorService
+from src.services.generation_jobs import generation_jobs, job_to_dict
 from src.schemas.req.generated_quiz import QuizGenerationRequest, UserAnswerRequest
 from src.models.user_answer import AnswerCreate, UserAnswer
-from src.core.auth_middleware import get_current_user
+from src.core.auth_middleware import Principal, get_current_user
 from src.schemas.req.quiz import QuizCreateDTO, QuizAttemptDTO, QuestionDTO
 from src.services.quiz import QuizService
 from src.models.quiz import Quiz
@@ -14,13 +17,37 @@ from src.models.enums import QuizSubject
 generated_quiz_router = APIRouter()
 
 
-@generated_quiz_router.post('/')
+@generated_quiz_router.post('/', status_code=202)
 async def generate_quiz(
     user_prompt:QuizGenerationRequest,
+    principal: Principal = Depends(get_current_user),
+):
+    """Поставить генерацию квиза в очередь; статус - GET /jobs/{job_id}"""
+    job = await generation_jobs.enqueue(principal.user_id, user_prompt.user_prompt)
+    return job_to_dict(job)
+
+@generated_quiz_router.get('/jobs/{job_id}')
+async def get_generation_job(
+    job_id: PydanticObjectId,
+    wait: float = Query(0, ge=0, le=settings.GENERATION_LONG_POLL_MAX),
+    principal: Principal = Depends(get_current_user),
+):
+    """Статус задачи генерации; wait > 0 - ждать завершения до wait секунд (long-poll)"""
+    job = await generation_jobs.get(job_id, principal.user_id, wait)
+    return job_to_dict(job)
+
+@generated_quiz_router.post('/stream')
+async def stream_quiz(
+    user_prompt: QuizGenerationRequest,
     quiz_generator_service: QuizGeneratorService = Depends(QuizGeneratorService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
-    return await quiz_generator_service.generate_quiz(user_prompt.user_prompt, PydanticObjectId(token.get('sub')))
+    """Генерация квиза с выдачей вопросов по одному через Server-Sent Events"""
+    return StreamingResponse(
+        quiz_generator_service.stream_quiz(user_prompt.user_prompt, principal.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @generated_quiz_router.get("/",)
 async def get_all_quizzes(service: QuizGeneratorService = Depends(QuizGeneratorService)):
@@ -29,10 +56,10 @@ async def get_all_quizzes(service: QuizGeneratorService = Depends(QuizGeneratorS
 
 @generated_quiz_router.get("/me",)
 async def get_user_quizzes(
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     service: QuizGeneratorService = Depends(QuizGeneratorService)
 ):
-    user_id = PydanticObjectId(token.get("sub"))
+    user_id = principal.user_id
     return await service.get_quizzes_by_user(user_id)
 
 
@@ -48,10 +75,10 @@ async def get_generated_quiz_by_quiz_id(
 @generated_quiz_router.post("/{quiz_id}/start", )
 async def start_quiz_attempt(
     quiz_id: PydanticObjectId,
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     service: QuizGeneratorService = Depends(QuizGeneratorService)
 ):
-    user_id = PydanticObjectId(token.get("sub"))
+    user_id = principal.user_id
     return await service.start_quiz_attempt( user_id,quiz_id)
 
 @generated_quiz_router.post("/{attempt_id}/submit", )
@@ -63,10 +90,10 @@ async def submit_quiz_attempt(
 
 @generated_quiz_router.get("/attempts/me",)
 async def get_user_attempts(
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     service: QuizGeneratorService = Depends(QuizGeneratorService)
 ):
-    user_id = PydanticObjectId(token.get("sub"))
+    user_id = principal.user_id
     return await service.get_user_attempts(user_id)
 
 
@@ -75,10 +102,10 @@ async def get_user_attempts(
 async def get_detailed_answers(
     attempt_id: PydanticObjectId, 
     service: QuizGeneratorService = Depends(QuizGeneratorService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
     """Получить детальные данные по попытке юзера"""
-    return await service.get_attempt_details(attempt_id,PydanticObjectId(token.get('sub')))
+    return await service.get_attempt_details(attempt_id,principal.user_id)
 
 @generated_quiz_router.post("/{attempt_id}/answer", )
 async def answer_question(
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from src.core.auth_middleware import Principal, get_current_admin
+from src.helpers.metrics import metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/")
+async def get_metrics(principal: Principal = Depends(get_current_admin)):
+    """Снимок in-process метрик (кэши, очереди, задержки); только для admin"""
+    return metrics.snapshot()
@@ -1,8 +1,12 @@
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends, File, UploadFile
+from typing import Literal, Optional
 
-from src.core.auth_middleware import get_current_user
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+
+from src.core.auth_middleware import Principal, get_current_user
 from src.schemas.req.profile import  UserProfileUpdateReq
+from src.models.enums import QuizSubject
+from src.services.leaderboard import LeaderboardService
 from src.services.profile import ProfileService
 
 profile_router = APIRouter()
@@ -11,48 +15,66 @@ profile_router = APIRouter()
 @profile_router.patch("/update")
 async def update_profile(
     req: UserProfileUpdateReq,
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     profile_service: ProfileService = Depends(ProfileService),
 ):
-    return await profile_service.update_profile(token.get("sub"), req)
+    return await profile_service.update_profile(principal.user_id, req)
 
 
 @profile_router.get("/me")
 async def me(
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     profile_service: ProfileService = Depends(ProfileService),
 ):
-    return await profile_service.get_user_by_id(token.get("sub"))
+    return await profile_service.get_user_by_id(principal.user_id)
 
 
 @profile_router.get('/leaderboard')
 async def get_leaderboard(
-    skip: int = 0, limit: int = 10,
+    response: Response,
+    skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = None,
     profile_service: ProfileService = Depends(ProfileService),
 ):
-    return await profile_service.get_leaderboard(skip,limit)
+    """Лидерборд из снапшота: skip - смещение по месту, cursor - продолжение (курсор в X-Next-Cursor)"""
+    leaderboard, next_cursor, version = await profile_service.get_leaderboard(skip, limit, cursor)
+    response.headers["X-Snapshot-Version"] = str(version)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return leaderboard
+
+@profile_router.get("/leaderboard/window")
+async def get_window_leaderboard(
+    window: Literal["week", "month", "all"] = "week",
+    subject: Optional[QuizSubject] = None,
+    limit: int = Query(10, ge=1, le=100),
+    leaderboard_service: LeaderboardService = Depends(LeaderboardService),
+):
+    """Лидерборд за последние 7/30 дней или за все время, по всем предметам или по одному"""
+    return await leaderboard_service.get_window_leaderboard(window, subject.value if subject else None, limit)
 
 @profile_router.get("/leaderboard/me", )
 async def get_user_rank(    
-    token: dict = Depends(get_current_user),
+    around: int = Query(0, ge=0, le=50),
+    principal: Principal = Depends(get_current_user),
     profile_service: ProfileService = Depends(ProfileService),
 ):
-    """Возвращает место текущего пользователя в лидерборде и его total_score"""
-    return await profile_service.get_user_rank((token.get('sub')))
+    """Возвращает место текущего пользователя в лидерборде и его total_score (around - соседи выше/ниже)"""
+    return await profile_service.get_user_rank(principal.user_id, around)
 
 
 @profile_router.patch("/upload-profile-photo/", )
 async def upload_profile_photo(    
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     file: UploadFile = File(...),
     profile_service: ProfileService = Depends(ProfileService),
 ):
     """Возвращает место текущего пользователя в лидерборде и его total_score"""
-    return await profile_service.update_profile_photo((token.get('sub')),file)
+    return await profile_service.update_profile_photo(principal.user_id,file)
 
 @profile_router.get("/profile-photo/")
 async def get_profile_photo(    
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
     profile_service: ProfileService = Depends(ProfileService),
 ):
-    return await profile_service.get_profile_photo((token.get('sub')),)
+    return await profile_service.get_profile_photo(principal.user_id,)
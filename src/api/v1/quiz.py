@@ -1,13 +1,17 @@
+import json
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from src.models.user_answer import AnswerCreate, UserAnswer
-from src.core.auth_middleware import get_current_user
+from src.core.auth_middleware import Principal, get_current_admin, get_current_user
+from src.helpers.question_payload_cache import etag_matches
 from src.schemas.req.quiz import QuizCreateDTO, QuizAttemptDTO, QuestionDTO
 from src.services.quiz import QuizService
+from src.services.question_import import QuestionImportService, iter_lines
 from src.models.quiz import Quiz
 from src.models.quiz_session import UserQuizAttempt
-from src.models.enums import QuizSubject
+from src.models.enums import QuizSubject, QuizType
 
 quiz_router = APIRouter()
 
@@ -21,6 +25,21 @@ async def add_question(quiz_id: PydanticObjectId, question_data: QuestionDTO, qu
     """Добавить вопрос в квиз"""
     return await quiz_service.add_question(quiz_id, question_data)
 
+@quiz_router.post("/questions/import", )
+async def import_questions(
+    request: Request,
+    format: Literal["jsonl", "csv"] = "jsonl",
+    quiz_id: Optional[PydanticObjectId] = None,
+    import_service: QuestionImportService = Depends(QuestionImportService),
+    principal: Principal = Depends(get_current_admin),
+):
+    """Потоковый импорт вопросов из тела запроса (JSONL или CSV), только для админов.
+
+    quiz_id задает квиз по умолчанию для строк без своего quiz_id.
+    Роль проверяется до чтения тела.
+    """
+    return await import_service.import_questions(iter_lines(request.stream()), format, quiz_id)
+
 @quiz_router.get("/", )
 async def get_all_quizzes(quiz_service: QuizService = Depends(QuizService)):
     """Получить все квизы"""
@@ -30,19 +49,38 @@ async def get_all_quizzes(quiz_service: QuizService = Depends(QuizService)):
 async def start_quiz_attempt(
     quiz_id: PydanticObjectId, 
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
     """Начать попытку квиза"""
-    return await quiz_service.start_quiz_attempt(quiz_id, PydanticObjectId(token.get('sub')))
+    return await quiz_service.start_quiz_attempt(quiz_id, principal.user_id)
+
+@quiz_router.post("/{quiz_id}/start-variant", )
+async def start_variant_attempt(
+    quiz_id: PydanticObjectId,
+    quiz_type: Optional[QuizType] = None,
+    quiz_service: QuizService = Depends(QuizService),
+    principal: Principal = Depends(get_current_user),
+):
+    """Начать попытку со случайно собранным вариантом (quiz_type добавляет профильные предметы)"""
+    return await quiz_service.start_variant_attempt(quiz_id, principal.user_id, quiz_type)
+
+@quiz_router.get("/attempts/{attempt_id}/questions", )
+async def get_attempt_questions(
+    attempt_id: PydanticObjectId,
+    quiz_service: QuizService = Depends(QuizService),
+    principal: Principal = Depends(get_current_user),
+):
+    """Получить вопросы попытки (для варианта - его собственный набор)"""
+    return await quiz_service.get_attempt_questions(attempt_id, principal.user_id)
 
 @quiz_router.post("/attempts/{attempt_id}/finish", )
 async def finish_quiz_attempt(
     attempt_id: PydanticObjectId, 
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
     """Завершить квиз"""
-    return await quiz_service.submit_quiz_attempt(attempt_id, PydanticObjectId(token.get('sub')))
+    return await quiz_service.submit_quiz_attempt(attempt_id, principal.user_id)
 
 
 @quiz_router.post("/attempts/{attempt_id}/answer")
@@ -50,29 +88,65 @@ async def submit_answer(
     attempt_id: PydanticObjectId, 
     answer_data: AnswerCreate,
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
     """Ответить на вопрос в квизе"""
-    return await quiz_service.submit_answer(attempt_id, answer_data, PydanticObjectId(token.get('sub')))
+    return await quiz_service.submit_answer(attempt_id, answer_data, principal.user_id)
+
+@quiz_router.post("/attempts/{attempt_id}/answers")
+async def submit_answers(
+    attempt_id: PydanticObjectId, 
+    answers: List[AnswerCreate],
+    quiz_service: QuizService = Depends(QuizService),
+    principal: Principal = Depends(get_current_user),
+):
+    """Ответить на несколько вопросов квиза одним запросом"""
+    return await quiz_service.submit_answers(attempt_id, answers, principal.user_id)
 
 @quiz_router.get("/{quiz_id}/questions", )
 async def get_quiz_questions(
     quiz_id: PydanticObjectId,
+    request: Request,
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
-    """Получить список вопросов для квиза"""
-    return await quiz_service.get_quiz_questions(quiz_id)
+    """Получить список вопросов для квиза (поддерживает If-None-Match -> 304)"""
+    payload, etag = await quiz_service.get_quiz_questions_payload(quiz_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
 
 
 
 @quiz_router.get("/attempts/me", )
 async def get_user_quiz_attempts(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    mode: Literal["full", "summary"] = "full",
+    stream: bool = False,
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
-    """Получить список историю попыток куизов"""
-    return await quiz_service.get_user_quiz_attempts(PydanticObjectId(token.get('sub')))
+    """Получить список историю попыток куизов.
+
+    limit/cursor включают keyset-пагинацию (курсор следующей страницы в X-Next-Cursor),
+    mode=summary убирает вопросы из ответа, stream=true отдает попытки построчно в NDJSON.
+    """
+    user_id = principal.user_id
+    summary = mode == "summary"
+    if stream:
+        async def ndjson():
+            async for attempt_data in quiz_service.stream_user_quiz_attempts(user_id, cursor, summary):
+                yield json.dumps(attempt_data, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    attempts, next_cursor = await quiz_service.get_user_quiz_attempts(user_id, limit, cursor, summary)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return attempts
 
 
 
@@ -81,7 +155,7 @@ async def get_user_quiz_attempts(
 async def get_detailed_answers(
     attempt_id: PydanticObjectId, 
     quiz_service: QuizService = Depends(QuizService),
-    token: dict = Depends(get_current_user),
+    principal: Principal = Depends(get_current_user),
 ):
     """Получить детальные данные по попытке юзера"""
-    return await quiz_service.get_attempt_details(attempt_id,PydanticObjectId(token.get('sub')))
\ No newline at end of file
+    return await quiz_service.get_attempt_details(attempt_id,principal.user_id)
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Бенчмарк просмотра попыток: python-бэкенд против aggregation-пайплайна.
+
+    python -m src.commands.bench_attempt_views [--users 10000] [--attempts 50] [--samples 200]
+
+Заполняет отдельную базу unt_cs_bench синтетическими данными (один квиз на
+120 вопросов, по --attempts попыток на пользователя с ответами на все вопросы),
+сверяет ответы обоих бэкендов и печатает p50/p99 для истории, сводки и деталей.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from beanie import PydanticObjectId, init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.core.database import DOCUMENT_MODELS
+from src.core.settings import settings
+from src.models.enums import QuestionType, QuizSubject
+from src.models.question import Question, QuestionOption
+from src.models.quiz import Quiz
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user_answer import UserAnswer
+from src.services.quiz import QuizService
+
+BENCH_DB_NAME = "unt_cs_bench"
+QUESTIONS = 120
+INSERT_BATCH = 10_000
+
+
+async def seed(users: int, attempts: int) -> list:
+    quiz = Quiz(variant="bench", year="2024", title="Бенчмарк", questions_count=QUESTIONS, max_score=QUESTIONS)
+    await quiz.insert()
+    subjects = list(QuizSubject)
+    questions = [
+        Question(
+            quiz_id=quiz.id,
+            type=QuestionType.SINGLE_CHOICE,
+            subject=subjects[i % len(subjects)],
+            question_text=f"Вопрос {i}",
+            options=[QuestionOption(label=label, option_text=label, is_correct=label == "A") for label in "ABCD"],
+        )
+        for i in range(QUESTIONS)
+    ]
+    await Question.insert_many(questions)
+    question_ids = [q["_id"] async for q in Question.get_motor_collection().find({"quiz_id": quiz.id}, {"_id": 1})]
+
+    user_ids = [PydanticObjectId() for _ in range(users)]
+    now = datetime.utcnow()
+    attempt_docs, answer_docs = [], []
+
+    async def flush():
+        if attempt_docs:
+            await UserQuizAttempt.get_motor_collection().insert_many(attempt_docs, ordered=False)
+            attempt_docs.clear()
+        if answer_docs:
+            await UserAnswer.get_motor_collection().insert_many(answer_docs, ordered=False)
+            answer_docs.clear()
+
+    for user_id in user_ids:
+        for i in range(attempts):
+            attempt_id = PydanticObjectId()
+            score = 0
+            for question_id in question_ids:
+                correct = random.random() < 0.6
+                score += correct
+                answer_docs.append({
+                    "attempt_id": attempt_id, "question_id": question_id,
+                    "selected_options": ["A" if correct else "B"], "score": int(correct),
+                })
+            attempt_docs.append({
+                "_id": attempt_id, "quiz_id": quiz.id, "user_id": user_id, "score": score,
+                "started_at": now - timedelta(hours=i), "ended_at": now - timedelta(hours=i) + timedelta(minutes=90),
+                "is_completed": True, "expired": False,
+            })
+            if len(answer_docs) >= INSERT_BATCH:
+                await flush()
+    await flush()
+    return user_ids
+
+
+async def measure(name: str, backend: str, call, samples: list):
+    settings.ATTEMPT_HISTORY_BACKEND = backend
+    settings.ATTEMPT_DETAILS_BACKEND = backend
+    latencies = []
+    for sample in samples:
+        started = time.perf_counter()
+        await call(sample)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(
+        f"{name:<8} {backend:<12} p50={statistics.median(latencies) * 1000:.1f}ms "
+        f"p99={latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f}ms"
+    )
+
+
+async def main(users: int, attempts: int, samples: int, keep: bool):
+    client = AsyncIOMotorClient(os.getenv("DB_URL"))
+    database = client[BENCH_DB_NAME]
+    await client.drop_database(BENCH_DB_NAME)
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+    service = QuizService()
+    try:
+        started = time.perf_counter()
+        user_ids = await seed(users, attempts)
+        print(f"seeded {users} users x {attempts} attempts x {QUESTIONS} answers in {time.perf_counter() - started:.1f}s")
+
+        sampled_users = random.sample(user_ids, min(samples, len(user_ids)))
+        sampled_attempts = [
+            doc["_id"] async for doc in UserQuizAttempt.get_motor_collection().aggregate([{"$sample": {"size": samples}}])
+        ]
+        owners = {
+            doc["_id"]: doc["user_id"]
+            async for doc in UserQuizAttempt.get_motor_collection().find({"_id": {"$in": sampled_attempts}}, {"user_id": 1})
+        }
+
+        # Оба бэкенда должны отдавать одно и то же
+        results = {}
+        for backend in ("python", "aggregation"):
+            settings.ATTEMPT_HISTORY_BACKEND = backend
+            settings.ATTEMPT_DETAILS_BACKEND = backend
+            history, _ = await service.get_user_quiz_attempts(sampled_users[0], limit=20)
+            details = await service.get_attempt_details(sampled_attempts[0], owners[sampled_attempts[0]])
+            results[backend] = ([(a["id"], a["score"], a["max_score"]) for a in history], details["score"], len(details["answers"]))
+        assert results["python"] == results["aggregation"], results
+        print("backends agree")
+
+        for backend in ("python", "aggregation"):
+            await measure("history", backend, lambda user_id: service.get_user_quiz_attempts(user_id, limit=20), sampled_users)
+            await measure("summary", backend, lambda user_id: service.get_user_quiz_attempts(user_id, limit=20, summary=True), sampled_users)
+            await measure("details", backend, lambda attempt_id: service.get_attempt_details(attempt_id, owners[attempt_id]), sampled_attempts)
+    finally:
+        if not keep:
+            await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark attempt history/details backends")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--attempts", type=int, default=50, help="attempts per user")
+    parser.add_argument("--samples", type=int, default=200, help="users and attempts to query per backend")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {BENCH_DB_NAME} database afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.attempts, args.samples, args.keep))
@@ -0,0 +1,40 @@
+"""Микро-бенчмарк накладных расходов аутентификации на запрос.
+
+    python -m src.commands.bench_auth [--requests 100000]
+
+Сравнивает прежний путь (JWT декодировался дважды на запрос) с authenticate():
+одно декодирование за время жизни токена, дальше payload из token_cache.
+"""
+import argparse
+import time
+
+from beanie import PydanticObjectId
+
+from src.core.auth_middleware import authenticate
+from src.helpers.jwt_handler import JWT
+
+
+def main(requests: int):
+    JWT.secret_key = JWT.secret_key or "benchmark-secret"
+    token = JWT.encode_access_token({"sub": str(PydanticObjectId())})
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        payload = JWT.decode(token)
+        JWT.decode(token)
+        PydanticObjectId(payload["sub"])
+    before = (time.perf_counter() - started) / requests
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        authenticate(token)
+    after = (time.perf_counter() - started) / requests
+
+    print(f"double decode: {before * 1e6:.1f} us/request, cached single decode: {after * 1e6:.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request authentication overhead")
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.requests)
@@ -0,0 +1,45 @@
+"""Бенчмарк параллельной генерации: один запрос к модели против fan-out частями.
+
+    python -m src.commands.bench_generation_fanout [--chunks 2,4] [--token-delay 0.005] [--base-url URL]
+
+Без --base-url поднимает src.commands.fake_llm на свободном порту с задержкой
+--token-delay на токен и останавливает его в конце. Fan-out выключен по
+умолчанию (GENERATION_FANOUT_CHUNKS=1) - бенчмарк помогает выбрать число частей.
+"""
+import argparse
+import asyncio
+import json
+import time
+from contextlib import nullcontext
+from typing import List
+
+from src.commands.bench_llm import fake_llm
+from src.helpers.llm import llm_client
+from src.services.generated_quiz import QuizGeneratorService
+
+TOPIC = "история казахстана"
+
+
+async def main(chunks_list: List[int]):
+    try:
+        started = time.perf_counter()
+        quiz_data = json.loads(await llm_client.generate_response(TOPIC))
+        print(f"single: {len(quiz_data['questions'])} questions in {time.perf_counter() - started:.2f}s")
+        for chunks in chunks_list:
+            started = time.perf_counter()
+            quiz_data = await QuizGeneratorService()._generate_fanout(TOPIC, chunks)
+            print(f"fan-out x{chunks}: {len(quiz_data['questions'])} questions in {time.perf_counter() - started:.2f}s")
+    finally:
+        await llm_client.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-request generation with fan-out")
+    parser.add_argument("--chunks", default="2,4", help="comma-separated fan-out sizes")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="fake LLM delay per token, seconds")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint; default - local fake LLM")
+    args = parser.parse_args()
+    with nullcontext(args.base_url) if args.base_url else fake_llm(token_delay=args.token_delay) as base_url:
+        llm_client.base_url = base_url
+        llm_client.api_key = llm_client.api_key or "fake"
+        asyncio.run(main([int(chunks) for chunks in args.chunks.split(",")]))
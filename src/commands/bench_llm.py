@@ -0,0 +1,104 @@
+"""Бенчмарк клиента LLM: новый клиент на каждый запрос против общего пула соединений.
+
+    python -m src.commands.bench_llm [--requests 200] [--concurrency 10] [--fail-rate 0.1] [--base-url URL]
+
+Без --base-url поднимает src.commands.fake_llm на свободном порту (без задержки
+токенов, с долей ответов 503 --fail-rate) и останавливает его в конце.
+"per-request" - как раньше, новый клиент с новым пулом соединений на каждый вызов.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from src.helpers.llm import LLMClient
+from src.helpers.metrics import metrics
+
+
+@contextmanager
+def fake_llm(fail_rate: float = 0, token_delay: float = 0) -> Iterator[str]:
+    """Поднимает src.commands.fake_llm на свободном порту; отдает его base_url"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, "FAKE_LLM_TOKEN_DELAY": str(token_delay), "FAKE_LLM_FAIL_RATE": str(fail_rate)}
+    process = subprocess.Popen([sys.executable, "-m", "src.commands.fake_llm", "--port", str(port)], env=env)
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("fake LLM server did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+async def run(name: str, get_client: Callable[[], LLMClient], requests_count: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            client = get_client()
+            started = time.perf_counter()
+            try:
+                await client.generate_response("бенчмарк")
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests_count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name}: {requests_count} requests in {elapsed:.2f}s, "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms p99={latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f}ms, "
+        f"failed={failures}"
+    )
+
+
+async def bench(base_url: str, requests_count: int, concurrency: int):
+    def make_client() -> LLMClient:
+        return LLMClient(
+            api_key="fake", base_url=base_url, connect_timeout=5, read_timeout=60,
+            max_connections=concurrency, max_retries=5, backoff_base=0.05, backoff_max=1,
+            max_concurrency=concurrency,
+        )
+
+    await run("per-request", make_client, requests_count, concurrency)
+    shared = make_client()
+    await run("shared", lambda: shared, requests_count, concurrency)
+    await shared.stop()
+    print(f"retries: {metrics.counter('llm.retries'):.0f}")
+
+
+def main(base_url: Optional[str], requests_count: int, concurrency: int, fail_rate: float):
+    if base_url:
+        asyncio.run(bench(base_url, requests_count, concurrency))
+        return
+    with fake_llm(fail_rate) as url:
+        asyncio.run(bench(url, requests_count, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pooled LLM client against fake_llm")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="share of 503 answers from the started fake_llm")
+    parser.add_argument("--base-url", default=None, help="use an already running OpenAI-compatible server")
+    args = parser.parse_args()
+    main(args.base_url, args.requests, args.concurrency, args.fail_rate)
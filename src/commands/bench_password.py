@@ -0,0 +1,114 @@
+"""Нагрузочный тест: всплеск логинов и задержка чтения квиза на том же воркере.
+
+    python -m src.commands.bench_password [--logins 40] [--readers 20]
+
+Через ASGI без сети гоняет настоящие POST /auth/login и GET /quiz/{id}/questions
+против отдельной базы unt_cs_bench: пока идет всплеск логинов, --readers клиентов
+читают вопросы квиза. Сравнивает bcrypt прямо в event loop ("inline", как было)
+и в пуле PasswordHandler ("pooled"). Нужен локальный mongod (DB_URL).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from main import make_app
+from src.core.database import DOCUMENT_MODELS
+from src.helpers.jwt_handler import JWT
+from src.helpers.password import PasswordHandler
+from src.models.enums import QuestionType, QuizSubject
+from src.models.question import Question, QuestionOption
+from src.models.quiz import Quiz
+from src.models.user import User
+
+BENCH_DB_NAME = "unt_cs_bench"
+EMAIL = "bench@unt.kz"
+PASSWORD = "secret"
+
+
+async def seed() -> Quiz:
+    await User(first_name="Bench", last_name="User", email=EMAIL, password=PasswordHandler.hash(PASSWORD)).insert()
+    quiz = Quiz(variant="bench", year="2024", title="Бенчмарк")
+    await quiz.insert()
+    await Question.insert_many([
+        Question(
+            quiz_id=quiz.id,
+            type=QuestionType.SINGLE_CHOICE,
+            subject=QuizSubject.PHYSICS,
+            question_text=f"Вопрос {i}",
+            options=[QuestionOption(label=label, option_text=label, is_correct=label == "A") for label in "ABCD"],
+        )
+        for i in range(120)
+    ])
+    return quiz
+
+
+async def burst(client: httpx.AsyncClient, quiz_url: str, headers: dict, logins: int, readers: int):
+    """Логины всплеском, параллельно - непрерывное чтение вопросов квиза"""
+    stop, latencies = asyncio.Event(), []
+
+    async def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.get(quiz_url, headers=headers)
+            assert response.status_code == 200, response.status_code
+            latencies.append(time.perf_counter() - started)
+
+    async def login():
+        response = await client.post("/api/v1/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+
+    reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+    latencies.sort()
+    return elapsed, len(latencies), statistics.median(latencies), latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+
+
+async def main(logins: int, readers: int):
+    JWT.secret_key = JWT.secret_key or "benchmark-secret"
+    client = AsyncIOMotorClient(os.getenv("DB_URL"))
+    await client.drop_database(BENCH_DB_NAME)
+    await init_beanie(database=client[BENCH_DB_NAME], document_models=DOCUMENT_MODELS)
+    try:
+        quiz = await seed()
+        user = await User.find_one({"email": EMAIL})
+        headers = {"Authorization": f"Bearer {JWT.encode_access_token({'sub': str(user.id)})}"}
+        quiz_url = f"/api/v1/quiz/{quiz.id}/questions"
+
+        pooled_verify = PasswordHandler.verify_async
+
+        async def inline_verify(hashed_password, plain_password):
+            return PasswordHandler.verify(hashed_password, plain_password)
+
+        app = make_app()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            await http.get(quiz_url, headers=headers)  # прогрев кэша вопросов
+            for name, verify in (("inline", inline_verify), ("pooled", pooled_verify)):
+                PasswordHandler.verify_async = staticmethod(verify)
+                elapsed, reads, p50, p99 = await burst(http, quiz_url, headers, logins, readers)
+                print(
+                    f"{name}: {logins} logins in {elapsed:.2f}s; {reads} quiz reads meanwhile, "
+                    f"p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+                )
+            PasswordHandler.verify_async = staticmethod(pooled_verify)
+    finally:
+        PasswordHandler.shutdown()
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure quiz read latency during a login burst")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--readers", type=int, default=20, help="concurrent clients reading quiz questions")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.readers))
@@ -0,0 +1,93 @@
+"""Бенчмарк потокового импорта вопросов против локального mongod.
+
+    python -m src.commands.bench_question_import [--rows 100000] [--format jsonl|csv] [--bad-every 1000]
+
+Генерирует строки в памяти (каждая --bad-every строка невалидна), импортирует
+их в отдельную базу unt_cs_bench через QuestionImportService и печатает
+скорость и отчет. Цель - 100k вопросов быстрее минуты.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.core.database import DOCUMENT_MODELS
+from src.models.enums import QuizSubject
+from src.models.question import Question
+from src.models.quiz import Quiz
+from src.services.question_import import QuestionImportService
+
+BENCH_DB_NAME = "unt_cs_bench"
+CSV_HEADER = "type,subject,question_text,correct,A,B,C,D,E,F,G,H"
+
+
+async def generate(rows: int, fmt: str, bad_every: int) -> AsyncIterator[str]:
+    subjects = list(QuizSubject)
+    if fmt == "csv":
+        yield CSV_HEADER
+    for i in range(rows):
+        if bad_every and i % bad_every == bad_every - 1:
+            yield "{broken" if fmt == "jsonl" else "single_choice,Нет такого предмета,?,A,x"
+            continue
+        subject = subjects[i % len(subjects)].value
+        multiple = i % 2
+        labels = "ABCDEFGH" if multiple else "ABCD"
+        correct = "ACE" if multiple else "B"
+        text = f"Вопрос {i}: какой вариант верен?"
+        if fmt == "csv":
+            yield ",".join([
+                "multiple_choice" if multiple else "single_choice", subject, text, ";".join(correct),
+                *(f"Вариант {label}" for label in labels), *([""] * (8 - len(labels))),
+            ])
+        else:
+            yield json.dumps({
+                "type": "multiple_choice" if multiple else "single_choice",
+                "subject": subject,
+                "question_text": text,
+                "options": [
+                    {"label": label, "option_text": f"Вариант {label}", "is_correct": label in correct}
+                    for label in labels
+                ],
+            }, ensure_ascii=False)
+        if i % 1000 == 0:
+            await asyncio.sleep(0)
+
+
+async def main(rows: int, fmt: str, bad_every: int, keep: bool):
+    client = AsyncIOMotorClient(os.getenv("DB_URL"))
+    await client.drop_database(BENCH_DB_NAME)
+    await init_beanie(database=client[BENCH_DB_NAME], document_models=DOCUMENT_MODELS)
+    try:
+        quiz = Quiz(variant="bench", year="2024", title="Импорт")
+        await quiz.insert()
+
+        started = time.perf_counter()
+        report = await QuestionImportService().import_questions(generate(rows, fmt, bad_every), fmt, quiz.id)
+        elapsed = time.perf_counter() - started
+
+        stored = await Question.find({"quiz_id": quiz.id}).count()
+        quiz = await Quiz.get(quiz.id)
+        assert stored == report["inserted"] == quiz.questions_count, (stored, report["inserted"], quiz.questions_count)
+        print(
+            f"{fmt}: {report['rows']} rows in {elapsed:.2f}s ({report['rows'] / elapsed:.0f} rows/s), "
+            f"inserted={report['inserted']} failed={report['failed']}"
+        )
+    finally:
+        if not keep:
+            await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming question import")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--bad-every", type=int, default=1000, help="every N-th row is invalid (0 - none)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {BENCH_DB_NAME} database afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.format, args.bad_every, args.keep))
@@ -0,0 +1,73 @@
+"""Бенчмарк GET /quiz/{id}/questions на 120 вопросов без сети и Mongo.
+
+    python -m src.commands.bench_question_payload [--requests 5000] [--concurrency 500]
+
+Список вопросов подменяется готовым, поэтому меряется только путь кэша: ETag,
+If-None-Match -> 304 (половина запросов) и отдача сериализованных байт.
+p50/p99 включают ожидание за --concurrency запросами в одном event loop.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from beanie import PydanticObjectId
+
+from main import make_app
+from src.core.auth_middleware import Principal, get_current_user
+from src.helpers.metrics import metrics
+from src.schemas.res.question import OptionResponse, QuestionResponse
+from src.services.quiz import QuizService
+
+
+async def main(requests_count: int, concurrency: int):
+    quiz_id = PydanticObjectId()
+    questions = [
+        QuestionResponse(
+            id=PydanticObjectId(), quiz_id=quiz_id, type="multiple_choice", subject="Физика",
+            question_text=f"Вопрос {i} " * 10,
+            options=[OptionResponse(label=label, option_text=f"Вариант {label}") for label in "ABCDEFGH"],
+        )
+        for i in range(120)
+    ]
+
+    async def get_quiz_questions(self, _quiz_id):
+        return questions
+
+    QuizService.get_quiz_questions = get_quiz_questions
+    app = make_app()
+    app.dependency_overrides[get_current_user] = lambda: Principal(user_id=PydanticObjectId(), payload={})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        url = f"/api/v1/quiz/{quiz_id}/questions"
+        etag = (await client.get(url)).headers["etag"]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i: int):
+            async with semaphore:
+                headers = {"If-None-Match": etag} if i % 2 else {}
+                started = time.perf_counter()
+                await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests_count)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{requests_count} requests, {concurrency} concurrent: {requests_count / elapsed:.0f} req/s, "
+        f"service time {elapsed / requests_count * 1000:.2f}ms, "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+    )
+    print(f"builds: {metrics.counter('question_payload_cache.misses'):.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cached quiz questions endpoint")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,56 @@
+"""Бенчмарк индекса мест лидерборда в памяти.
+
+    python -m src.commands.bench_rank_index [--users 1000000]
+
+Строит RankIndex, меряет rank, add_score и around и сверяет места с наивным подсчетом.
+"""
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from src.helpers.rank_index import RankIndex
+
+
+def main(users: int):
+    items = [(ObjectId(), int(random.expovariate(1 / 300))) for _ in range(users)]
+
+    started = time.perf_counter()
+    index = RankIndex()
+    index.build(items)
+    print(f"build {users} users: {time.perf_counter() - started:.2f}s")
+
+    sample = [user_id for user_id, _ in random.sample(items, min(100_000, users))]
+    started = time.perf_counter()
+    for user_id in sample:
+        index.rank(user_id)
+    elapsed = time.perf_counter() - started
+    print(f"rank: {elapsed / len(sample) * 1e6:.2f} us/query")
+
+    started = time.perf_counter()
+    for user_id in sample:
+        index.add_score(user_id, random.randint(0, 140))
+    elapsed = time.perf_counter() - started
+    print(f"add_score: {elapsed / len(sample) * 1e6:.2f} us/update")
+
+    around_sample = sample[:10_000]
+    started = time.perf_counter()
+    for user_id in around_sample:
+        index.around(user_id, 5)
+    elapsed = time.perf_counter() - started
+    print(f"around(5): {elapsed / len(around_sample) * 1e6:.2f} us/query")
+
+    # Сверка с наивным подсчетом
+    scores = sorted(index._scores.values(), reverse=True)
+    for user_id in sample[:200]:
+        expected = sum(1 for s in scores if s > index.score_of(user_id)) + 1
+        assert index.rank(user_id) == expected
+    print("ranks match naive count")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory leaderboard rank index")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+    main(args.users)
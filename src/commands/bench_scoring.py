@@ -0,0 +1,46 @@
+"""Микро-бенчмарк пересчета баллов: score() по одному ответу против score_batch().
+
+    python -m src.commands.bench_scoring [--attempts 5000] [--questions 120]
+"""
+import argparse
+import random
+import time
+
+from src import scoring
+from src.models.enums import QuestionType
+
+
+def main(attempts: int, questions: int):
+    types = [random.choice(list(QuestionType)) for _ in range(questions)]
+    correct = [
+        1 << random.randrange(4) if t == QuestionType.SINGLE_CHOICE else random.randrange(1, 1 << 8)
+        for t in types
+    ]
+    selected = [
+        [random.randrange(0, 1 << 8) for _ in range(questions)]
+        for _ in range(attempts)
+    ]
+
+    def per_answer(chunk):
+        return [scoring.score(s, c, t) for s, c, t in zip(chunk, correct, types)]
+
+    def batch(chunk):
+        return scoring.score_batch(chunk, correct, types)
+
+    results = {}
+    for name, rescore in (("score", per_answer), ("score_batch", batch)):
+        started = time.perf_counter()
+        results[name] = [sum(rescore(chunk)) for chunk in selected]
+        elapsed = time.perf_counter() - started
+        answers = attempts * questions
+        print(f"{name:<12} {attempts} attempts x {questions} answers: {elapsed:.3f}s, "
+              f"{answers / elapsed:,.0f} answers/s, {attempts / elapsed:,.0f} attempts/s")
+    assert results["score"] == results["score_batch"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch re-scoring")
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=120)
+    args = parser.parse_args()
+    main(args.attempts, args.questions)
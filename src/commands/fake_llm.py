@@ -0,0 +1,92 @@
+"""Локальный OpenAI-совместимый сервер для проверки генерации без реальной модели.
+
+    FAKE_LLM_TOKEN_DELAY=0.02 python -m src.commands.fake_llm --port 8089
+    OPENROUTER_BASE_URL=http://127.0.0.1:8089/v1 OPENROUTER_API_KEY=fake uvicorn main:app
+
+Отвечает квизом из N вопросов (N берется из начала сообщения пользователя),
+в обычном режиме и со stream=true, выдавая по одному "токену" (~4 символа)
+раз в FAKE_LLM_TOKEN_DELAY секунд. FAKE_LLM_FAIL_RATE задает долю ответов 503.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", 0.01))
+FAIL_RATE = float(os.getenv("FAKE_LLM_FAIL_RATE", 0))
+TOKEN_SIZE = 4
+
+app = FastAPI()
+
+
+def fake_quiz(user_message: str) -> str:
+    match = re.match(r"\s*(\d+)", user_message)
+    count = int(match.group(1)) if match else 20
+    topic = user_message.split("-", 1)[-1].strip() or "тема"
+    questions = []
+    for i in range(count):
+        multiple = i % 2 == 1
+        labels = "ABCDEFGH" if multiple else "ABCD"
+        correct = {"A", "C"} if multiple else {"B"}
+        questions.append({
+            "type": "multiple_choice" if multiple else "single_choice",
+            "question_text": f"{topic}: вопрос {i + 1} ({uuid.uuid4().hex[:6]})",
+            "options": [
+                {"label": label, "option_text": f"Вариант {label}", "is_correct": label in correct}
+                for label in labels
+            ],
+        })
+    return json.dumps({"title": f"Тест: {topic}", "subject": topic, "questions": questions}, ensure_ascii=False)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+    user_message = next((m["content"] for m in reversed(body["messages"]) if m["role"] == "user"), "")
+    content = fake_quiz(user_message)
+    tokens = [content[i:i + TOKEN_SIZE] for i in range(0, len(content), TOKEN_SIZE)]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        }
+
+    async def events():
+        for token in tokens:
+            await asyncio.sleep(TOKEN_DELAY)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,39 @@
+"""Импорт вопросов из файла JSONL или CSV.
+
+    python -m src.commands.import_questions questions.jsonl [--quiz-id ID] [--format csv]
+"""
+import argparse
+import asyncio
+import json
+from typing import AsyncIterator
+
+from beanie import PydanticObjectId
+
+from src.core.database import init_db
+from src.services.question_import import QuestionImportService
+
+
+async def read_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8-sig") as source:
+        for line in source:
+            yield line.rstrip("\n")
+
+
+async def main(path: str, fmt: str, quiz_id: str):
+    await init_db()
+    report = await QuestionImportService().import_questions(
+        read_lines(path),
+        fmt,
+        PydanticObjectId(quiz_id) if quiz_id else None,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import questions from JSONL or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="default: by file extension")
+    parser.add_argument("--quiz-id", default=None, help="quiz for rows without quiz_id")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    asyncio.run(main(args.path, fmt, args.quiz_id))
@@ -0,0 +1,21 @@
+"""Бэкфилл корзин лидерборда за все время по предметам.
+
+    python -m src.commands.rebuild_leaderboard_buckets
+
+Запускается один раз после выкладки корзин: начисления до нее в корзинах
+не учтены. Общий зачет за все время берется из users.total_score и бэкфилла не требует.
+"""
+import asyncio
+
+from src.core.database import init_db
+from src.services.leaderboard import LeaderboardService
+
+
+async def main():
+    await init_db()
+    rebuilt = await LeaderboardService().rebuild_all_time_buckets()
+    print(f"Rebuilt {rebuilt} all-time subject buckets")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+"""Пересчет материализованных агрегатов квизов.
+
+    python -m src.commands.rebuild_quiz_stats [--only-missing]
+"""
+import argparse
+import asyncio
+
+from src.core.database import init_db
+from src.services.quiz import QuizService
+
+
+async def main(only_missing: bool):
+    await init_db()
+    rebuilt = await QuizService().rebuild_quiz_stats(only_missing=only_missing)
+    print(f"Rebuilt stats for {rebuilt} quizzes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild materialized quiz stats")
+    parser.add_argument("--only-missing", action="store_true", help="only quizzes that were never backfilled")
+    args = parser.parse_args()
+    asyncio.run(main(args.only_missing))
@@ -1,15 +1,44 @@
+from dataclasses import dataclass
+
+from beanie import PydanticObjectId
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from src.core.settings import settings
 from src.helpers.jwt_handler import JWT
+from src.helpers.token_cache import token_cache
+from src.helpers.user_cache import user_cache
+from src.models.user import UserRoleEnum
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Аутентифицированный пользователь запроса"""
+    user_id: PydanticObjectId
+    payload: dict
+
+
+def authenticate(token: str) -> Principal:
+    """Проверяет JWT один раз за время его жизни; дальше payload берется из кэша"""
+    key = token_cache.key(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        try:
+            payload = JWT.decode(token)
+            user_id = PydanticObjectId(payload["sub"])
+        except Exception:
+            raise HTTPException(status_code=403, detail="Invalid token or expired token.")
+        token_cache.put(key, payload)
+    else:
+        user_id = PydanticObjectId(payload["sub"])
+    return Principal(user_id=user_id, payload=payload)
 
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request):
+    async def __call__(self, request: Request) -> Principal:
         credentials: HTTPAuthorizationCredentials = await super(
             JWTBearer, self
         ).__call__(request)
@@ -18,32 +47,20 @@ class JWTBearer(HTTPBearer):
                 raise HTTPException(
                     status_code=403, detail="Invalid authentication scheme."
                 )
-            if not self.verify_jwt(credentials.credentials):
-                raise HTTPException(
-                    status_code=403, detail="Invalid token or expired token."
-                )
-            return credentials.credentials
+            return authenticate(credentials.credentials)
         else:
             raise HTTPException(
                 status_code=403, detail="Invalid authorization code.")
 
-    def verify_jwt(self, jwtoken: str) -> bool:
-        isTokenValid: bool = False
 
-        try:
-            payload = JWT.decode(jwtoken)
-        except:
-            payload = None
-        if payload:
-            isTokenValid = True
-
-        return isTokenValid
-
-
-def get_current_user(request: Request, token: str = Depends(JWTBearer())):
-    try:
-        user_payload = JWT.decode(token)
-        return user_payload
-    except Exception as e:
-        raise HTTPException(
-            status_code=403, detail="Invalid token or expired token")
+def get_current_user(principal: Principal = Depends(JWTBearer())) -> Principal:
+    return principal
+
+
+async def get_current_admin(principal: Principal = Depends(get_current_user)) -> Principal:
+    """Пользователь запроса с ролью admin, иначе 403"""
+    user = await user_cache.get(principal.user_id)
+    if not user or user.role != UserRoleEnum.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return principal
+
@@ -1,8 +1,13 @@
+import asyncio
+import logging
 import os
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
+from src.core.settings import settings
 from src.models.mistake_bank import MistakeBankQuiz, MistakeQuizSession
 from src.models.generated_quiz import GeneratedQuiz, UserGeneratedQuizAttempt
+from src.models.generation_job import GenerationJob
+from src.models.leaderboard import LeaderboardBucket
 from src.models.user import User
 from src.models.question import *
 from src.models.quiz import *
@@ -11,23 +16,44 @@ from src.models.user_answer import UserAnswer
 
 client = None
 db = None
+index_task = None
+
+DOCUMENT_MODELS = [
+    User,
+    Question,
+    Quiz,
+    UserAnswer,
+    UserQuizAttempt,
+    GeneratedQuiz,
+    UserGeneratedQuizAttempt,
+    MistakeBankQuiz,
+    MistakeQuizSession,
+    LeaderboardBucket,
+    GenerationJob,
+]
+
+
+async def sync_indexes():
+    """Создает индексы, объявленные в Settings.indexes моделей"""
+    for model in DOCUMENT_MODELS:
+        indexes = model.get_settings().indexes
+        if not indexes:
+            continue
+        try:
+            await model.get_motor_collection().create_indexes(indexes)
+        except Exception as e:
+            logging.error(f"Error creating indexes for {model.__name__}: {e}")
 
 
 async def init_db():
-    global client, db
+    global client, db, index_task
     client = AsyncIOMotorClient(os.getenv("DB_URL"))
     db = client.unt_cs
+    # В фоновом режиме приложение стартует сразу, а индексы строятся параллельно
     await init_beanie(
         database=db,
-        document_models=[
-            User,
-            Question,
-            Quiz,
-            UserAnswer,
-            UserQuizAttempt,
-            GeneratedQuiz,
-            UserGeneratedQuizAttempt,
-            MistakeBankQuiz,
-            MistakeQuizSession,
-        ],
+        document_models=DOCUMENT_MODELS,
+        skip_indexes=settings.DB_INDEXES_IN_BACKGROUND,
     )
+    if settings.DB_INDEXES_IN_BACKGROUND:
+        index_task = asyncio.create_task(sync_indexes())
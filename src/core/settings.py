@@ -1,5 +1,10 @@
 import os
 
+from dotenv import load_dotenv
+
+# .env читается один раз при импорте настроек (в docker переменные приходят через env_file)
+load_dotenv()
+
 
 class Settings:
 
@@ -8,5 +13,105 @@ class Settings:
     ACCESS_EXPIRE_MINUTES = 60
     REFRESH_EXPIRE_MINUTES = 60 * 24 * 7
 
+    # Бюджет памяти кэша ключей ответов (байты)
+    ANSWER_KEY_CACHE_BYTES = int(os.getenv("ANSWER_KEY_CACHE_BYTES", 32 * 1024 * 1024))
+
+    # Бэкенд просмотра попыток: "python" или "aggregation" (отдельно для каждого эндпоинта)
+    ATTEMPT_HISTORY_BACKEND = os.getenv("ATTEMPT_HISTORY_BACKEND", "python")
+    ATTEMPT_DETAILS_BACKEND = os.getenv("ATTEMPT_DETAILS_BACKEND", "python")
+
+    # Строить индексы в фоне после старта, а не блокировать init_db
+    DB_INDEXES_IN_BACKGROUND = os.getenv("DB_INDEXES_IN_BACKGROUND", "false").lower() == "true"
+
+    # Кэш сериализованных вопросов квиза для GET /quiz/{quiz_id}/questions
+    QUESTION_PAYLOAD_CACHE_SIZE = int(os.getenv("QUESTION_PAYLOAD_CACHE_SIZE", 256))
+    QUESTION_PAYLOAD_CACHE_TTL = float(os.getenv("QUESTION_PAYLOAD_CACHE_TTL", 300))
+
+    # Write-behind буфер ответов: flush каждые N ответов попытки и каждые T секунд.
+    # Durability: "memory" (без журнала), "journal" (журнал без fsync), "fsync"
+    ANSWER_WRITE_BEHIND = os.getenv("ANSWER_WRITE_BEHIND", "false").lower() == "true"
+    ANSWER_FLUSH_SIZE = int(os.getenv("ANSWER_FLUSH_SIZE", 20))
+    ANSWER_FLUSH_INTERVAL = float(os.getenv("ANSWER_FLUSH_INTERVAL", 5))
+    ANSWER_BUFFER_DURABILITY = os.getenv("ANSWER_BUFFER_DURABILITY", "journal")
+    ANSWER_BUFFER_JOURNAL = os.getenv("ANSWER_BUFFER_JOURNAL", "journal/answers.ndjson")
+
+    # Импорт вопросов: процессы валидации, строк на задачу пула, документов на insert_many
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 2))
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 500))
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+    # Сборка вариантов: вопросов на профильный предмет, время жизни кэша ID по предметам
+    PROFILE_QUESTION_COUNT = int(os.getenv("PROFILE_QUESTION_COUNT", 40))
+    QUESTION_POOL_TTL = float(os.getenv("QUESTION_POOL_TTL", 600))
+
+    # Лимит времени попытки по умолчанию (если у квиза нет своего) и фоновое закрытие просроченных
+    ATTEMPT_TIME_LIMIT_MINUTES = int(os.getenv("ATTEMPT_TIME_LIMIT_MINUTES", 240))
+    ATTEMPT_SWEEPER_ENABLED = os.getenv("ATTEMPT_SWEEPER_ENABLED", "true").lower() == "true"
+    ATTEMPT_SWEEP_INTERVAL = float(os.getenv("ATTEMPT_SWEEP_INTERVAL", 60))
+    ATTEMPT_SWEEP_BATCH_SIZE = int(os.getenv("ATTEMPT_SWEEP_BATCH_SIZE", 500))
+
+    # Индекс мест лидерборда в памяти: период пересборки из базы (0 - только при старте)
+    RANK_INDEX_REFRESH_INTERVAL = float(os.getenv("RANK_INDEX_REFRESH_INTERVAL", 300))
+
+    # Снапшот топа лидерборда: период пересборки, возраст, после которого отвечаем живыми запросами, размер
+    LEADERBOARD_SNAPSHOT_INTERVAL = float(os.getenv("LEADERBOARD_SNAPSHOT_INTERVAL", 60))
+    LEADERBOARD_SNAPSHOT_MAX_AGE = float(os.getenv("LEADERBOARD_SNAPSHOT_MAX_AGE", 300))
+    LEADERBOARD_SNAPSHOT_SIZE = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", 10000))
+
+    # Лидерборды за неделю/месяц и по предметам: сколько секунд кэшировать собранный топ
+    LEADERBOARD_WINDOW_CACHE_TTL = float(os.getenv("LEADERBOARD_WINDOW_CACHE_TTL", 60))
+
+    # bcrypt вне event loop: пул "thread" или "process", его размер и число одновременных хешей
+    PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+    PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", (os.cpu_count() or 2) * 2))
+
+    # Кэш проверенных JWT (записей; 0 - выключен)
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+    # Кэш пользователей для профиля и авторизации
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 50000))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+
+    # Генерация квизов: модель и кэш ответов LLM по нормализованному запросу
+    LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
+    OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+    OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL")
+    GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", 1000))
+    GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", 24 * 3600))
+
+    # Параллельная генерация: число частей (1 - одним запросом, по умолчанию) и порог похожести вопросов-дублей
+    GENERATION_FANOUT_CHUNKS = int(os.getenv("GENERATION_FANOUT_CHUNKS", 1))
+    GENERATION_DEDUP_THRESHOLD = float(os.getenv("GENERATION_DEDUP_THRESHOLD", 0.8))
+
+    # Пул заготовленных квизов: прогрев (включать в одном процессе; забирают из пула все),
+    # темы сверх QuizSubject (через запятую), запас на тему, бюджет генераций в час,
+    # часы низкой нагрузки ("1-7", по времени сервера) и период прогрева
+    GENERATION_POOL_WARMER = os.getenv("GENERATION_POOL_WARMER", "false").lower() == "true"
+    GENERATION_POOL_TOPICS = [topic.strip() for topic in os.getenv("GENERATION_POOL_TOPICS", "").split(",") if topic.strip()]
+    GENERATION_POOL_TARGET_STOCK = int(os.getenv("GENERATION_POOL_TARGET_STOCK", 3))
+    GENERATION_POOL_RATE_PER_HOUR = int(os.getenv("GENERATION_POOL_RATE_PER_HOUR", 30))
+    GENERATION_POOL_OFFPEAK_HOURS = os.getenv("GENERATION_POOL_OFFPEAK_HOURS", "1-7")
+    GENERATION_POOL_INTERVAL = float(os.getenv("GENERATION_POOL_INTERVAL", 60))
+
+    # Клиент LLM: таймауты (секунды), размер пула соединений, повторы на 429/5xx
+    # и общий на процесс предел одновременных запросов к модели
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 120))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+    LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 10))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+    # Очередь задач генерации: воркеры, лимиты, таймауты и число повторов упавшей задачи
+    GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", 4))
+    GENERATION_PER_USER_LIMIT = int(os.getenv("GENERATION_PER_USER_LIMIT", 2))
+    GENERATION_QUEUE_MAX_DEPTH = int(os.getenv("GENERATION_QUEUE_MAX_DEPTH", 200))
+    GENERATION_JOB_TIMEOUT = float(os.getenv("GENERATION_JOB_TIMEOUT", 180))
+    GENERATION_JOB_MAX_ATTEMPTS = int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", 3))
+    GENERATION_POLL_INTERVAL = float(os.getenv("GENERATION_POLL_INTERVAL", 1))
+    GENERATION_LONG_POLL_MAX = float(os.getenv("GENERATION_LONG_POLL_MAX", 30))
+
 
 settings = Settings()
@@ -0,0 +1,121 @@
+import asyncio
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from beanie import PydanticObjectId
+
+from src import scoring
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.enums import QuestionType
+from src.models.question import Question
+from src.models.quiz_session import UserQuizAttempt
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """Ключ ответа на вопрос + данные, нужные для записи в банк ошибок"""
+    type: QuestionType
+    correct_mask: int
+    question_text: str
+    options: List[dict]
+    subject: Optional[str] = None
+
+    @classmethod
+    def from_question(cls, question: Question) -> "AnswerKey":
+        return cls(
+            type=question.type,
+            correct_mask=scoring.correct_mask(question.options),
+            question_text=question.question_text,
+            options=[
+                {"label": opt.label, "option_text": opt.option_text, "is_correct": opt.is_correct}
+                for opt in question.options
+            ],
+            subject=question.subject,
+        )
+
+    def size(self) -> int:
+        """Приблизительный размер записи в байтах"""
+        return (
+            200
+            + sys.getsizeof(self.question_text)
+            + sum(sys.getsizeof(opt["option_text"]) + 150 for opt in self.options)
+        )
+
+
+class AnswerKeyCache:
+    """LRU-кэш ключей ответов, ограниченный бюджетом памяти.
+
+    Ключи хранятся группами: все вопросы квиза или вопросы собранного
+    варианта попытки. Группа грузится одним запросом при первом обращении и
+    сбрасывается при добавлении вопроса в квиз.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._quizzes: "OrderedDict[PydanticObjectId, Dict[PydanticObjectId, AnswerKey]]" = OrderedDict()
+        self._sizes: Dict[PydanticObjectId, int] = {}
+        self._locks: Dict[PydanticObjectId, asyncio.Lock] = {}
+        self._bytes = 0
+
+    async def get(self, quiz_id: PydanticObjectId, question_id: PydanticObjectId) -> Optional[AnswerKey]:
+        return await self._get(quiz_id, {"quiz_id": quiz_id}, question_id)
+
+    async def get_for_attempt(self, attempt: UserQuizAttempt, question_id: PydanticObjectId) -> Optional[AnswerKey]:
+        """Ключ вопроса попытки; вопросы варианта берутся из разных квизов и кэшируются по id попытки"""
+        if attempt.question_ids is None:
+            return await self.get(attempt.quiz_id, question_id)
+        return await self._get(attempt.id, {"_id": {"$in": attempt.question_ids}}, question_id)
+
+    async def _get(self, group_id: PydanticObjectId, query: dict, question_id: PydanticObjectId) -> Optional[AnswerKey]:
+        group = self._quizzes.get(group_id)
+        if group is None:
+            group = await self._load(group_id, query)
+        else:
+            self._quizzes.move_to_end(group_id)
+
+        answer_key = group.get(question_id)
+        metrics.inc("answer_key_cache.hits" if answer_key else "answer_key_cache.misses")
+        return answer_key
+
+    def invalidate(self, quiz_id: PydanticObjectId):
+        if quiz_id in self._quizzes:
+            del self._quizzes[quiz_id]
+            self._bytes -= self._sizes.pop(quiz_id)
+            self._report()
+
+    async def _load(self, group_id: PydanticObjectId, query: dict) -> Dict[PydanticObjectId, AnswerKey]:
+        lock = self._locks.setdefault(group_id, asyncio.Lock())
+        async with lock:
+            # Группу мог загрузить конкурентный запрос, пока мы ждали лок
+            if group_id in self._quizzes:
+                return self._quizzes[group_id]
+
+            questions = await Question.find(query).to_list()
+            metrics.inc("answer_key_cache.loads")
+            group = {q.id: AnswerKey.from_question(q) for q in questions}
+            size = sum(key.size() for key in group.values())
+
+            self._quizzes[group_id] = group
+            self._sizes[group_id] = size
+            self._bytes += size
+            self._evict()
+        self._locks.pop(group_id, None)
+        return group
+
+    def _evict(self):
+        # Последний загруженный квиз не вытесняем, даже если он один больше бюджета
+        while self._bytes > self.max_bytes and len(self._quizzes) > 1:
+            quiz_id, _ = self._quizzes.popitem(last=False)
+            self._bytes -= self._sizes.pop(quiz_id)
+            metrics.inc("answer_key_cache.evictions")
+        self._report()
+
+    def _report(self):
+        metrics.set_gauge("answer_key_cache.bytes", self._bytes)
+        metrics.set_gauge("answer_key_cache.quizzes", len(self._quizzes))
+
+
+answer_key_cache = AnswerKeyCache(settings.ANSWER_KEY_CACHE_BYTES)
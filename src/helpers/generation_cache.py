@@ -0,0 +1,87 @@
+import asyncio
+import copy
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from src.core.settings import settings
+from src.helpers.llm import PROMPT_FINGERPRINT
+from src.helpers.metrics import metrics
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(user_prompt: str) -> str:
+    """NFKC + casefold + схлопывание пробелов: "  Физика   МЕХАНИКА" == "физика механика" """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", user_prompt).casefold()).strip()
+
+
+def generation_key(user_prompt: str) -> str:
+    raw = f"{PROMPT_FINGERPRINT}|{normalize_prompt(user_prompt)}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+class GenerationCache:
+    """TTL + LRU кэш ответов LLM по нормализованному запросу.
+
+    Хранится разобранный JSON квиза, из которого для каждого пользователя
+    собирается своя копия GeneratedQuiz. Одинаковые запросы, пришедшие пока
+    генерация идет, ждут одну и ту же задачу вызова LLM; она доводится до
+    конца, даже если запрос, начавший ее, отменен.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        """Копия закэшированного ответа без генерации"""
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            metrics.inc("generation_cache.hits")
+            return copy.deepcopy(entry[0])
+        return None
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[dict]]) -> dict:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            metrics.inc("generation_cache.coalesced")
+        else:
+            metrics.inc("generation_cache.misses")
+            task = self._in_flight[key] = asyncio.create_task(self._generate(key, generate))
+            # Ожидающих может не остаться - не даем asyncio ругаться на непрочитанную ошибку
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        # Генерация - общая задача: отмена любого ожидающего, в том числе начавшего ее, не отменяет ее для остальных
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _generate(self, key: str, generate: Callable[[], Awaitable[dict]]) -> dict:
+        try:
+            quiz_data = await generate()
+        finally:
+            del self._in_flight[key]
+        # Неполный результат (часть генерации упала) не кэшируем - следующий запрос попробует снова
+        if not quiz_data.get("partial"):
+            self.put(key, quiz_data)
+        return quiz_data
+
+    def put(self, key: str, quiz_data: dict):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (quiz_data, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("generation_cache.entries", len(self._entries))
+
+
+generation_cache = GenerationCache(settings.GENERATION_CACHE_SIZE, settings.GENERATION_CACHE_TTL)
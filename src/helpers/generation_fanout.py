@@ -0,0 +1,74 @@
+import re
+from typing import Iterable, List, Optional, Set
+
+from src.helpers.generation_cache import normalize_prompt
+from src.models.generated_quiz import QuestionType
+
+# Подсказки под-тем для параллельных частей, чтобы части не повторяли друг друга
+SUBTOPIC_HINTS = [
+    "основные понятия, определения и термины",
+    "ключевые факты, даты, имена и числа",
+    "причины, следствия и закономерности",
+    "применение на практике и решение задач",
+    "сравнение, классификация и анализ",
+    "типичные ошибки и заблуждения",
+]
+
+OPTION_COUNTS = {QuestionType.SINGLE_CHOICE.value: 4, QuestionType.MULTIPLE_CHOICE.value: 8}
+
+_WORD = re.compile(r"\w+")
+
+
+def split_counts(total: int, chunks: int) -> List[int]:
+    """20 на 4 части -> [5, 5, 5, 5]; 22 на 4 -> [6, 6, 5, 5]"""
+    chunks = max(1, min(chunks, total))
+    base, extra = divmod(total, chunks)
+    return [base + 1 if i < extra else base for i in range(chunks)]
+
+
+def subtopic_hint(index: int, chunks: int) -> Optional[str]:
+    if chunks <= 1:
+        return None
+    return SUBTOPIC_HINTS[index % len(SUBTOPIC_HINTS)]
+
+
+def is_valid_question(question_data: dict) -> bool:
+    """Тип, текст, число вариантов, уникальные метки и правильные ответы как требует промпт"""
+    if not isinstance(question_data, dict):
+        return False
+    question_type = question_data.get("type")
+    text = question_data.get("question_text")
+    options = question_data.get("options")
+    if question_type not in OPTION_COUNTS or not isinstance(text, str) or not text.strip():
+        return False
+    if not isinstance(options, list) or len(options) != OPTION_COUNTS[question_type]:
+        return False
+    if not all(isinstance(option, dict) and option.get("label") and option.get("option_text") for option in options):
+        return False
+    if len({option["label"] for option in options}) != len(options):
+        return False
+    correct = sum(1 for option in options if option.get("is_correct") is True)
+    if question_type == QuestionType.SINGLE_CHOICE.value:
+        return correct == 1
+    return correct >= 1
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD.findall(normalize_prompt(text)))
+
+
+def dedupe_questions(questions: Iterable[dict], threshold: float) -> List[dict]:
+    """Убирает почти одинаковые вопросы: сходство Жаккара по словам текста >= threshold"""
+    kept, kept_words = [], []
+    for question in questions:
+        words = _words(question["question_text"])
+        duplicate = any(
+            len(words & other) / len(words | other) >= threshold
+            for other in kept_words
+            if words or other
+        )
+        if not duplicate:
+            kept.append(question)
+            kept_words.append(words)
+    return kept
+
@@ -0,0 +1,93 @@
+import json
+from typing import List, Optional
+
+
+class QuizStreamParser:
+    """Инкрементальный разбор JSON квиза из потока токенов LLM.
+
+    feed() принимает очередной кусок текста и возвращает вопросы из массива
+    "questions", чьи объекты уже закрылись. Строковые поля верхнего уровня
+    (title, subject) складываются в meta, как только их значение дописано.
+    Текст до первой "{" (например, ```json) игнорируется; document() отдает
+    весь объект, только когда он закрылся и разбирается как JSON.
+    """
+
+    def __init__(self):
+        self.meta: dict = {}
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._key = None
+        self._expecting_value = False
+        self._in_questions = False
+        self._object_start = 0
+        self._document_start: Optional[int] = None
+        self._document_end: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._text += chunk
+        questions = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._on_top_level_string(json.loads(text[self._string_start:i + 1]))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if self._depth == 0 and c == "{" and self._document_start is None:
+                    self._document_start = i
+                if self._depth == 1:
+                    self._in_questions = c == "[" and self._key == "questions"
+                    self._expecting_value = False
+                self._depth += 1
+                if self._in_questions and self._depth == 3 and c == "{":
+                    self._object_start = i
+            elif c in "}]":
+                if self._in_questions and self._depth == 3 and c == "}":
+                    questions.append(json.loads(text[self._object_start:i + 1]))
+                self._depth -= 1
+                if self._depth == 1:
+                    self._in_questions = False
+                elif self._depth == 0 and self._document_start is not None and self._document_end is None:
+                    self._document_end = i + 1
+            elif self._depth == 1:
+                if c == ":":
+                    self._expecting_value = True
+                elif c == ",":
+                    self._expecting_value = False
+        self._pos = len(text)
+        return questions
+
+    def document(self) -> Optional[dict]:
+        """Весь JSON квиза, если верхний объект закрылся и разбирается; иначе None"""
+        if self._document_end is None:
+            return None
+        try:
+            return json.loads(self._text[self._document_start:self._document_end])
+        except ValueError:
+            return None
+
+    def _on_top_level_string(self, value: str):
+        if self._expecting_value:
+            self.meta[self._key] = value
+            self._expecting_value = False
+        else:
+            self._key = value
@@ -0,0 +1,152 @@
+import asyncio
+import base64
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.user import User
+
+# (rank, user_id, first_name, last_name, total_score, profile_photo)
+Entry = Tuple[int, ObjectId, str, str, float, Optional[str]]
+
+LEADERBOARD_PROJECTION = {"first_name": 1, "last_name": 1, "total_score": 1, "profile_photo": 1}
+LEADERBOARD_SORT = [("total_score", -1), ("_id", 1)]
+
+
+def encode_cursor(version: int, offset: int, score: float, user_id: ObjectId) -> str:
+    raw = f"{version}|{offset}|{score}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, float, ObjectId]:
+    """(версия снапшота, смещение, total_score и _id последней строки страницы)"""
+    try:
+        version, offset, score, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return int(version), int(offset), float(score), ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def entry_to_dict(entry: Entry) -> dict:
+    rank, user_id, first_name, last_name, total_score, profile_photo = entry
+    return {
+        "rank": rank,
+        "id": str(user_id),
+        "first_name": first_name,
+        "last_name": last_name,
+        "total_score": total_score,
+        "profile_photo": profile_photo,
+    }
+
+
+@dataclass(frozen=True)
+class LeaderboardSnapshot:
+    """Неизменяемый отсортированный срез лидерборда: (total_score desc, _id asc)"""
+    version: int
+    built_at: float
+    users_count: int
+    complete: bool  # в снапшот вошли все пользователи
+    entries: Tuple[Entry, ...]
+    # Ключи (-total_score, _id) для поиска позиции курсора из другой версии
+    _keys: List[Tuple[float, ObjectId]] = field(repr=False, compare=False)
+
+    def age(self) -> float:
+        return time.monotonic() - self.built_at
+
+    def covers(self, offset: int, limit: int) -> bool:
+        return self.complete or offset + limit <= len(self.entries)
+
+    def page(self, offset: int, limit: int) -> Tuple[Entry, ...]:
+        return self.entries[offset:offset + limit]
+
+    def offset_after(self, score: float, user_id: ObjectId) -> int:
+        """Позиция сразу после строки (score, user_id) - для курсоров прошлых версий"""
+        return bisect.bisect_right(self._keys, (-score, user_id))
+
+
+class LeaderboardSnapshots:
+    """Периодически пересобираемый снапшот топа лидерборда.
+
+    Страница по смещению или курсору - срез готового кортежа, без skip и count
+    в Mongo. Снапшот хранит только первые size пользователей; страницы дальше
+    и запросы при устаревшем снапшоте обслуживаются живыми запросами.
+    """
+
+    def __init__(self, refresh_interval: float, max_age: float, size: int):
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.size = size
+        self.snapshot: Optional[LeaderboardSnapshot] = None
+        self._version = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def current(self) -> Optional[LeaderboardSnapshot]:
+        """Снапшот, если он есть и не старше max_age"""
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.age() > self.max_age:
+            return None
+        return snapshot
+
+    async def start(self):
+        await self.rebuild()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def rebuild(self):
+        started = time.perf_counter()
+        collection = User.get_motor_collection()
+        entries, keys = [], []
+        rank, previous_score = 0, None
+        cursor = collection.find({}, LEADERBOARD_PROJECTION).sort(LEADERBOARD_SORT).limit(self.size)
+        async for doc in cursor:
+            score = doc.get("total_score", 0)
+            if score != previous_score:
+                rank, previous_score = len(entries) + 1, score
+            entries.append((
+                rank, doc["_id"], doc.get("first_name"), doc.get("last_name"), score, doc.get("profile_photo"),
+            ))
+            keys.append((-score, doc["_id"]))
+        users_count = await collection.estimated_document_count()
+
+        self._version += 1
+        self.snapshot = LeaderboardSnapshot(
+            version=self._version,
+            built_at=time.monotonic(),
+            users_count=users_count,
+            complete=len(entries) < self.size,
+            entries=tuple(entries),
+            _keys=keys,
+        )
+        metrics.inc("leaderboard_snapshot.rebuilds")
+        metrics.set_gauge("leaderboard_snapshot.entries", len(entries))
+        metrics.observe("leaderboard_snapshot.build_latency", time.perf_counter() - started)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logging.error(f"Leaderboard snapshot rebuild failed: {e}")
+
+
+leaderboard_snapshots = LeaderboardSnapshots(
+    refresh_interval=settings.LEADERBOARD_SNAPSHOT_INTERVAL,
+    max_age=settings.LEADERBOARD_SNAPSHOT_MAX_AGE,
+    size=settings.LEADERBOARD_SNAPSHOT_SIZE,
+)
@@ -60,34 +60,186 @@ Important Notes:
 - Do not use code blocks, quotation marks, or any symbols outside of standard JSON syntax.
 """
 
-import json
-import os
-from dotenv import load_dotenv
-from fastapi import HTTPException
-from openai import AsyncOpenAI
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+
+# Меняется вместе с моделью или системным промптом - старые ответы в кэше перестают совпадать
+PROMPT_FINGERPRINT = hashlib.blake2b(f"{settings.LLM_MODEL}|{prompt}".encode(), digest_size=8).hexdigest()
+
+QUESTIONS_COUNT = 20
+
+T = TypeVar("T")
+
 
 class LLMClient:
+    """Один клиент LLM на процесс: общий пул keep-alive соединений httpx,
+    таймауты на соединение и чтение, повторы на 429/5xx с экспоненциальной
+    задержкой и джиттером. Создается в lifespan, до старта - лениво.
 
-    def __init__(self):
-        load_dotenv()
-        self.openai = AsyncOpenAI(
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url=os.getenv("OPENROUTER_BASE_URL")
-        )
-            
-    async def generate_response(self,user_prompt: str):
-        try:
-            messages = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f'20 вопросов по - {user_prompt}'}
-            ]            
-            response = await self.openai.chat.completions.create(
-                model='openai/gpt-4o-mini',
-                messages=messages
+    max_concurrency - глобальный предел одновременных запросов к модели на
+    процесс: его делят очередь задач, SSE-поток, части fan-out и прогрев пула.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        max_concurrency: int,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._openai: Optional[AsyncOpenAI] = None
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        if self._openai is None:
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            # Повторы делаем сами, чтобы считать их и управлять задержкой
+            self._openai = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0,
             )
-            llm_response = response.choices[0].message.content
-            return llm_response
-        except json.JSONDecodeError:
-            return {"response": llm_response, "error": "Response is not in JSON format."}
-        except Exception as e:
-            raise e
\ No newline at end of file
+        return self._openai
+
+    async def start(self):
+        self.openai
+
+    async def stop(self):
+        if self._openai is not None:
+            await self._openai.close()
+            self._openai = None
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Место среди max_concurrency запросов; держится до конца ответа или потока"""
+        queued = time.perf_counter()
+        async with self._semaphore:
+            metrics.observe("llm.queue_wait", time.perf_counter() - queued)
+            self._in_flight += 1
+            metrics.set_gauge("llm.in_flight", self._in_flight)
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+                metrics.set_gauge("llm.in_flight", self._in_flight)
+
+    @staticmethod
+    def _messages(user_prompt: str, count: int = QUESTIONS_COUNT, hint: Optional[str] = None):
+        user_message = f'{count} вопросов по - {user_prompt}'
+        if hint:
+            user_message += f'. Только вопросы на аспект: {hint}'
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_message}
+        ]
+
+    async def stream_response(self, user_prompt: str) -> AsyncIterator[str]:
+        """Ответ модели по кускам текста по мере генерации (stream=True).
+
+        Повторяется только открытие потока: после первого куска ошибка уходит вызывающему.
+        """
+        started = time.perf_counter()
+        async with self._slot():
+            stream = await self._with_retries(lambda: self.openai.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=self._messages(user_prompt),
+                stream=True,
+            ))
+            first = True
+            # Закрывает ответ и возвращает соединение в пул, даже если клиент SSE ушел раньше конца
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first:
+                            metrics.observe("llm.first_token_latency", time.perf_counter() - started)
+                            first = False
+                        yield chunk.choices[0].delta.content
+        metrics.observe("llm.stream_latency", time.perf_counter() - started)
+
+    async def generate_response(self, user_prompt: str, count: int = QUESTIONS_COUNT, hint: Optional[str] = None) -> str:
+        """Полный ответ модели: count вопросов, hint сужает их до под-темы"""
+        started = time.perf_counter()
+        async with self._slot():
+            response = await self._with_retries(lambda: self.openai.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=self._messages(user_prompt, count, hint),
+            ))
+        metrics.observe("llm.latency", time.perf_counter() - started)
+        return response.choices[0].message.content
+
+    async def _with_retries(self, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await call()
+                metrics.observe("llm.request_latency", time.perf_counter() - started)
+                return result
+            except (APIStatusError, APIConnectionError) as e:
+                status = getattr(e, "status_code", None)
+                retryable = status is None or status == 429 or status >= 500
+                metrics.inc(f"llm.errors.{status or type(e).__name__}")
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                metrics.inc("llm.retries")
+                logging.warning(f"LLM request failed ({status or type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full jitter: случайно от 0 до base * 2^attempt; Retry-After от 429 - нижняя граница"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if isinstance(error, APIStatusError):
+            try:
+                delay = max(delay, min(float(error.response.headers.get("retry-after", 0)), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+
+llm_client = LLMClient(
+    api_key=settings.OPENROUTER_API_KEY,
+    base_url=settings.OPENROUTER_BASE_URL,
+    connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+    read_timeout=settings.LLM_READ_TIMEOUT,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE,
+    backoff_max=settings.LLM_BACKOFF_MAX,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+)
+
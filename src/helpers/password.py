@@ -1,5 +1,14 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
 from passlib.context import CryptContext
 
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+
 
 class PasswordHandler:
     pwd_context = CryptContext(
@@ -7,6 +16,10 @@ class PasswordHandler:
         deprecated="auto",
     )
 
+    _executor: Optional[Executor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _waiting = 0
+
     @staticmethod
     def hash(password: str):
         return PasswordHandler.pwd_context.hash(password)
@@ -14,3 +27,59 @@ class PasswordHandler:
     @staticmethod
     def verify(hashed_password, plain_password):
         return PasswordHandler.pwd_context.verify(plain_password, hashed_password)
+
+    @staticmethod
+    async def hash_async(password: str) -> str:
+        """hash() в пуле, не блокируя event loop"""
+        return await PasswordHandler._run("hash", PasswordHandler.hash, password)
+
+    @staticmethod
+    async def verify_async(hashed_password, plain_password) -> bool:
+        """verify() в пуле, не блокируя event loop"""
+        return await PasswordHandler._run("verify", PasswordHandler.verify, hashed_password, plain_password)
+
+    @staticmethod
+    async def _run(operation: str, func, *args):
+        # Семафор ограничивает число bcrypt в работе; ждущие за ним - глубина очереди
+        if PasswordHandler._semaphore is None:
+            PasswordHandler._semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+        queued = time.perf_counter()
+        PasswordHandler._waiting += 1
+        metrics.set_gauge("password.queue_depth", PasswordHandler._waiting)
+        try:
+            await PasswordHandler._semaphore.acquire()
+        finally:
+            PasswordHandler._waiting -= 1
+            metrics.set_gauge("password.queue_depth", PasswordHandler._waiting)
+
+        try:
+            started = time.perf_counter()
+            metrics.observe("password.queue_wait", started - queued)
+            result = await asyncio.get_running_loop().run_in_executor(PasswordHandler._get_executor(), func, *args)
+            metrics.observe(f"password.{operation}_latency", time.perf_counter() - started)
+            return result
+        finally:
+            PasswordHandler._semaphore.release()
+
+    @staticmethod
+    def shutdown():
+        """Останавливает пул при завершении приложения; следующий вызов создаст новый"""
+        if PasswordHandler._executor is not None:
+            PasswordHandler._executor.shutdown(wait=True, cancel_futures=True)
+            PasswordHandler._executor = None
+
+    @staticmethod
+    def _get_executor() -> Executor:
+        if PasswordHandler._executor is None:
+            if settings.PASSWORD_HASH_EXECUTOR == "process":
+                PasswordHandler._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                PasswordHandler._executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="bcrypt",
+                )
+        return PasswordHandler._executor
+
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Tuple
+
+from beanie import PydanticObjectId
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+
+
+class QuestionPayloadCache:
+    """Кэш уже сериализованного списка вопросов квиза (без ответов) с ETag.
+
+    ETag - хэш содержимого, поэтому разные воркеры с одинаковыми данными
+    отдают одинаковый ETag. Запись живет ttl секунд и сбрасывается при
+    добавлении вопроса в квиз.
+    """
+
+    def __init__(self, max_quizzes: int, ttl: float):
+        self.max_quizzes = max_quizzes
+        self.ttl = ttl
+        self._entries: "OrderedDict[PydanticObjectId, Tuple[bytes, str, float]]" = OrderedDict()
+        self._locks: Dict[PydanticObjectId, asyncio.Lock] = {}
+
+    async def get(
+        self,
+        quiz_id: PydanticObjectId,
+        build: Callable[[], Awaitable[bytes]],
+    ) -> Tuple[bytes, str]:
+        entry = self._fresh(quiz_id)
+        if entry:
+            metrics.inc("question_payload_cache.hits")
+            return entry
+
+        # Один запрос в Mongo на квиз, даже если весь поток пришел одновременно
+        lock = self._locks.setdefault(quiz_id, asyncio.Lock())
+        async with lock:
+            entry = self._fresh(quiz_id)
+            if entry:
+                metrics.inc("question_payload_cache.hits")
+                return entry
+
+            metrics.inc("question_payload_cache.misses")
+            payload = await build()
+            etag = '"' + hashlib.blake2b(payload, digest_size=12).hexdigest() + '"'
+            self._entries[quiz_id] = (payload, etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_quizzes:
+                self._entries.popitem(last=False)
+        self._locks.pop(quiz_id, None)
+        return payload, etag
+
+    def invalidate(self, quiz_id: PydanticObjectId):
+        self._entries.pop(quiz_id, None)
+
+    def _fresh(self, quiz_id: PydanticObjectId):
+        entry = self._entries.get(quiz_id)
+        if not entry:
+            return None
+        payload, etag, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[quiz_id]
+            return None
+        self._entries.move_to_end(quiz_id)
+        return payload, etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Проверка заголовка If-None-Match (список тегов, W/-префикс или *)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+question_payload_cache = QuestionPayloadCache(
+    settings.QUESTION_PAYLOAD_CACHE_SIZE,
+    settings.QUESTION_PAYLOAD_CACHE_TTL,
+)
+
@@ -0,0 +1,55 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Tuple
+
+from beanie import PydanticObjectId
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.question import Question
+
+
+class QuestionPool:
+    """Кэш ID вопросов по предметам для быстрой сборки вариантов.
+
+    Для каждого предмета хранятся параллельные массивы ID и типов вопросов,
+    поэтому выборка стоит O(запрошенных), а не $sample по всей коллекции.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._pools: Dict[str, Tuple[List[PydanticObjectId], List[str], float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def sample(self, subject: str, count: int) -> List[Tuple[PydanticObjectId, str]]:
+        """Случайные (id, type) без повторов; если вопросов меньше count - все доступные"""
+        ids, types = await self._get(subject)
+        indexes = random.sample(range(len(ids)), min(count, len(ids)))
+        return [(ids[i], types[i]) for i in indexes]
+
+    def invalidate(self, subject: str):
+        self._pools.pop(subject, None)
+
+    async def _get(self, subject: str) -> Tuple[List[PydanticObjectId], List[str]]:
+        pool = self._pools.get(subject)
+        if pool and pool[2] > time.monotonic():
+            metrics.inc("question_pool.hits")
+            return pool[0], pool[1]
+
+        lock = self._locks.setdefault(subject, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(subject)
+            if pool and pool[2] > time.monotonic():
+                return pool[0], pool[1]
+
+            metrics.inc("question_pool.loads")
+            ids, types = [], []
+            async for doc in Question.get_motor_collection().find({"subject": subject}, {"_id": 1, "type": 1}):
+                ids.append(doc["_id"])
+                types.append(doc["type"])
+            self._pools[subject] = (ids, types, time.monotonic() + self.ttl)
+        return ids, types
+
+
+question_pool = QuestionPool(settings.QUESTION_POOL_TTL)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.user import User
+
+
+class RankIndex:
+    """Order-statistic индекс лидерборда в памяти.
+
+    Дерево Фенвика по целочисленным корзинам total_score: count_greater(score)
+    и поиск k-й корзины стоят O(log max_score), так что место пользователя
+    считается без range count по коллекции users. Место - как в
+    get_user_rank: 1 + число пользователей со строго большим счетом.
+    """
+
+    def __init__(self):
+        self._scores: Dict[ObjectId, int] = {}
+        self._buckets: Dict[int, Set[ObjectId]] = {}
+        self._capacity = 1
+        self._tree = [0] * (self._capacity + 1)
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def build(self, items: Iterable[Tuple[ObjectId, float]]):
+        """Строит индекс заново за O(n + max_score)"""
+        scores, buckets = {}, {}
+        for user_id, score in items:
+            score = self._bucket(score)
+            scores[user_id] = score
+            buckets.setdefault(score, set()).add(user_id)
+        self._scores, self._buckets = scores, buckets
+        self._rebuild_tree(max(buckets, default=0) + 1)
+        self.ready = True
+
+    def set_score(self, user_id: ObjectId, score: float):
+        score = self._bucket(score)
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._discard(user_id, old)
+        self._scores[user_id] = score
+        self._buckets.setdefault(score, set()).add(user_id)
+        if score >= self._capacity:
+            self._rebuild_tree(score + 1)
+        else:
+            self._update(score, 1)
+
+    def add_score(self, user_id: ObjectId, delta: float):
+        self.set_score(user_id, self._scores.get(user_id, 0) + delta)
+
+    def remove(self, user_id: ObjectId):
+        score = self._scores.pop(user_id, None)
+        if score is not None:
+            self._discard(user_id, score)
+
+    def score_of(self, user_id: ObjectId) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def count_greater(self, score: float) -> int:
+        return len(self._scores) - self._prefix(self._bucket(score))
+
+    def rank(self, user_id: ObjectId) -> Optional[int]:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self.count_greater(score) + 1
+
+    def around(self, user_id: ObjectId, count: int) -> List[Tuple[int, ObjectId, int]]:
+        """(rank, user_id, score) пользователя, до count соседей выше и до count ниже по счету"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return []
+        above: List[Tuple[int, ObjectId, int]] = []
+        bucket = score
+        while len(above) < count:
+            bucket = self._next_above(bucket)
+            if bucket is None:
+                break
+            rank = self.count_greater(bucket) + 1
+            above.extend((rank, uid, bucket) for uid in islice(self._buckets[bucket], count - len(above)))
+
+        below: List[Tuple[int, ObjectId, int]] = []
+        bucket = score
+        while len(below) < count:
+            bucket = self._next_below(bucket)
+            if bucket is None:
+                break
+            rank = self.count_greater(bucket) + 1
+            below.extend((rank, uid, bucket) for uid in islice(self._buckets[bucket], count - len(below)))
+
+        return above[::-1] + [(self.count_greater(score) + 1, user_id, score)] + below
+
+    @staticmethod
+    def _bucket(score: float) -> int:
+        return max(int(score), 0)
+
+    def _discard(self, user_id: ObjectId, score: int):
+        bucket = self._buckets[score]
+        bucket.discard(user_id)
+        if not bucket:
+            del self._buckets[score]
+        self._update(score, -1)
+
+    def _next_above(self, score: int) -> Optional[int]:
+        """Ближайшая непустая корзина строго выше score"""
+        below_or_equal = self._prefix(score)
+        if below_or_equal >= len(self._scores):
+            return None
+        return self._find_kth(below_or_equal + 1)
+
+    def _next_below(self, score: int) -> Optional[int]:
+        """Ближайшая непустая корзина строго ниже score"""
+        if score <= 0:
+            return None
+        below = self._prefix(score - 1)
+        if not below:
+            return None
+        return self._find_kth(below)
+
+    def _rebuild_tree(self, size: int):
+        capacity = 1
+        while capacity < size:
+            capacity *= 2
+        tree = [0] * (capacity + 1)
+        for score, users in self._buckets.items():
+            tree[score + 1] = len(users)
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._capacity, self._tree = capacity, tree
+
+    def _update(self, score: int, delta: int):
+        i = score + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, score: int) -> int:
+        """Число пользователей со счетом <= score"""
+        i = min(score + 1, self._capacity)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find_kth(self, k: int) -> int:
+        """Корзина k-го по возрастанию пользователя (k от 1)"""
+        position, step = 0, self._capacity
+        while step:
+            nxt = position + step
+            if nxt <= self._capacity and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step //= 2
+        return position
+
+
+class LeaderboardRanks:
+    """RankIndex, загруженный из users при старте и периодически сверяемый с базой.
+
+    Локальные начисления применяются сразу через ScoreService; периодическая
+    пересборка подтягивает изменения, сделанные другими воркерами.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.index = RankIndex()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.reload()
+        if self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def reload(self):
+        started = time.perf_counter()
+        items = [
+            (doc["_id"], doc.get("total_score", 0))
+            async for doc in User.get_motor_collection().find({}, {"total_score": 1})
+        ]
+        index = RankIndex()
+        index.build(items)
+        self.index = index
+        metrics.set_gauge("rank_index.users", len(index))
+        metrics.observe("rank_index.build_latency", time.perf_counter() - started)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logging.error(f"Rank index reload failed: {e}")
+
+
+leaderboard_ranks = LeaderboardRanks(settings.RANK_INDEX_REFRESH_INTERVAL)
+
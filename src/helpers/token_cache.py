@@ -0,0 +1,48 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+
+
+class VerifiedTokenCache:
+    """LRU проверенных JWT: ключ - хеш токена, запись живет до exp токена.
+
+    Сам токен в памяти не хранится, только его blake2b-дайджест и payload.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics.inc("token_cache.misses")
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            metrics.inc("token_cache.misses")
+            return None
+        self._entries.move_to_end(key)
+        metrics.inc("token_cache.hits")
+        return payload
+
+    def put(self, key: bytes, payload: dict):
+        expires_at = payload.get("exp")
+        if not expires_at or self.max_size <= 0:
+            return
+        self._entries[key] = (payload, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.user import User
+
+USER_PROJECTION = {"email": 1, "first_name": 1, "last_name": 1, "role": 1, "total_score": 1, "profile_photo": 1}
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Компактная проекция пользователя без пароля"""
+    id: PydanticObjectId
+    email: str
+    first_name: str
+    last_name: str
+    role: str
+    total_score: float
+    profile_photo: Optional[str]
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "CachedUser":
+        return cls(
+            id=PydanticObjectId(doc["_id"]),
+            email=doc.get("email"),
+            first_name=doc.get("first_name"),
+            last_name=doc.get("last_name"),
+            role=doc.get("role"),
+            total_score=doc.get("total_score", 0),
+            profile_photo=doc.get("profile_photo"),
+        )
+
+
+class UserCache:
+    """Read-through TTL + LRU кэш пользователей для профиля и авторизации.
+
+    Сбрасывается при изменении профиля, фото и начислении баллов; если
+    сброс пришел во время загрузки, загруженное значение не кэшируется.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[PydanticObjectId, Tuple[CachedUser, float]]" = OrderedDict()
+        self._loading: Dict[PydanticObjectId, object] = {}
+
+    async def get(self, user_id: PydanticObjectId) -> Optional[CachedUser]:
+        user_id = PydanticObjectId(user_id)
+        entry = self._entries.get(user_id)
+        if entry and entry[1] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            metrics.inc("user_cache.hits")
+            return entry[0]
+
+        metrics.inc("user_cache.misses")
+        marker = self._loading[user_id] = object()
+        try:
+            doc = await User.get_motor_collection().find_one({"_id": user_id}, USER_PROJECTION)
+            user = CachedUser.from_doc(doc) if doc else None
+            if user and self._loading.get(user_id) is marker:
+                self._entries[user_id] = (user, time.monotonic() + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            return user
+        finally:
+            if self._loading.get(user_id) is marker:
+                del self._loading[user_id]
+
+    def invalidate(self, user_id: PydanticObjectId):
+        user_id = PydanticObjectId(user_id)
+        self._entries.pop(user_id, None)
+        self._loading.pop(user_id, None)
+        metrics.inc("user_cache.invalidations")
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
@@ -27,4 +27,15 @@ class QuizType(str, Enum):
 
 class QuestionType(str, Enum):
     SINGLE_CHOICE = "single_choice"
-    MULTIPLE_CHOICE = "multiple_choice"
\ No newline at end of file
+    MULTIPLE_CHOICE = "multiple_choice"
+
+
+# Профильные предметы для каждого сочетания ЕНТ
+PROFILE_SUBJECTS = {
+    QuizType.PHYSICS_MATH: (QuizSubject.PHYSICS, QuizSubject.MATHEMATICS),
+    QuizType.GEO_MATH: (QuizSubject.GEOGRAPHY, QuizSubject.MATHEMATICS),
+    QuizType.PHYSICS_CHEMISTRY: (QuizSubject.PHYSICS, QuizSubject.CHEMISTRY),
+    QuizType.LANGUAGE_HISTORY: (QuizSubject.ENGLISH, QuizSubject.WORD_HISTORY),
+    QuizType.BIOLOGY_CHEMISTRY: (QuizSubject.BIOLOGY, QuizSubject.CHEMISTRY),
+    QuizType.MATH_INFORMATICS: (QuizSubject.MATHEMATICS,),  # Информатики пока нет среди QuizSubject
+}
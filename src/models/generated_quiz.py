@@ -3,6 +3,7 @@ from enum import Enum
 from typing import List, Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
 
 class QuestionType(str, Enum):
     SINGLE_CHOICE = "single_choice"
@@ -20,13 +21,29 @@ class GeneratedQuestion(BaseModel):
     options: List[QuestionOption]
 
 class GeneratedQuiz(Document):
-    user_id:PydanticObjectId
+    user_id: Optional[PydanticObjectId] = None  # None - квиз лежит в пуле заготовок
     title: str  
     subject: str 
     questions: List[GeneratedQuestion] 
+    pool_key: Optional[str] = None  # generation_key темы, пока квиз не выдан пользователю
+    pooled_from: Optional[str] = None  # pool_key, из которого квиз был выдан
+    claimed_at: Optional[datetime] = None
 
     class Settings:
         collection = "generated_quizzes"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id"),
+            IndexModel(
+                [("pool_key", ASCENDING)],
+                name="pool_key",
+                partialFilterExpression={"pool_key": {"$type": "string"}},
+            ),
+            IndexModel(
+                [("claimed_at", ASCENDING)],
+                name="pool_claimed_at",
+                partialFilterExpression={"claimed_at": {"$type": "date"}},
+            ),
+        ]
 
 class UserAnswer(BaseModel):
     question_id: PydanticObjectId
@@ -42,4 +59,7 @@ class UserGeneratedQuizAttempt(Document):
     finished_at: Optional[datetime] = None
 
     class Settings:
-        collection = "user_generated_quiz_attempts"
\ No newline at end of file
+        collection = "user_generated_quiz_attempts"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id"),
+        ]
\ No newline at end of file
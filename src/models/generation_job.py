@@ -0,0 +1,34 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, IndexModel
+
+
+class GenerationJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class GenerationJob(Document):
+    """Задача генерации квиза через LLM в очереди"""
+    user_id: PydanticObjectId
+    prompt: str
+    status: GenerationJobStatus = GenerationJobStatus.QUEUED
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    lease_until: Optional[datetime] = None  # после этого времени зависшую задачу может забрать другой воркер
+    finished_at: Optional[datetime] = None
+    quiz_id: Optional[PydanticObjectId] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+    class Settings:
+        collection = "generation_jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="user_status"),
+        ]
@@ -0,0 +1,27 @@
+from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+ALL_PERIOD = "all"  # корзина за все время
+ALL_SUBJECTS = "all"  # корзина по всем предметам
+
+
+class LeaderboardBucket(Document):
+    """Баллы пользователя за период (день "YYYY-MM-DD" или "all") по предмету или по всем сразу"""
+    period: str
+    subject: str
+    user_id: PydanticObjectId
+    score: float = 0
+
+    class Settings:
+        collection = "leaderboard_buckets"
+        indexes = [
+            IndexModel(
+                [("period", ASCENDING), ("subject", ASCENDING), ("user_id", ASCENDING)],
+                name="period_subject_user",
+                unique=True,
+            ),
+            IndexModel(
+                [("period", ASCENDING), ("subject", ASCENDING), ("score", DESCENDING)],
+                name="period_subject_score",
+            ),
+        ]
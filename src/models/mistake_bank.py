@@ -1,6 +1,7 @@
 from datetime import datetime
 from beanie import Document
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
 from typing import List, Optional
 from beanie import PydanticObjectId
 
@@ -15,6 +16,9 @@ class MistakeBankQuiz(Document):
 
     class Settings:
         collection = "mistake_bank"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("question_id", ASCENDING)], name="user_question"),
+        ]
 
 
 
@@ -27,4 +31,7 @@ class MistakeQuizSession(Document):
 
     class Settings:
         collection = "mistake_quiz_sessions"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="user_status"),
+        ]
 
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import List, Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
 from src.models.enums import *
 
 class QuestionOption(BaseModel):
@@ -20,5 +21,9 @@ class Question(Document):
 
     class Settings:
         collection = "questions"
+        indexes = [
+            IndexModel([("quiz_id", ASCENDING)], name="quiz_id"),
+            IndexModel([("subject", ASCENDING)], name="subject"),
+        ]
 
 
@@ -1,6 +1,6 @@
 import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 from beanie import Document
 from pydantic import BaseModel, Field
 
@@ -23,6 +23,12 @@ class Quiz(Document):
     year: str
     title: str
     structure: List[QuizStructure] = [QuizStructure(**sub) for sub in DEFAULT_SUBJECTS]
+    time_limit_minutes: Optional[int] = None  # None - ATTEMPT_TIME_LIMIT_MINUTES из настроек
+    # Материализованные агрегаты по вопросам, обновляются при добавлении вопросов
+    question_counts: Dict[QuizSubject, int] = {}  # фактическое число вопросов по предметам
+    questions_count: int = 0
+    max_score: int = 0
+    version: int = 0
 
     class Settings:
         collection = "quizzes"
@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 
 class UserQuizAttempt(Document):
@@ -10,6 +11,26 @@ class UserQuizAttempt(Document):
     started_at: datetime = datetime.now()
     ended_at: Optional[datetime] = None
     is_completed: bool = False
+    expires_at: Optional[datetime] = None
+    expired: bool = False  # закрыта фоновым sweeper'ом по истечении времени
+    # Собранный вариант: вопросы из общего пула вместо вопросов quiz_id
+    question_ids: Optional[List[PydanticObjectId]] = None
+    max_score: Optional[int] = None
+    # Засчитанные вопросы: ответ прибавляется к score условным $inc по этому же документу,
+    # только пока попытка открыта; None - попытка начата до появления счетчиков
+    answered_question_ids: Optional[List[PydanticObjectId]] = None
+    subject_scores: Dict[str, float] = {}
 
     class Settings:
-        collection = "user_quiz_attempts"
\ No newline at end of file
+        collection = "user_quiz_attempts"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("started_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_started_at",
+            ),
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                name="open_expires_at",
+                partialFilterExpression={"is_completed": False},
+            ),
+        ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Optional
 
 from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 class UserRoleEnum(str,Enum):
     STUDENT = "student"
@@ -19,3 +20,7 @@ class User(Document):
     
     class Settings:
         collection = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], name="email"),
+            IndexModel([("total_score", DESCENDING), ("_id", ASCENDING)], name="leaderboard"),
+        ]
@@ -1,6 +1,9 @@
-from typing import List
+from typing import List, Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+
+from src.models.enums import QuizSubject
 
 
 class AnswerCreate(BaseModel):
@@ -15,6 +18,10 @@ class UserAnswer(Document):
     question_id: PydanticObjectId  # ID вопроса
     selected_options: List[str]  # Выбранные варианты (["A", "C"])
     score: float
+    subject: Optional[QuizSubject] = None  # предмет вопроса, для лидербордов по предметам
 
     class Settings:
-        collection = "user_answers"
\ No newline at end of file
+        collection = "user_answers"
+        indexes = [
+            IndexModel([("attempt_id", ASCENDING), ("question_id", ASCENDING)], name="attempt_question"),
+        ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from src.models.quiz import QuizStructure
 from src.models.enums import QuestionType, QuizSubject
 from src.models.enums import QuizSubject
@@ -21,6 +21,7 @@ class QuizCreateDTO(BaseModel):
     year: str
     variant: str
     subjects: List[QuizStructure]
+    time_limit_minutes: Optional[int] = None
 
 class QuizAttemptDTO(BaseModel):
     user_id: str
@@ -0,0 +1,85 @@
+"""Единые правила подсчета баллов для всех типов квизов.
+
+Варианты ответа кодируются битовой маской (A -> 1, B -> 2, C -> 4, ...),
+поэтому проверка ответа сводится к нескольким целочисленным операциям.
+
+Правила:
+- single_choice: 1 балл, если выбран ровно правильный вариант;
+- multiple_choice: 2 балла за полностью верный ответ, 1 балл, если выбрана
+  часть правильных вариантов и нет ни одного неверного, иначе 0.
+"""
+from typing import Iterable, List, Sequence
+
+from src.models.enums import QuestionType
+
+LABEL_BITS = {chr(ord("A") + i): 1 << i for i in range(26)}
+# Неизвестная метка всегда считается неверным выбором
+UNKNOWN_BIT = 1 << 26
+
+MAX_SCORES = {
+    QuestionType.SINGLE_CHOICE: 1,
+    QuestionType.MULTIPLE_CHOICE: 2,
+}
+
+
+def encode(labels: Iterable[str]) -> int:
+    """Переводит список меток (["A", "C"]) в битовую маску"""
+    mask = 0
+    for label in labels:
+        mask |= LABEL_BITS.get(label.strip().upper(), UNKNOWN_BIT)
+    return mask
+
+
+def decode(mask: int) -> List[str]:
+    """Переводит битовую маску обратно в отсортированный список меток"""
+    return [label for label, bit in LABEL_BITS.items() if mask & bit]
+
+
+def correct_mask(options: Iterable) -> int:
+    """Маска правильных вариантов; принимает как модели опций, так и dict"""
+    return encode(
+        opt["label"] if isinstance(opt, dict) else opt.label
+        for opt in options
+        if (opt["is_correct"] if isinstance(opt, dict) else opt.is_correct)
+    )
+
+
+def max_score(question_type: str) -> int:
+    return MAX_SCORES.get(question_type, 1)
+
+
+def score(selected: int, correct: int, question_type: str) -> int:
+    """Балл за один ответ"""
+    if not correct or not selected:
+        return 0
+    if selected == correct:
+        return max_score(question_type)
+    if question_type == QuestionType.MULTIPLE_CHOICE and not selected & ~correct:
+        return 1
+    return 0
+
+
+def score_batch(selected: Sequence[int], correct: Sequence[int], types: Sequence[str]) -> List[int]:
+    """Баллы за пачку ответов (пересчет истории попыток) одним проходом.
+
+    Те же правила, что и score(), но развернутые в одно выражение: без вызова
+    функции и поиска в MAX_SCORES на каждый ответ.
+    """
+    multiple = QuestionType.MULTIPLE_CHOICE
+    return [
+        0 if not s or not c
+        else (2 if t == multiple else 1) if s == c
+        else 1 if t == multiple and not s & ~c
+        else 0
+        for s, c, t in zip(selected, correct, types)
+    ]
+
+
+def is_full_score(selected: int, correct: int) -> bool:
+    """Полностью верный ответ (для любого типа вопроса)"""
+    return bool(correct) and selected == correct
+
+
+def mongo_max_score_expr(question_type) -> dict:
+    """max_score в виде выражения агрегации MongoDB"""
+    return {"$cond": [{"$eq": [question_type, QuestionType.MULTIPLE_CHOICE.value]}, 2, 1]}
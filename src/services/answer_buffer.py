@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.mistake_bank import MistakeBankQuiz
+from src.models.user_answer import UserAnswer
+
+FLUSH_SIZE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+DUPLICATE_KEY = 11000
+
+BufferedAnswer = Tuple[UserAnswer, Optional[MistakeBankQuiz]]
+
+
+class AnswerBuffer:
+    """Write-behind буфер ответов для открытых попыток.
+
+    Ответы держатся в памяти по попыткам и пишутся в Mongo пачками: когда в
+    попытке накопилось flush_size ответов, раз в flush_interval секунд и
+    всегда перед подсчетом балла попытки. При durability=journal/fsync каждый
+    ответ сначала дописывается в локальный журнал, который проигрывается при
+    старте, если процесс упал с непустым буфером.
+    """
+
+    def __init__(self, enabled: bool, flush_size: int, flush_interval: float, durability: str, journal_path: str):
+        self.enabled = enabled
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.journal_path = journal_path
+        self._buffers: Dict[PydanticObjectId, Dict[PydanticObjectId, BufferedAnswer]] = defaultdict(dict)
+        self._locks: Dict[PydanticObjectId, asyncio.Lock] = {}
+        self._lock_users: Dict[PydanticObjectId, int] = defaultdict(int)
+        self._journal = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def journaled(self) -> bool:
+        return self.durability in ("journal", "fsync")
+
+    async def start(self):
+        if not self.enabled:
+            return
+        if self.journaled:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            await self._recover()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if not self.enabled:
+            return
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_all()
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def has_answer(self, attempt_id: PydanticObjectId, question_id: PydanticObjectId) -> bool:
+        return question_id in self._buffers.get(attempt_id, {})
+
+    async def add(self, user_answer: UserAnswer, mistake: Optional[MistakeBankQuiz] = None):
+        """Принимает ответ в буфер; id назначаются сразу, чтобы клиент получил их в ответе"""
+        user_answer.id = user_answer.id or PydanticObjectId()
+        if mistake:
+            mistake.id = mistake.id or PydanticObjectId()
+        if self._journal:
+            await self._write_journal(user_answer, mistake)
+
+        buffer = self._buffers[user_answer.attempt_id]
+        buffer[user_answer.question_id] = (user_answer, mistake)
+        metrics.inc("answer_buffer.buffered")
+        if len(buffer) >= self.flush_size:
+            try:
+                await self.flush_attempt(user_answer.attempt_id)
+            except Exception as e:
+                # Ответ уже принят; запись повторит следующий flush
+                logging.error(f"Answer buffer flush failed for attempt {user_answer.attempt_id}: {e}")
+
+    async def flush_attempt(self, attempt_id: PydanticObjectId):
+        """Пишет в Mongo все накопленные ответы попытки"""
+        async with self._attempt_lock(attempt_id):
+            buffer = self._buffers.get(attempt_id)
+            if not buffer:
+                return
+            # Пока идет запись, ответы остаются в буфере и видны has_answer
+            entries = list(buffer.values())
+            started = time.perf_counter()
+            try:
+                await self._insert(entries)
+            except Exception:
+                metrics.inc("answer_buffer.flush_errors")
+                raise
+            for user_answer, _ in entries:
+                buffer.pop(user_answer.question_id, None)
+            if not buffer:
+                self._buffers.pop(attempt_id, None)
+            metrics.observe("answer_buffer.flush_size", len(entries), FLUSH_SIZE_BUCKETS)
+            metrics.observe("answer_buffer.flush_latency", time.perf_counter() - started)
+
+    async def flush_all(self):
+        # Ответы, пришедшие во время flush, попадут в новый сегмент журнала,
+        # поэтому старые сегменты можно удалить, как только все записано
+        rotated = self._rotate_journal()
+        failed = False
+        for attempt_id in list(self._buffers):
+            try:
+                await self.flush_attempt(attempt_id)
+            except Exception as e:
+                failed = True
+                logging.error(f"Answer buffer flush failed for attempt {attempt_id}: {e}")
+        if rotated and not failed:
+            for segment in self._journal_segments():
+                os.remove(segment)
+        metrics.set_gauge("answer_buffer.pending", sum(len(b) for b in self._buffers.values()))
+
+    @asynccontextmanager
+    async def _attempt_lock(self, attempt_id: PydanticObjectId):
+        # Лок живет, пока им кто-то пользуется, чтобы две записи одной попытки не шли параллельно
+        lock = self._locks.setdefault(attempt_id, asyncio.Lock())
+        self._lock_users[attempt_id] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[attempt_id] -= 1
+            if not self._lock_users[attempt_id]:
+                del self._lock_users[attempt_id]
+                del self._locks[attempt_id]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_all()
+
+    async def _insert(self, entries: List[BufferedAnswer]):
+        await self._insert_new(UserAnswer, [user_answer for user_answer, _ in entries])
+        mistakes = [mistake for _, mistake in entries if mistake]
+        if mistakes:
+            await self._insert_new(MistakeBankQuiz, mistakes)
+
+    @staticmethod
+    async def _insert_new(model, documents: list):
+        """insert_many, идемпотентный при повторе: id назначены заранее, поэтому
+        уже записанные прошлой (частично упавшей) попыткой документы дают
+        duplicate key и считаются записанными, а остальные пишутся дальше.
+        """
+        try:
+            await model.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors or any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            metrics.inc("answer_buffer.duplicates_skipped", len(errors))
+
+    async def _write_journal(self, user_answer: UserAnswer, mistake: Optional[MistakeBankQuiz]):
+        record = {
+            "answer": user_answer.model_dump(mode="json", by_alias=True),
+            "mistake": mistake.model_dump(mode="json", by_alias=True) if mistake else None,
+        }
+        self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        if self.durability == "fsync":
+            await asyncio.to_thread(os.fsync, self._journal.fileno())
+
+    def _rotate_journal(self) -> bool:
+        if not self._journal or not self._journal.tell():
+            return False
+        self._journal.close()
+        os.replace(self.journal_path, f"{self.journal_path}.{int(time.time() * 1000)}")
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return True
+
+    def _journal_segments(self) -> List[str]:
+        """Закрытые сегменты журнала (без текущего файла)"""
+        directory = os.path.dirname(self.journal_path) or "."
+        prefix = os.path.basename(self.journal_path) + "."
+        return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.startswith(prefix))
+
+    async def _recover(self):
+        """Дописывает в Mongo ответы из журналов, оставшихся после падения"""
+        segments = self._journal_segments()
+        if os.path.exists(self.journal_path):
+            segments.append(self.journal_path)
+        if not segments:
+            return
+
+        entries: Dict[Tuple[str, str], BufferedAnswer] = {}
+        for segment in segments:
+            with open(segment, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # недописанная последняя строка
+                    user_answer = UserAnswer.model_validate(record["answer"])
+                    mistake = MistakeBankQuiz.model_validate(record["mistake"]) if record["mistake"] else None
+                    entries[(str(user_answer.attempt_id), str(user_answer.question_id))] = (user_answer, mistake)
+
+        by_attempt = defaultdict(list)
+        for user_answer, mistake in entries.values():
+            by_attempt[user_answer.attempt_id].append((user_answer, mistake))
+
+        recovered = 0
+        for attempt_id, attempt_entries in by_attempt.items():
+            existing = await UserAnswer.find(
+                {"attempt_id": attempt_id, "question_id": {"$in": [ua.question_id for ua, _ in attempt_entries]}}
+            ).to_list()
+            existing_ids = {ua.question_id for ua in existing}
+            missing = [entry for entry in attempt_entries if entry[0].question_id not in existing_ids]
+            if missing:
+                await self._insert(missing)
+                recovered += len(missing)
+
+        for segment in segments:
+            os.remove(segment)
+        metrics.inc("answer_buffer.recovered", recovered)
+        logging.info(f"Answer buffer recovered {recovered} answers from journal")
+
+
+answer_buffer = AnswerBuffer(
+    enabled=settings.ANSWER_WRITE_BEHIND,
+    flush_size=settings.ANSWER_FLUSH_SIZE,
+    flush_interval=settings.ANSWER_FLUSH_INTERVAL,
+    durability=settings.ANSWER_BUFFER_DURABILITY,
+    journal_path=settings.ANSWER_BUFFER_JOURNAL,
+)
@@ -0,0 +1,163 @@
+"""Aggregation-пайплайны MongoDB для просмотра попыток официальных квизов.
+
+Собирают ответ прямо из user_quiz_attempts, user_answers и questions,
+без загрузки документов в Python. Форма ответа совпадает с QuizService,
+max_score и число вопросов берутся из материализованных полей квиза,
+а для собранных вариантов - из question_ids и max_score самой попытки.
+"""
+from typing import List, Optional
+
+from beanie import PydanticObjectId
+
+
+
+def _lookup_quiz() -> List[dict]:
+    return [
+        {"$lookup": {"from": "quizzes", "localField": "quiz_id", "foreignField": "_id", "as": "quiz"}},
+        {"$unwind": "$quiz"},
+    ]
+
+
+def _lookup_questions() -> List[dict]:
+    # Для варианта вопросы берутся по question_ids в порядке выдачи, иначе - все вопросы квиза
+    return [
+        {"$lookup": {"from": "questions", "localField": "quiz_id", "foreignField": "quiz_id", "as": "quiz_questions"}},
+        {"$lookup": {"from": "questions", "localField": "question_ids", "foreignField": "_id", "as": "variant_questions"}},
+        {"$addFields": {"questions": {"$cond": [
+            {"$isArray": "$question_ids"},
+            {"$filter": {
+                "input": {"$map": {"input": "$question_ids", "as": "qid", "in": {"$arrayElemAt": [
+                    {"$filter": {"input": "$variant_questions", "as": "vq", "cond": {"$eq": ["$$vq._id", "$$qid"]}}},
+                    0,
+                ]}}},
+                "as": "q",
+                "cond": {"$ne": [{"$type": "$$q"}, "missing"]},
+            }},
+            "$quiz_questions",
+        ]}}},
+    ]
+
+
+def _lookup_answers(fields: Optional[dict] = None) -> dict:
+    if fields is None:
+        return {"$lookup": {"from": "user_answers", "localField": "_id", "foreignField": "attempt_id", "as": "user_answers"}}
+    return {"$lookup": {
+        "from": "user_answers",
+        "let": {"attempt_id": "$_id"},
+        "pipeline": [{"$match": {"$expr": {"$eq": ["$attempt_id", "$$attempt_id"]}}}, {"$project": fields}],
+        "as": "user_answers",
+    }}
+
+
+def _correct_labels(question: str) -> dict:
+    return {"$map": {
+        "input": {"$filter": {"input": f"{question}.options", "as": "o", "cond": "$$o.is_correct"}},
+        "as": "o",
+        "in": "$$o.label",
+    }}
+
+
+def _user_answer(question: str) -> dict:
+    return {"$arrayElemAt": [
+        {"$filter": {"input": "$user_answers", "as": "ua", "cond": {"$eq": ["$$ua.question_id", f"{question}._id"]}}},
+        0,
+    ]}
+
+
+def attempt_details_pipeline(attempt_id: PydanticObjectId) -> List[dict]:
+    """Детали одной попытки, включая неотвеченные вопросы"""
+    return [
+        {"$match": {"_id": attempt_id}},
+        *_lookup_quiz(),
+        *_lookup_questions(),
+        _lookup_answers({"question_id": 1, "selected_options": 1}),
+        {"$project": {
+            "_id": 0,
+            "attempt_id": {"$toString": "$_id"},
+            "quiz_id": {"$toString": "$quiz_id"},
+            "user_id": {"$toString": "$user_id"},
+            "quiz_title": "$quiz.title",
+            "quiz_variant": "$quiz.variant",
+            "quiz_year": "$quiz.year",
+            "time_taken": {"$divide": [
+                {"$subtract": [{"$ifNull": ["$ended_at", "$$NOW"]}, "$started_at"]}, 1000,
+            ]},
+            "max_score": {"$ifNull": ["$max_score", "$quiz.max_score"]},
+            "score": "$score",
+            "questions_count": {"$cond": [{"$isArray": "$question_ids"}, {"$size": "$question_ids"}, "$quiz.questions_count"]},
+            "answers": {"$map": {"input": "$questions", "as": "q", "in": {
+                "question_id": {"$toString": "$$q._id"},
+                "question_text": "$$q.question_text",
+                "options": {"$map": {"input": "$$q.options", "as": "o", "in": {
+                    "label": "$$o.label",
+                    "option_text": "$$o.option_text",
+                    "is_correct": "$$o.is_correct",
+                }}},
+                "selected_options": {"$ifNull": [{"$let": {
+                    "vars": {"ua": _user_answer("$$q")},
+                    "in": "$$ua.selected_options",
+                }}, []]},
+                "correct_options": _correct_labels("$$q"),
+            }}},
+        }},
+    ]
+
+
+def attempt_history_pipeline(match: dict, limit: Optional[int], summary: bool) -> List[dict]:
+    """История попыток от новых к старым; баллы считаются на сервере"""
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"started_at": -1, "_id": -1}},
+    ]
+    # $limit после join с квизом: попытки удаленных квизов отбрасываются $unwind и не съедают страницу
+    pipeline += _lookup_quiz()
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+
+    base = {
+        "_id": 1,
+        "id": {"$toString": "$_id"},
+        "quiz_id": {"$toString": "$quiz_id"},
+        "user_id": {"$toString": "$user_id"},
+        "started_at": 1,
+        "ended_at": 1,
+        "is_completed": 1,
+        "quiz_title": "$quiz.title",
+        "quiz_variant": "$quiz.variant",
+        "quiz_year": "$quiz.year",
+        "max_score": {"$ifNull": ["$max_score", "$quiz.max_score"]},
+    }
+
+    if summary:
+        return pipeline + [
+            _lookup_answers({"score": 1}),
+            {"$project": {**base, "score": {"$sum": "$user_answers.score"}}},
+        ]
+
+    return pipeline + [
+        *_lookup_questions(),
+        _lookup_answers({"question_id": 1, "selected_options": 1, "score": 1}),
+        {"$addFields": {"answers": {"$map": {"input": "$questions", "as": "q", "in": {"$let": {
+            "vars": {
+                "selected": {"$setUnion": [{"$ifNull": [{"$let": {
+                    "vars": {"ua": _user_answer("$$q")},
+                    "in": "$$ua.selected_options",
+                }}, []]}, []]},
+                "correct": _correct_labels("$$q"),
+            },
+            "in": {
+                "question_id": {"$toString": "$$q._id"},
+                "question_text": "$$q.question_text",
+                "question_type": "$$q.type",
+                "selected_options": "$$selected",
+                "correct_options": "$$correct",
+                "options": {"$map": {"input": "$$q.options", "as": "o", "in": {
+                    "label": "$$o.label",
+                    "text": "$$o.option_text",
+                    "is_correct": "$$o.is_correct",
+                }}},
+            },
+        }}}}}},
+        # Балл - сумма сохраненных баллов ответов, как в сводке и при завершении попытки
+        {"$project": {**base, "score": {"$sum": "$user_answers.score"}, "answers": 1}},
+    ]
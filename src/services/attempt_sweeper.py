@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user_answer import UserAnswer
+from src.services.answer_buffer import answer_buffer
+from src.services.score import ScoreService
+
+
+class AttemptSweeper:
+    """Фоновое закрытие просроченных попыток.
+
+    Раз в interval секунд выбирает по индексу open_expires_at попытки с истекшим
+    expires_at и закрывает их пачками по batch_size: один bulk_write по попыткам,
+    одно чтение накопленных в них баллов и один bulk_write с $inc по
+    пользователям. Условие is_completed=False не дает закрыть попытку дважды,
+    если параллельно пришел /finish или работает sweeper другого процесса.
+
+    Попытка, чей буфер ответов не удалось дописать, откладывается с
+    экспоненциальной задержкой (от interval до FLUSH_RETRY_MAX) и исключается из
+    выборки, чтобы пачка таких попыток не заслоняла следующие просроченные.
+    """
+
+    FLUSH_RETRY_MAX = 3600
+
+    def __init__(self, enabled: bool, interval: float, batch_size: int, default_limit_minutes: int):
+        self.enabled = enabled
+        self.interval = interval
+        self.batch_size = batch_size
+        self.default_limit_minutes = default_limit_minutes
+        self._task: Optional[asyncio.Task] = None
+        # attempt_id -> (число неудачных flush подряд, monotonic-время следующей попытки)
+        self._flush_backoff: Dict[object, Tuple[int, float]] = {}
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await self._backfill_expires_at()
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sweep(self) -> int:
+        """Закрывает все просроченные на данный момент попытки; возвращает их число"""
+        started = time.perf_counter()
+        finalized = 0
+        self._forget_stale_backoff()
+        while True:
+            selected, closed = await self._sweep_batch()
+            finalized += closed
+            # Отложенные в этой пачке попытки уже исключены из выборки - следующая пачка продвигается дальше
+            if selected < self.batch_size:
+                break
+        metrics.observe("attempt_sweeper.sweep_latency", time.perf_counter() - started)
+        return finalized
+
+    async def _sweep_batch(self) -> Tuple[int, int]:
+        """Одна пачка; возвращает (выбрано попыток, закрыто из них)"""
+        now = datetime.utcnow()
+        collection = UserQuizAttempt.get_motor_collection()
+        query = {"is_completed": False, "expires_at": {"$lte": now}}
+        clock = time.monotonic()
+        postponed = [attempt_id for attempt_id, (_, retry_at) in self._flush_backoff.items() if retry_at > clock]
+        if postponed:
+            query["_id"] = {"$nin": postponed}
+        attempts = await collection.find(
+            query,
+            {"_id": 1, "user_id": 1},
+        ).sort("expires_at", 1).limit(self.batch_size).to_list(length=None)
+        if not attempts:
+            return 0, 0
+        attempt_ids = [attempt["_id"] for attempt in attempts]
+
+        if answer_buffer.enabled:
+            attempt_ids = [attempt_id for attempt_id in attempt_ids if await self._flush_answers(attempt_id)]
+            if not attempt_ids:
+                return len(attempts), 0
+        selected = len(attempts)
+
+        await collection.bulk_write([
+            UpdateOne(
+                {"_id": attempt_id, "is_completed": False},
+                {"$set": {"ended_at": now, "is_completed": True, "expired": True}},
+            )
+            for attempt_id in attempt_ids
+        ], ordered=False)
+
+        # Часть попыток могли успеть закрыть через /finish - начисляем только закрытые здесь.
+        # Балл копился в самой попытке и читается уже после закрытия, когда ответы больше не принимаются
+        attempts = await collection.find(
+            {"_id": {"$in": attempt_ids}, "expired": True, "ended_at": now},
+            {"user_id": 1, "score": 1, "subject_scores": 1, "answered_question_ids": {"$slice": 0}},
+        ).to_list(length=None)
+        scores = {attempt["_id"]: attempt.get("score", 0) for attempt in attempts}
+        by_subject = {attempt["_id"]: attempt.get("subject_scores", {}) for attempt in attempts}
+
+        legacy_ids = [attempt["_id"] for attempt in attempts if attempt.get("answered_question_ids") is None]
+        if legacy_ids:
+            # Попытки без счетчиков: балл по сохраненным ответам
+            pipeline = [
+                {"$match": {"attempt_id": {"$in": legacy_ids}}},
+                {"$group": {"_id": {"attempt_id": "$attempt_id", "subject": "$subject"}, "score": {"$sum": "$score"}}},
+            ]
+            legacy_subjects = defaultdict(dict)
+            async for row in UserAnswer.get_motor_collection().aggregate(pipeline):
+                legacy_subjects[row["_id"]["attempt_id"]][row["_id"].get("subject")] = row["score"]
+            for attempt_id in legacy_ids:
+                by_subject[attempt_id] = legacy_subjects.get(attempt_id, {})
+                scores[attempt_id] = sum(by_subject[attempt_id].values())
+            await collection.bulk_write([
+                UpdateOne({"_id": attempt_id}, {"$set": {"score": scores[attempt_id]}})
+                for attempt_id in legacy_ids
+            ], ordered=False)
+
+        deltas = defaultdict(float)
+        user_subjects = defaultdict(lambda: defaultdict(float))
+        for attempt in attempts:
+            deltas[attempt["user_id"]] += scores.get(attempt["_id"], 0)
+            for subject, score in by_subject.get(attempt["_id"], {}).items():
+                user_subjects[attempt["user_id"]][subject] += score
+        await ScoreService().credit_users(deltas, user_subjects)
+
+        metrics.inc("attempt_sweeper.finalized", len(attempts))
+        metrics.inc("attempt_sweeper.credited_score", sum(deltas.values()))
+        metrics.inc("attempt_sweeper.batches")
+        return selected, len(attempts)
+
+    async def _flush_answers(self, attempt_id) -> bool:
+        """Дописывает буфер ответов попытки; при ошибке откладывает попытку с растущей задержкой"""
+        try:
+            await answer_buffer.flush_attempt(attempt_id)
+        except Exception as e:
+            failures = self._flush_backoff.get(attempt_id, (0, 0))[0] + 1
+            delay = min(self.interval * 2 ** (failures - 1), self.FLUSH_RETRY_MAX)
+            self._flush_backoff[attempt_id] = (failures, time.monotonic() + delay)
+            metrics.inc("attempt_sweeper.flush_errors")
+            metrics.set_gauge("attempt_sweeper.flush_postponed", len(self._flush_backoff))
+            logging.error(f"Attempt sweeper could not flush answers of {attempt_id} (failure {failures}, retry in {delay:.0f}s): {e}")
+            return False
+        self._flush_backoff.pop(attempt_id, None)
+        return True
+
+    def _forget_stale_backoff(self):
+        """Забывает попытки, давно не встречавшиеся в выборке (например, закрытые через /finish)"""
+        stale_before = time.monotonic() - self.FLUSH_RETRY_MAX
+        for attempt_id in [a for a, (_, retry_at) in self._flush_backoff.items() if retry_at < stale_before]:
+            del self._flush_backoff[attempt_id]
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                finalized = await self.sweep()
+                if finalized:
+                    logging.info(f"Attempt sweeper finalized {finalized} expired attempts")
+            except Exception as e:
+                metrics.inc("attempt_sweeper.errors")
+                logging.error(f"Attempt sweeper failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _backfill_expires_at(self):
+        """Открытым попыткам, начатым до появления лимита, ставим expires_at по лимиту по умолчанию"""
+        await UserQuizAttempt.get_motor_collection().update_many(
+            {"is_completed": False, "expires_at": None},
+            [{"$set": {"expires_at": {"$add": ["$started_at", self.default_limit_minutes * 60 * 1000]}}}],
+        )
+
+
+attempt_sweeper = AttemptSweeper(
+    enabled=settings.ATTEMPT_SWEEPER_ENABLED,
+    interval=settings.ATTEMPT_SWEEP_INTERVAL,
+    batch_size=settings.ATTEMPT_SWEEP_BATCH_SIZE,
+    default_limit_minutes=settings.ATTEMPT_TIME_LIMIT_MINUTES,
+)
@@ -3,6 +3,8 @@ from fastapi import HTTPException
 
 from src.helpers.jwt_handler import JWT
 from src.helpers.password import PasswordHandler
+from src.helpers.rank_index import leaderboard_ranks
+from src.helpers.user_cache import user_cache
 from src.models.user import User
 from src.schemas.req.user import UserCreateReq, UserLoginReq
 
@@ -12,11 +14,12 @@ class AuthService:
 
         user_db = User(
             email=user.email,
-            password=PasswordHandler.hash(user.password),
+            password=await PasswordHandler.hash_async(user.password),
             first_name=user.first_name,
             last_name=user.last_name,
         )
         await user_db.insert()
+        leaderboard_ranks.index.set_score(user_db.id, user_db.total_score)
 
         user_id = str(user_db.id)
         return {
@@ -28,7 +31,7 @@ class AuthService:
         user = await User.find_one(User.email == req.email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        if not PasswordHandler.verify(user.password, req.password):
+        if not await PasswordHandler.verify_async(user.password, req.password):
             raise HTTPException(status_code=400, detail="Invalid password")
         user_id = str(user.id)
         return {
@@ -37,7 +40,7 @@ class AuthService:
         }
 
     async def get_user_by_id(self, user_id: str):
-        user = await User.find_one(User.id == ObjectId(user_id))
+        user = await user_cache.get(ObjectId(user_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
@@ -1,38 +1,178 @@
+import asyncio
 from datetime import datetime
 import json
-from typing import List
+import logging
+import time
+from typing import AsyncIterator, List, Optional
 from beanie import PydanticObjectId
 from src.models.question import Question
 from src.models.user import User
 from src.models.mistake_bank import MistakeBankQuiz
 from src.schemas.req.generated_quiz import UserAnswerRequest
 from src.models.generated_quiz import GeneratedQuiz, GeneratedQuestion, QuestionOption, QuestionType, UserAnswer, UserGeneratedQuizAttempt
-from src.helpers.llm import LLMClient
+from src.core.settings import settings
+from src.helpers.llm import QUESTIONS_COUNT, llm_client
+from src.helpers.generation_fanout import dedupe_questions, is_valid_question, split_counts, subtopic_hint
+from src.helpers.generation_cache import generation_cache, generation_key
+from src.helpers.json_stream import QuizStreamParser
+from src.helpers.metrics import metrics
+from src import scoring
 from fastapi import HTTPException
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
+from pymongo import ReturnDocument
+from src.services.quiz_pool import generated_quiz_pool
+from src.services.score import ScoreService
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 class QuizGeneratorService:
 
     async def generate_quiz(self, user_prompt: str, user_id:PydanticObjectId) -> GeneratedQuiz:
-        llm_client = LLMClient()
-            
+        """Генерирует квиз; тема из пула выдается готовой, одинаковые запросы - копией из кэша без вызова LLM"""
+        quiz = await generated_quiz_pool.claim(user_prompt, user_id)
+        if quiz is not None:
+            return quiz
+        quiz_data = await generation_cache.get_or_generate(
+            generation_key(user_prompt),
+            lambda: self._generate_quiz_data(user_prompt),
+        )
+        return await self._save_generated_quiz(quiz_data, user_id)
+
+    async def _generate_quiz_data(self, user_prompt: str) -> dict:
+        if settings.GENERATION_FANOUT_CHUNKS > 1:
+            return await self._generate_fanout(user_prompt, settings.GENERATION_FANOUT_CHUNKS)
+
         response = await llm_client.generate_response(user_prompt)
 
-        quiz_data = json.loads(response)
+        return json.loads(response)
+
+    async def _generate_fanout(self, user_prompt: str, chunks: int) -> dict:
+        """Параллельная генерация частями по под-темам.
+
+        Каждая часть занимает свое место в общем пределе llm_client. Вопросы
+        частей проверяются и очищаются от почти одинаковых. Если часть упала
+        или вопросов набралось меньше QUESTIONS_COUNT, квиз помечается partial.
+        """
+        started = time.perf_counter()
+        counts = split_counts(QUESTIONS_COUNT, chunks)
+
+        async def chunk(index: int, count: int) -> dict:
+            response = await llm_client.generate_response(user_prompt, count, subtopic_hint(index, len(counts)))
+            return json.loads(response)
+
+        results = await asyncio.gather(*(chunk(i, count) for i, count in enumerate(counts)), return_exceptions=True)
+        parts = [result for result in results if isinstance(result, dict)]
+        failed = [result for result in results if not isinstance(result, dict)]
+        for error in failed:
+            logging.warning(f"Generation chunk failed: {error!r}")
+        metrics.inc("generation_fanout.chunk_failures", len(failed))
+        if not parts:
+            raise failed[0]
+
+        raw_questions = [question for part in parts for question in part.get("questions") or []]
+        valid = [question for question in raw_questions if is_valid_question(question)]
+        questions = dedupe_questions(valid, settings.GENERATION_DEDUP_THRESHOLD)[:QUESTIONS_COUNT]
+        metrics.inc("generation_fanout.invalid_questions", len(raw_questions) - len(valid))
+        metrics.inc("generation_fanout.duplicates", len(valid) - len(questions))
+        metrics.observe("generation_fanout.latency", time.perf_counter() - started)
+        if not questions:
+            raise HTTPException(status_code=502, detail="Model returned no questions")
+
+        first = parts[0]
+        return {
+            "title": first.get("title") or user_prompt,
+            "subject": first.get("subject") or user_prompt,
+            "questions": questions,
+            # Неполный квиз (упала часть, отброшены невалидные или дубли) не кэшируется и не идет в пул
+            "partial": bool(failed) or len(questions) < QUESTIONS_COUNT,
+        }
 
-        questions = [
-            GeneratedQuestion(
-                id=PydanticObjectId(),
-                type=question_data["type"],
-                question_text=question_data["question_text"],
-                options=[QuestionOption(**option) for option in question_data["options"]]
-            )
-            for question_data in quiz_data["questions"]
-        ]
+    async def stream_quiz(self, user_prompt: str, user_id: PydanticObjectId) -> AsyncIterator[str]:
+        """SSE-события генерации: meta, question (как только объект вопроса закрылся), done или error.
+
+        Квиз сохраняется, когда поток модели закончился; в кэш генераций он
+        попадает, только если весь JSON ответа дошел и прошел проверку.
+        """
+        key = generation_key(user_prompt)
+        quiz = await generated_quiz_pool.claim(user_prompt, user_id)
+        cached = generation_cache.get(key) if quiz is None else None
+        if cached is not None:
+            quiz = await self._save_generated_quiz(cached, user_id)
+        if quiz is not None:
+            yield _sse("meta", {"title": quiz.title, "subject": quiz.subject})
+            for question in quiz.questions:
+                yield _sse("question", jsonable_encoder(question))
+            yield _sse("done", {"quiz_id": str(quiz.id), "questions_count": len(quiz.questions)})
+            return
+
+        started = time.perf_counter()
+        parser = QuizStreamParser()
+        raw_questions, questions = [], []
+        try:
+            async for chunk in llm_client.stream_response(user_prompt):
+                for question_data in parser.feed(chunk):
+                    try:
+                        question = self._build_question(question_data)
+                    except Exception:
+                        metrics.inc("generation_stream.invalid_questions")
+                        continue
+                    if not questions:
+                        metrics.observe("generation_stream.first_question_latency", time.perf_counter() - started)
+                        yield _sse("meta", parser.meta)
+                    raw_questions.append(question_data)
+                    questions.append(question)
+                    yield _sse("question", jsonable_encoder(question))
+        except Exception as e:
+            metrics.inc("generation_stream.errors")
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        if not questions:
+            yield _sse("error", {"detail": "Model returned no questions"})
+            return
+
+        quiz_data = {
+            "title": parser.meta.get("title") or user_prompt,
+            "subject": parser.meta.get("subject") or user_prompt,
+            "questions": raw_questions,
+        }
+        quiz = await self._save_generated_quiz(quiz_data, user_id, questions)
+        # В кэш - только целый ответ: JSON закрылся и разобрался, ни один вопрос не отброшен
+        document = parser.document()
+        if (
+            document is not None
+            and document.get("questions") == raw_questions
+            and all(is_valid_question(question) for question in raw_questions)
+        ):
+            generation_cache.put(key, quiz_data)
+        else:
+            metrics.inc("generation_stream.not_cached")
+        metrics.observe("generation_stream.total_latency", time.perf_counter() - started)
+        yield _sse("done", {"quiz_id": str(quiz.id), "questions_count": len(questions)})
+
+    @staticmethod
+    def _build_question(question_data: dict) -> GeneratedQuestion:
+        return GeneratedQuestion(
+            id=PydanticObjectId(),
+            type=question_data["type"],
+            question_text=question_data["question_text"],
+            options=[QuestionOption(**option) for option in question_data["options"]]
+        )
+
+    async def _save_generated_quiz(
+        self,
+        quiz_data: dict,
+        user_id: PydanticObjectId,
+        questions: Optional[List[GeneratedQuestion]] = None,
+    ) -> GeneratedQuiz:
+        if questions is None:
+            questions = [self._build_question(question_data) for question_data in quiz_data["questions"]]
         generated_quiz = GeneratedQuiz(
             user_id=user_id, 
             title=quiz_data["title"],
@@ -66,7 +206,7 @@ class QuizGeneratorService:
                 continue  # Пропускаем, если quiz_id не найден
 
             # Вычисляем максимальный балл
-            max_score = sum(2 if question.type == QuestionType.MULTIPLE_CHOICE else 1 for question in quiz.questions)
+            max_score = sum(scoring.max_score(question.type) for question in quiz.questions)
 
             attempt_data = jsonable_encoder(attempt)
             attempt_data["id"] = str(attempt.id)
@@ -101,7 +241,8 @@ class QuizGeneratorService:
         return response
 
     async def get_all_quizzes(self):
-        return await GeneratedQuiz.find_all().to_list()
+        # Заготовки пула еще никому не выданы
+        return await GeneratedQuiz.find({"pool_key": None}).to_list()
     
     async def get_generated_quiz_by_quiz_id(self, quiz_id: PydanticObjectId):
         return await GeneratedQuiz.find_one(GeneratedQuiz.id == quiz_id)
@@ -121,26 +262,22 @@ class QuizGeneratorService:
     
     async def submit_quiz_attempt(self, attempt_id: PydanticObjectId):
         """Завершает попытку квиза, суммирует баллы и обновляет счет пользователя."""
-        attempt = await UserGeneratedQuizAttempt.get(attempt_id)
-        if not attempt:
-            raise HTTPException(status_code=404, detail="Attempt not found")
-
-        if attempt.finished_at:
+        # Балл суммируется на сервере, а условие finished_at=None не дает завершить попытку дважды
+        attempt_doc = await UserGeneratedQuizAttempt.get_motor_collection().find_one_and_update(
+            {"_id": attempt_id, "finished_at": None},
+            [{"$set": {"finished_at": datetime.utcnow(), "score": {"$sum": "$answers.score"}}}],
+            projection={"user_id": 1, "score": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not attempt_doc:
+            if not await UserGeneratedQuizAttempt.get(attempt_id):
+                raise HTTPException(status_code=404, detail="Attempt not found")
             raise HTTPException(status_code=400, detail="Attempt already finished")
 
-        # Считаем общий балл на основе уже данных ответов
-        total_score = sum(ans.score for ans in attempt.answers)
-
-        # Фиксируем завершение попытки
-        attempt.score = total_score
-        attempt.finished_at = datetime.utcnow()
-        await attempt.save()
+        total_score = attempt_doc["score"]
 
         # Обновляем общий счет пользователя
-        user = await User.get(attempt.user_id)
-        if user:
-            user.total_score += total_score
-            await user.save()
+        await ScoreService().credit_user(attempt_doc["user_id"], total_score)
 
         return {"message": "Quiz attempt submitted", "total_score": total_score}
 
@@ -173,27 +310,22 @@ class QuizGeneratorService:
         # Подсчет баллов
         correct_options = {opt.label for opt in question.options if opt.is_correct}
         selected_options = set(answer.selected_options)
-
-        selected_correct = len(selected_options & correct_options)
-        total_correct = len(correct_options)
-
-        score = 0
-        if question.type == "single_choice":
-            score = 1 if selected_correct == 1 else 0
-        elif question.type == "multiple_choice":
-            if selected_options == correct_options:  # Полностью правильный ответ
-                score = 2
-            elif selected_correct > 0 and selected_options.issubset(correct_options):  # Частично правильный без ошибок
-                score = 1
-            else:  # Если есть хотя бы одна ошибка
-                score = 0
+        score = scoring.score(scoring.encode(selected_options), scoring.correct_mask(question.options), question.type)
 
         user_answer = UserAnswer(
             question_id=answer.question_id,
             selected_options=answer.selected_options,
             score=score
         )
-        print(user_answer.question_id)
+        # Ответ и счетчик баллов пишутся одним условным апдейтом: параллельные ответы
+        # не затирают друг друга, а повтор того же вопроса не пройдет фильтр
+        result = await UserGeneratedQuizAttempt.get_motor_collection().update_one(
+            {"_id": attempt_id, "finished_at": None, "answers.question_id": {"$ne": answer.question_id}},
+            {"$push": {"answers": user_answer.model_dump()}, "$inc": {"score": score}},
+        )
+        if not result.modified_count:
+            raise HTTPException(status_code=400, detail="Question already answered or attempt finished")
+
         if score == 0:
             mistake = MistakeBankQuiz(
                 user_id=attempt.user_id,
@@ -205,14 +337,6 @@ class QuizGeneratorService:
             )
             await mistake.insert()
 
-
-    
-        if attempt.score is None:
-            attempt.score = 0
-        attempt.answers.append(user_answer)
-        attempt.score += score
-
-        await attempt.save()
         return {"message": "Answer submitted", "score": score,"correct_options":correct_options,"selected_options":selected_options}
 
 
@@ -241,7 +365,7 @@ class QuizGeneratorService:
         time_taken = (ended_at - started_at).total_seconds()
 
         # Вычисляем максимальный балл
-        max_score = sum(2 if q.type == QuestionType.MULTIPLE_CHOICE else 1 for q in quiz.questions)
+        max_score = sum(scoring.max_score(q.type) for q in quiz.questions)
         score = attempt.score
         questions_count = len(quiz.questions)
 
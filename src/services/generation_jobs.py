@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.generation_job import GenerationJob, GenerationJobStatus
+
+ACTIVE_STATUSES = [GenerationJobStatus.QUEUED.value, GenerationJobStatus.RUNNING.value]
+FINAL_STATUSES = (GenerationJobStatus.DONE, GenerationJobStatus.FAILED)
+LEASE_MARGIN = 30
+
+
+def job_to_dict(job: GenerationJob) -> dict:
+    return {
+        "id": str(job.id),
+        "status": job.status,
+        "quiz_id": str(job.quiz_id) if job.quiz_id else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class GenerationJobQueue:
+    """Очередь генерации квизов в Mongo, которую разбирает пул asyncio-воркеров.
+
+    Число воркеров - предел одновременных задач в процессе (сами вызовы LLM
+    ограничены общим семафором llm_client), per_user_limit - предел активных
+    задач одного пользователя. Задача берется find_one_and_update с арендой
+    (lease): если процесс упал, задачу после истечения аренды заберет другой
+    воркер, но не больше max_attempts раз.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        per_user_limit: int,
+        max_depth: int,
+        job_timeout: float,
+        poll_interval: float,
+        max_attempts: int,
+    ):
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.max_depth = max_depth
+        self.job_timeout = job_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._running_by_user: Dict[PydanticObjectId, int] = defaultdict(int)
+        self._waiters: Dict[PydanticObjectId, asyncio.Event] = {}
+        self._avg_duration = 20.0
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, user_id: PydanticObjectId, prompt: str) -> GenerationJob:
+        """Ставит задачу в очередь или отвечает 429, если очередь или лимит пользователя заполнены"""
+        collection = GenerationJob.get_motor_collection()
+        depth = await collection.count_documents({"status": GenerationJobStatus.QUEUED.value})
+        metrics.set_gauge("generation_jobs.queue_depth", depth)
+        if depth >= self.max_depth:
+            metrics.inc("generation_jobs.rejected")
+            raise HTTPException(
+                status_code=429,
+                detail="Generation queue is full",
+                headers={"Retry-After": str(self._retry_after(depth))},
+            )
+        active = await collection.count_documents({"user_id": user_id, "status": {"$in": ACTIVE_STATUSES}})
+        if active >= self.per_user_limit:
+            metrics.inc("generation_jobs.rejected_per_user")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many active generation jobs",
+                headers={"Retry-After": str(math.ceil(self._avg_duration))},
+            )
+
+        job = GenerationJob(user_id=user_id, prompt=prompt, created_at=datetime.utcnow())
+        await job.insert()
+        metrics.inc("generation_jobs.enqueued")
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: PydanticObjectId, user_id: PydanticObjectId, wait: float = 0) -> GenerationJob:
+        """Статус задачи; wait > 0 - long-poll до завершения задачи или таймаута"""
+        deadline = time.monotonic() + wait
+        while True:
+            job = await GenerationJob.get(job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+            if job.user_id != user_id:
+                raise HTTPException(status_code=403, detail="Access denied")
+            remaining = deadline - time.monotonic()
+            if job.status in FINAL_STATUSES:
+                self._waiters.pop(job_id, None)
+                return job
+            if remaining <= 0:
+                return job
+            # Свой воркер будит ожидающих сразу; задачи других процессов проверяем раз в poll_interval
+            event = self._waiters.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logging.error(f"Generation job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Задача останется running и после аренды уйдет на повтор
+                metrics.inc("generation_jobs.worker_errors")
+                logging.error(f"Generation job {job.id} worker error: {e}")
+
+    async def _claim(self) -> Optional[GenerationJob]:
+        now = datetime.utcnow()
+        collection = GenerationJob.get_motor_collection()
+        # Задачи, которые раз за разом роняли процесс, больше не повторяем
+        exhausted = await collection.update_many(
+            {
+                "status": GenerationJobStatus.RUNNING.value,
+                "lease_until": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {
+                "$set": {"status": GenerationJobStatus.FAILED.value, "error": "Too many attempts", "finished_at": now},
+                "$unset": {"lease_until": ""},
+            },
+        )
+        if exhausted.modified_count:
+            metrics.inc("generation_jobs.failed", exhausted.modified_count)
+
+        busy_users = [user_id for user_id, running in self._running_by_user.items() if running >= self.per_user_limit]
+        doc = await collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": GenerationJobStatus.QUEUED.value},
+                    {"status": GenerationJobStatus.RUNNING.value, "lease_until": {"$lt": now}},
+                ],
+                "user_id": {"$nin": busy_users},
+            },
+            {
+                "$set": {
+                    "status": GenerationJobStatus.RUNNING.value,
+                    "started_at": now,
+                    # Запас сверх таймаута, чтобы аренда не истекла, пока воркер пишет результат
+                    "lease_until": now + timedelta(seconds=self.job_timeout + LEASE_MARGIN),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
+            return None
+        job = GenerationJob.model_validate(doc)
+        metrics.observe("generation_jobs.wait_time", (now - job.created_at).total_seconds())
+        return job
+
+    async def _run(self, job: GenerationJob):
+        # Импорт здесь: сервис генерации сам зависит от кэшей и LLM-клиента
+        from src.services.generated_quiz import QuizGeneratorService
+
+        self._running_by_user[job.user_id] += 1
+        started = time.perf_counter()
+        try:
+            quiz = await asyncio.wait_for(
+                QuizGeneratorService().generate_quiz(job.prompt, job.user_id),
+                timeout=self.job_timeout,
+            )
+            update = {"status": GenerationJobStatus.DONE.value, "quiz_id": quiz.id}
+            metrics.inc("generation_jobs.done")
+        except Exception as e:
+            update = {"status": GenerationJobStatus.FAILED.value, "error": str(e) or type(e).__name__}
+            metrics.inc("generation_jobs.failed")
+            logging.error(f"Generation job {job.id} failed: {e}")
+        finally:
+            self._running_by_user[job.user_id] -= 1
+            if not self._running_by_user[job.user_id]:
+                del self._running_by_user[job.user_id]
+
+        duration = time.perf_counter() - started
+        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        metrics.observe("generation_jobs.run_time", duration)
+        update["finished_at"] = datetime.utcnow()
+        # attempts в фильтре: если задачу уже перезабрал другой воркер, его результат не затираем
+        await GenerationJob.get_motor_collection().update_one(
+            {"_id": job.id, "status": GenerationJobStatus.RUNNING.value, "attempts": job.attempts},
+            {"$set": update, "$unset": {"lease_until": ""}},
+        )
+        event = self._waiters.pop(job.id, None)
+        if event:
+            event.set()
+
+    def _retry_after(self, depth: int) -> int:
+        return max(1, math.ceil(depth / max(self.workers, 1) * self._avg_duration))
+
+
+generation_jobs = GenerationJobQueue(
+    workers=settings.GENERATION_WORKERS,
+    per_user_limit=settings.GENERATION_PER_USER_LIMIT,
+    max_depth=settings.GENERATION_QUEUE_MAX_DEPTH,
+    job_timeout=settings.GENERATION_JOB_TIMEOUT,
+    poll_interval=settings.GENERATION_POLL_INTERVAL,
+    max_attempts=settings.GENERATION_JOB_MAX_ATTEMPTS,
+)
@@ -0,0 +1,132 @@
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.leaderboard import ALL_PERIOD, ALL_SUBJECTS, LeaderboardBucket
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user import User
+
+WINDOW_DAYS = {"week": 7, "month": 30}
+REBUILD_BATCH_SIZE = 1000
+
+_window_cache: Dict[tuple, Tuple[float, dict]] = {}
+
+
+def window_periods(window: str, now: Optional[datetime] = None) -> List[str]:
+    """Дневные корзины скользящего окна (включая сегодня); для all - одна корзина за все время"""
+    if window == "all":
+        return [ALL_PERIOD]
+    today = (now or datetime.utcnow()).date()
+    return [(today - timedelta(days=i)).isoformat() for i in range(WINDOW_DAYS[window])]
+
+
+class LeaderboardService:
+    """Лидерборды за неделю/месяц и по предметам из заранее агрегированных корзин;
+    общий зачет за все время - из users.total_score"""
+
+    async def get_window_leaderboard(self, window: str = "week", subject: Optional[str] = None, limit: int = 10):
+        """Топ за окно по корзинам; all без предмета совпадает с основным лидербордом"""
+        subject = subject or ALL_SUBJECTS
+        key = (window, subject, limit)
+        cached = _window_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            metrics.inc("leaderboard_window.cache_hits")
+            return cached[1]
+
+        periods = window_periods(window)
+        if window == "all" and subject == ALL_SUBJECTS:
+            rows = self._total_score_rows(limit)
+        else:
+            rows = self._bucket_rows(periods, subject, limit)
+
+        users = []
+        rank, previous_score = 0, None
+        async for row in rows:
+            if row["score"] != previous_score:
+                rank, previous_score = len(users) + 1, row["score"]
+            users.append({
+                "rank": rank,
+                "id": str(row["_id"]),
+                "first_name": row["user"].get("first_name"),
+                "last_name": row["user"].get("last_name"),
+                "score": row["score"],
+                "profile_photo": row["user"].get("profile_photo"),
+            })
+        metrics.inc("leaderboard_window.builds")
+
+        response = {"window": window, "subject": subject, "periods": periods, "users": users}
+        _window_cache[key] = (time.monotonic() + settings.LEADERBOARD_WINDOW_CACHE_TTL, response)
+        return response
+
+    @staticmethod
+    async def _total_score_rows(limit: int) -> AsyncIterator[dict]:
+        """Общий зачет за все время - total_score, как в основном лидерборде (индекс leaderboard)"""
+        cursor = User.get_motor_collection().find(
+            {}, {"first_name": 1, "last_name": 1, "profile_photo": 1, "total_score": 1},
+        ).sort([("total_score", -1), ("_id", 1)]).limit(limit)
+        async for doc in cursor:
+            yield {"_id": doc["_id"], "score": doc.get("total_score", 0), "user": doc}
+
+    @staticmethod
+    async def _bucket_rows(periods: List[str], subject: str, limit: int) -> AsyncIterator[dict]:
+        """Слияние не более 30 дневных корзин, сырые user_answers не читаются"""
+        pipeline = [{"$match": {"period": {"$in": periods}, "subject": subject}}]
+        if len(periods) > 1:
+            pipeline.append({"$group": {"_id": "$user_id", "score": {"$sum": "$score"}}})
+        else:
+            pipeline.append({"$project": {"_id": "$user_id", "score": 1}})
+        pipeline += [
+            {"$sort": {"score": -1, "_id": 1}},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "users",
+                "localField": "_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"first_name": 1, "last_name": 1, "profile_photo": 1}}],
+                "as": "user",
+            }},
+            {"$unwind": "$user"},
+        ]
+        async for row in LeaderboardBucket.get_motor_collection().aggregate(pipeline):
+            yield row
+
+    async def rebuild_all_time_buckets(self) -> int:
+        """Пересчитывает корзины "all" по предметам из ответов завершенных попыток (бэкфилл).
+
+        Корзины появились позже начислений; запускать один раз после выкладки,
+        пока нет потока /finish - значения перезаписываются целиком.
+        """
+        pipeline = [
+            {"$match": {"is_completed": True}},
+            {"$lookup": {
+                "from": "user_answers",
+                "localField": "_id",
+                "foreignField": "attempt_id",
+                "pipeline": [{"$project": {"subject": 1, "score": 1}}],
+                "as": "answers",
+            }},
+            {"$unwind": "$answers"},
+            {"$match": {"answers.subject": {"$type": "string"}}},
+            {"$group": {"_id": {"user_id": "$user_id", "subject": "$answers.subject"}, "score": {"$sum": "$answers.score"}}},
+        ]
+        operations, rebuilt = [], 0
+        collection = LeaderboardBucket.get_motor_collection()
+        async for row in UserQuizAttempt.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+            operations.append(UpdateOne(
+                {"period": ALL_PERIOD, "subject": row["_id"]["subject"], "user_id": row["_id"]["user_id"]},
+                {"$set": {"score": row["score"]}},
+                upsert=True,
+            ))
+            if len(operations) >= REBUILD_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                rebuilt += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            rebuilt += len(operations)
+        _window_cache.clear()
+        return rebuilt
@@ -13,6 +13,7 @@ from src.schemas.req.quiz import QuizCreateDTO, QuestionDTO
 from src.models.enums import QuizSubject, QuestionType
 from src.models.mistake_bank import MistakeBankQuiz,MistakeQuizSession
 from fastapi.encoders import jsonable_encoder
+from src import scoring
 
 
 class MistakeBankQuizService:
@@ -52,12 +53,11 @@ class MistakeBankQuizService:
         
         correct_options = {opt['label'] for opt in mistake.options if opt['is_correct']}
         selected_options = set(answer.selected_options)
-        is_correct = selected_options == correct_options
-        question = await MistakeBankQuiz.find_one(MistakeBankQuiz.question_id == answer.question_id)
+        is_correct = scoring.is_full_score(scoring.encode(selected_options), scoring.correct_mask(mistake.options))
         session.mistakes.append({
             "question_id": str(answer.question_id),
-            "question_text":question.question_text,
-            "options":question.options,
+            "question_text":mistake.question_text,
+            "options":mistake.options,
             "selected_options": answer.selected_options,
             "is_correct": is_correct
         })
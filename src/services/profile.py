@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 import os
 import shutil
 import logging
@@ -10,6 +11,17 @@ from fastapi.responses import FileResponse
 
 from src.helpers.jwt_handler import JWT
 from src.helpers.password import PasswordHandler
+from src.helpers.leaderboard_snapshot import (
+    LEADERBOARD_PROJECTION,
+    LEADERBOARD_SORT,
+    decode_cursor,
+    encode_cursor,
+    entry_to_dict,
+    leaderboard_snapshots,
+)
+from src.helpers.metrics import metrics
+from src.helpers.rank_index import leaderboard_ranks
+from src.helpers.user_cache import user_cache
 from src.models.user import  User
 from src.schemas.req.profile import  UserProfileUpdateReq
 from src.schemas.req.user import UserCreateReq, UserLoginReq
@@ -17,8 +29,8 @@ from src.schemas.req.user import UserCreateReq, UserLoginReq
 
 class ProfileService:
 
-    async def get_user_by_id(self, user_id: str):
-        user = await User.find_one(User.id == PydanticObjectId(user_id))
+    async def get_user_by_id(self, user_id: PydanticObjectId):
+        user = await user_cache.get(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -32,7 +44,7 @@ class ProfileService:
             "profile_photo":user.profile_photo if user.profile_photo else None
         }
 
-    async def update_profile(self, user_id: str, profile_data: UserProfileUpdateReq):
+    async def update_profile(self, user_id: PydanticObjectId, profile_data: UserProfileUpdateReq):
         user = await User.find_one(User.id == PydanticObjectId(user_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -44,29 +56,100 @@ class ProfileService:
         if profile_data.email is not None:
             user.email = profile_data.email
         if profile_data.password is not None:
-            user.password = PasswordHandler.hash(profile_data.password)
+            user.password = await PasswordHandler.hash_async(profile_data.password)
 
         await user.save()
+        user_cache.invalidate(user.id)
         return user
 
-    async def get_leaderboard(self, skip: int = 0, limit: int = 10):
-        """Возвращает топ пользователей по total_score с поддержкой пагинации"""
-        users = await User.find().sort("-total_score").skip(skip).limit(limit).to_list()
-        total_users = await User.count()  # Общее количество пользователей
-        return {'users': users, "users_count": total_users}
+    async def get_leaderboard(self, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+        """Возвращает страницу лидерборда, курсор следующей страницы и версию снапшота (0 - живой запрос)"""
+        snapshot = leaderboard_snapshots.current()
+        after = None
+        offset = skip
+        if cursor:
+            version, offset, score, user_id = decode_cursor(cursor)
+            after = (score, user_id)
+            if snapshot and version != snapshot.version:
+                # Курсор от прошлой версии: продолжаем сразу после его последней строки
+                offset = snapshot.offset_after(score, user_id)
+
+        if snapshot and snapshot.covers(offset, limit):
+            metrics.inc("leaderboard.snapshot_hits")
+            entries = snapshot.page(offset, limit)
+            users_count, version = snapshot.users_count, snapshot.version
+        else:
+            metrics.inc("leaderboard.live_queries")
+            entries = await self._live_leaderboard_page(offset, limit, after)
+            users_count, version = await User.get_motor_collection().estimated_document_count(), 0
+
+        next_cursor = None
+        if len(entries) == limit:
+            last = entries[-1]
+            next_cursor = encode_cursor(version, offset + len(entries), last[4], last[1])
+        return {"users": [entry_to_dict(e) for e in entries], "users_count": users_count}, next_cursor, version
 
-    async def get_user_rank(self, user_id: str):
+    async def _live_leaderboard_page(self, offset: int, limit: int, after: Optional[tuple]) -> list:
+        query = {}
+        if after:
+            score, user_id = after
+            query = {"$or": [{"total_score": {"$lt": score}}, {"total_score": score, "_id": {"$gt": user_id}}]}
+        cursor = User.get_motor_collection().find(query, LEADERBOARD_PROJECTION).sort(LEADERBOARD_SORT)
+        if not after:
+            cursor = cursor.skip(offset)
+        docs = await cursor.limit(limit).to_list(length=limit)
+
+        entries = []
+        for position, doc in enumerate(docs):
+            score = doc.get("total_score", 0)
+            if leaderboard_ranks.index.ready:
+                rank = leaderboard_ranks.index.count_greater(score) + 1
+            else:
+                rank = offset + position + 1
+            entries.append((rank, doc["_id"], doc.get("first_name"), doc.get("last_name"), score, doc.get("profile_photo")))
+        return entries
+
+    async def get_user_rank(self, user_id: PydanticObjectId, around: int = 0):
         """Возвращает место текущего пользователя в лидерборде и его total_score"""
-        user = await User.get(user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        index = leaderboard_ranks.index
+        user_id = PydanticObjectId(user_id)
+        if index.ready and index.score_of(user_id) is None:
+            # Пользователь мог появиться в другом воркере после сборки индекса
+            user = await user_cache.get(user_id)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            index.set_score(user.id, user.total_score)
 
-        rank = await User.find(User.total_score > user.total_score).count() + 1
-        total_users = await User.count()
+        if not index.ready:
+            user = await user_cache.get(user_id)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            rank = await User.find(User.total_score > user.total_score).count() + 1
+            total_users = await User.count()
+            return {"rank": rank, "total_score": user.total_score, "users_count": total_users}
 
-        return {"rank": rank, "total_score": user.total_score, "users_count": total_users}
+        response = {"rank": index.rank(user_id), "total_score": index.score_of(user_id), "users_count": len(index)}
+        if around:
+            response["around"] = await self._rank_neighbours(index.around(user_id, around))
+        return response
 
-    async def update_profile_photo(self, user_id: str, file: UploadFile):
+    async def _rank_neighbours(self, entries: list) -> list:
+        users = await User.find({"_id": {"$in": [user_id for _, user_id, _ in entries]}}).to_list()
+        user_map = {user.id: user for user in users}
+        return [
+            {
+                "rank": rank,
+                "id": str(user_id),
+                "first_name": user_map[user_id].first_name,
+                "last_name": user_map[user_id].last_name,
+                "score": score,
+                "profile_photo": user_map[user_id].profile_photo,
+            }
+            for rank, user_id, score in entries
+            if user_id in user_map
+        ]
+
+    async def update_profile_photo(self, user_id: PydanticObjectId, file: UploadFile):
         """Обновляет фото пользователя, удаляя старое"""
         user = await User.get(user_id)
         UPLOAD_DIR = "uploads"
@@ -101,11 +184,12 @@ class ProfileService:
         # Обновляем запись в базе с новым путем
         user.profile_photo = new_file_path
         await user.save()
+        user_cache.invalidate(user.id)
         
         return {"message": "Profile photo updated successfully", "photo_url": new_file_path}
 
-    async def get_profile_photo(self, user_id: str):
-        user = await User.get(user_id)
+    async def get_profile_photo(self, user_id: PydanticObjectId):
+        user = await user_cache.get(user_id)
         if not user or not user.profile_photo:
             raise HTTPException(status_code=404, detail="Photo not found")
         
@@ -0,0 +1,224 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from src.core.settings import settings
+from src.helpers.metrics import metrics
+from src.models.question import Question
+from src.models.quiz import Quiz
+from src.schemas.req.quiz import QuestionDTO
+from src.services.quiz import QuizService
+
+OPTION_LABELS = "ABCDEFGH"
+MAX_REPORTED_ERRORS = 1000
+# Запись CSV с незакрытой кавычкой не копится в памяти бесконечно
+MAX_CSV_RECORD_CHARS = 1 << 20
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _parse_csv_row(header: List[str], record: str) -> dict:
+    """CSV: quiz_id?, type, subject, question_text, correct ("A;C"), A..H - тексты вариантов"""
+    values = next(csv.reader(io.StringIO(record, newline="")), [])
+    row = dict(zip(header, values))
+    correct = {label.strip().upper() for label in row.get("correct", "").replace(",", ";").split(";") if label.strip()}
+    return {
+        "quiz_id": row.get("quiz_id") or None,
+        "type": row.get("type"),
+        "subject": row.get("subject"),
+        "question_text": row.get("question_text"),
+        "options": [
+            {"label": label, "option_text": row[label], "is_correct": label in correct}
+            for label in OPTION_LABELS
+            if row.get(label)
+        ],
+    }
+
+
+def validate_rows(
+    fmt: str,
+    header: Optional[List[str]],
+    rows: List[Tuple[int, str]],
+    default_quiz_id: Optional[str],
+) -> Tuple[List[Tuple[int, dict]], List[dict]]:
+    """Разбирает и валидирует пачку строк; выполняется в процессе пула"""
+    valid, errors = [], []
+    for row_number, line in rows:
+        try:
+            raw = json.loads(line) if fmt == "jsonl" else _parse_csv_row(header, line)
+            quiz_id = raw.pop("quiz_id", None) or default_quiz_id
+            if not quiz_id:
+                raise ValueError("quiz_id is required")
+            question = QuestionDTO.model_validate(raw)
+            labels = [opt.label for opt in question.options]
+            if len(labels) != len(set(labels)):
+                raise ValueError("duplicate option labels")
+            if not any(opt.is_correct for opt in question.options):
+                raise ValueError("question has no correct option")
+            document = {"quiz_id": ObjectId(quiz_id), **question.model_dump(mode="json")}
+            valid.append((row_number, document))
+        except Exception as e:
+            errors.append({"row": row_number, "error": str(e)})
+    return valid, errors
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбивает поток байт на строки UTF-8 без чтения всего тела в память"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Собирает из строк записи CSV: поле в кавычках может содержать переводы строк.
+
+    Запись закончена, когда кавычек в ней четное число (экранированная "" - две).
+    Пустые строки между записями пропускаются, внутри поля - сохраняются.
+    """
+    parts: List[str] = []
+    quotes = size = 0
+    async for line in lines:
+        line = line.rstrip("\r")
+        if not parts and not line.strip():
+            continue
+        parts.append(line)
+        quotes += line.count('"')
+        size += len(line)
+        if quotes % 2 == 0 or size > MAX_CSV_RECORD_CHARS:
+            yield "\n".join(parts)
+            parts, quotes, size = [], 0, 0
+    if parts:
+        yield "\n".join(parts)
+
+
+class QuestionImportService:
+    """Потоковый импорт вопросов из JSONL/CSV"""
+
+    async def import_questions(
+        self,
+        lines: AsyncIterator[str],
+        fmt: str = "jsonl",
+        default_quiz_id: Optional[PydanticObjectId] = None,
+    ) -> dict:
+        """Валидирует строки в пуле процессов и пишет их батчами insert_many(ordered=False).
+
+        Ошибки по строкам собираются в отчет и не прерывают импорт.
+        """
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        default_quiz = str(default_quiz_id) if default_quiz_id else None
+
+        report = {"inserted": 0, "failed": 0, "errors": []}
+        header = None
+        known_quizzes: Dict[ObjectId, bool] = {}
+        added = defaultdict(list)  # quiz_id -> [(subject, type)]
+        pending_docs: List[Tuple[int, dict]] = []
+        in_flight = []
+
+        async def drain(wait_all: bool = False):
+            # Результаты пула забираем по порядку, держа в полете не больше 2 * workers пачек
+            while in_flight and (wait_all or len(in_flight) >= settings.IMPORT_WORKERS * 2):
+                valid, errors = await in_flight.pop(0)
+                self._add_errors(report, errors)
+                pending_docs.extend(valid)
+                if len(pending_docs) >= settings.IMPORT_BATCH_SIZE:
+                    await self._write_batch(pending_docs, known_quizzes, added, report)
+                    pending_docs.clear()
+
+        if fmt == "csv":
+            lines = iter_csv_records(lines)
+        chunk: List[Tuple[int, str]] = []
+        row_number = 0
+        async for line in lines:
+            line = line.strip("\r")
+            if not line.strip():
+                continue
+            if fmt == "csv" and header is None:
+                header = [h.strip() for h in next(csv.reader([line]))]
+                continue
+            row_number += 1
+            chunk.append((row_number, line))
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                in_flight.append(loop.run_in_executor(executor, validate_rows, fmt, header, chunk, default_quiz))
+                chunk = []
+                await drain()
+
+        if chunk:
+            in_flight.append(loop.run_in_executor(executor, validate_rows, fmt, header, chunk, default_quiz))
+        await drain(wait_all=True)
+        if pending_docs:
+            await self._write_batch(pending_docs, known_quizzes, added, report)
+
+        quiz_service = QuizService()
+        for quiz_id, questions in added.items():
+            await quiz_service.on_questions_added(quiz_id, questions)
+
+        report["rows"] = row_number
+        metrics.inc("question_import.inserted", report["inserted"])
+        metrics.inc("question_import.failed", report["failed"])
+        return report
+
+    async def _write_batch(self, docs: List[Tuple[int, dict]], known_quizzes: dict, added: dict, report: dict):
+        unknown = {doc["quiz_id"] for _, doc in docs} - known_quizzes.keys()
+        if unknown:
+            found = {
+                quiz["_id"]
+                async for quiz in Quiz.get_motor_collection().find({"_id": {"$in": list(unknown)}}, {"_id": 1})
+            }
+            known_quizzes.update({quiz_id: quiz_id in found for quiz_id in unknown})
+
+        batch = []
+        for row_number, doc in docs:
+            if known_quizzes[doc["quiz_id"]]:
+                batch.append((row_number, doc))
+            else:
+                self._add_errors(report, [{"row": row_number, "error": f"Quiz {doc['quiz_id']} not found"}])
+        if not batch:
+            return
+
+        failed_indexes = set()
+        try:
+            await Question.get_motor_collection().insert_many([doc for _, doc in batch], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                self._add_errors(report, [{"row": batch[write_error["index"]][0], "error": write_error.get("errmsg")}])
+
+        for index, (_, doc) in enumerate(batch):
+            if index not in failed_indexes:
+                added[doc["quiz_id"]].append((doc["subject"], doc["type"]))
+                report["inserted"] += 1
+
+    @staticmethod
+    def _add_errors(report: dict, errors: List[dict]):
+        report["failed"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        if room > 0:
+            report["errors"].extend(errors[:room])
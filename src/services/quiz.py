@@ -1,6 +1,12 @@
 from beanie import PydanticObjectId
 from fastapi import HTTPException
-from datetime import datetime
+import base64
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import TypeAdapter
+from pymongo import ReturnDocument
 from src.schemas.res.question import OptionResponse, QuestionResponse
 from src.models.user_answer import AnswerCreate, UserAnswer
 from src.models.user import User
@@ -8,9 +14,40 @@ from src.models.quiz import Quiz, QuizStructure
 from src.models.question import Question
 from src.models.quiz_session import UserQuizAttempt
 from src.schemas.req.quiz import QuizCreateDTO, QuestionDTO
-from src.models.enums import QuizSubject, QuestionType
+from src.models.enums import PROFILE_SUBJECTS, QuizSubject, QuizType, QuestionType
 from src.models.mistake_bank import MistakeBankQuiz
 from fastapi.encoders import jsonable_encoder
+from src import scoring
+from src.helpers.answer_key_cache import AnswerKey, answer_key_cache
+from src.helpers.question_payload_cache import question_payload_cache
+from src.helpers.question_pool import question_pool
+from src.core.settings import settings
+from src.services.score import ScoreService
+from src.services.answer_buffer import answer_buffer
+from src.services.attempt_pipelines import attempt_details_pipeline, attempt_history_pipeline
+
+HISTORY_PAGE_SIZE = 50
+QUESTION_LIST_ADAPTER = TypeAdapter(List[QuestionResponse])
+
+
+def _encode_history_cursor(started_at: datetime, attempt_id: PydanticObjectId) -> str:
+    raw = f"{started_at.isoformat()}|{attempt_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_history_cursor(cursor: str) -> dict:
+    """Фильтр keyset-пагинации: попытки строго после курсора в порядке (started_at, _id) desc"""
+    try:
+        started_at, attempt_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        started_at = datetime.fromisoformat(started_at)
+        attempt_id = PydanticObjectId(attempt_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"started_at": {"$lt": started_at}},
+        {"started_at": started_at, "_id": {"$lt": attempt_id}},
+    ]}
+
 
 class QuizService:
     async def create_quiz(self, quiz_data: QuizCreateDTO):
@@ -19,6 +56,7 @@ class QuizService:
             variant=quiz_data.variant,
             year=quiz_data.year,
             title=quiz_data.title,
+            time_limit_minutes=quiz_data.time_limit_minutes,
         )        
         await quiz.insert()
         new_subjects = [
@@ -35,18 +73,145 @@ class QuizService:
             raise HTTPException(status_code=404, detail="Quiz not found")
         question = Question(quiz_id=quiz_id, **question_data.dict())
         await question.insert()
+        await self.on_questions_added(quiz_id, [(question.subject, question.type)])
         return question
 
+    async def on_questions_added(self, quiz_id: PydanticObjectId, questions: List[Tuple[str, str]]):
+        """Инкрементально обновляет агрегаты квиза по (subject, type) новых вопросов и сбрасывает его кэши"""
+        inc = defaultdict(int)
+        for subject, question_type in questions:
+            inc[f"question_counts.{QuizSubject(subject).value}"] += 1
+            inc["max_score"] += scoring.max_score(question_type)
+        inc["questions_count"] = len(questions)
+        inc["version"] = 1
+        await Quiz.get_motor_collection().update_one({"_id": quiz_id}, {"$inc": dict(inc)})
+        answer_key_cache.invalidate(quiz_id)
+        question_payload_cache.invalidate(quiz_id)
+        for subject in {subject for subject, _ in questions}:
+            question_pool.invalidate(QuizSubject(subject).value)
+
+    async def rebuild_quiz_stats(self, only_missing: bool = False) -> int:
+        """Пересчитывает агрегаты квизов по коллекции questions (бэкфилл)"""
+        query = {"version": {"$exists": False}} if only_missing else {}
+        quiz_ids = [quiz["_id"] async for quiz in Quiz.get_motor_collection().find(query, {"_id": 1})]
+        if not quiz_ids:
+            return 0
+
+        stats = {quiz_id: {"question_counts": {}, "questions_count": 0, "max_score": 0} for quiz_id in quiz_ids}
+        pipeline = [
+            {"$match": {"quiz_id": {"$in": quiz_ids}}},
+            {"$group": {
+                "_id": {"quiz_id": "$quiz_id", "subject": "$subject"},
+                "count": {"$sum": 1},
+                "max_score": {"$sum": scoring.mongo_max_score_expr("$type")},
+            }},
+        ]
+        async for row in Question.get_motor_collection().aggregate(pipeline):
+            quiz_stats = stats[row["_id"]["quiz_id"]]
+            quiz_stats["question_counts"][row["_id"]["subject"]] = row["count"]
+            quiz_stats["questions_count"] += row["count"]
+            quiz_stats["max_score"] += row["max_score"]
+
+        for quiz_id, quiz_stats in stats.items():
+            await Quiz.get_motor_collection().update_one(
+                {"_id": quiz_id},
+                {"$set": quiz_stats, "$inc": {"version": 1}},
+            )
+        return len(stats)
+
     async def get_all_quizzes(self):
         """Получение всех квизов"""
         return await Quiz.find_all().to_list()
 
     async def start_quiz_attempt(self, quiz_id: PydanticObjectId, user_id: PydanticObjectId):
         """Начало попытки квиза"""
-        attempt = UserQuizAttempt(user_id=user_id, quiz_id=quiz_id, score=0)
+        quiz = await Quiz.get(quiz_id)
+        started_at = datetime.utcnow()
+        attempt = UserQuizAttempt(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            score=0,
+            started_at=started_at,
+            expires_at=self._attempt_expires_at(quiz, started_at),
+            answered_question_ids=[],
+        )
         await attempt.insert()
         return attempt
 
+    async def start_variant_attempt(
+        self,
+        quiz_id: PydanticObjectId,
+        user_id: PydanticObjectId,
+        quiz_type: Optional[QuizType] = None,
+    ):
+        """Начало попытки со случайным вариантом: вопросы по структуре квиза и профильным предметам из общего пула"""
+        quiz = await Quiz.get(quiz_id)
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+
+        plan = {s.subject.value: s.question_count for s in quiz.structure}
+        if quiz_type:
+            for subject in PROFILE_SUBJECTS[quiz_type]:
+                plan.setdefault(subject.value, settings.PROFILE_QUESTION_COUNT)
+
+        question_ids, max_score = [], 0
+        for subject, count in plan.items():
+            for question_id, question_type in await question_pool.sample(subject, count):
+                question_ids.append(question_id)
+                max_score += scoring.max_score(question_type)
+        if not question_ids:
+            raise HTTPException(status_code=400, detail="No questions available for this variant")
+
+        started_at = datetime.utcnow()
+        attempt = UserQuizAttempt(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            score=0,
+            started_at=started_at,
+            expires_at=self._attempt_expires_at(quiz, started_at),
+            question_ids=question_ids,
+            max_score=max_score,
+            answered_question_ids=[],
+        )
+        await attempt.insert()
+        return attempt
+
+    async def get_attempt_questions(self, attempt_id: PydanticObjectId, user_id: PydanticObjectId) -> List[QuestionResponse]:
+        """Вопросы собранного варианта в порядке выдачи, без правильных ответов"""
+        attempt = await UserQuizAttempt.get(attempt_id)
+        if not attempt:
+            raise HTTPException(status_code=404, detail="Quiz attempt not found")
+        if attempt.user_id != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        if attempt.question_ids is None:
+            return await self.get_quiz_questions(attempt.quiz_id)
+
+        questions = await self._load_variant_questions(attempt.question_ids)
+        return [self._question_response(q) for q in questions]
+
+    @staticmethod
+    async def _load_variant_questions(question_ids: List[PydanticObjectId]) -> List[Question]:
+        """Вопросы по списку ID в том же порядке (удаленные пропускаются)"""
+        questions = {q.id: q for q in await Question.find({"_id": {"$in": question_ids}}).to_list()}
+        return [questions[qid] for qid in question_ids if qid in questions]
+
+    @staticmethod
+    def _attempt_expires_at(quiz: Optional[Quiz], started_at: datetime) -> datetime:
+        minutes = quiz.time_limit_minutes if quiz and quiz.time_limit_minutes else settings.ATTEMPT_TIME_LIMIT_MINUTES
+        return started_at + timedelta(minutes=minutes)
+
+    @staticmethod
+    def _check_attempt_open(attempt: UserQuizAttempt):
+        if attempt.is_completed:
+            raise HTTPException(status_code=400, detail="Quiz attempt already finished")
+        if attempt.expires_at and attempt.expires_at <= datetime.utcnow():
+            raise HTTPException(status_code=400, detail="Quiz attempt time is over")
+
+    @staticmethod
+    def _check_variant_question(attempt: UserQuizAttempt, question_id: PydanticObjectId):
+        if attempt.question_ids is not None and question_id not in attempt.question_ids:
+            raise HTTPException(status_code=400, detail="Question is not part of this attempt")
+
     async def submit_answer(self, attempt_id: PydanticObjectId, answer_data: AnswerCreate, user_id: PydanticObjectId):
         """Сохраняет ответ пользователя на вопрос и проверяет правильность"""
         attempt = await UserQuizAttempt.get(attempt_id)
@@ -54,82 +219,200 @@ class QuizService:
             raise HTTPException(status_code=404, detail='Quiz attempt not found')
         if attempt.user_id != user_id:
             raise HTTPException(status_code=403, detail="You can't rewrite someone's quiz attempt")
+        self._check_attempt_open(attempt)
+        self._check_variant_question(attempt, answer_data.question_id)
         
         # Проверка, что пользователь не отвечал на этот вопрос ранее
-        existing_answer = await UserAnswer.find_one({"attempt_id": attempt_id, "question_id": answer_data.question_id})
+        existing_answer = answer_buffer.has_answer(attempt_id, answer_data.question_id) or \
+            await UserAnswer.find_one({"attempt_id": attempt_id, "question_id": answer_data.question_id})
         if existing_answer:
             raise HTTPException(status_code=400, detail="You have already answered this question")
         
-        question = await Question.get(answer_data.question_id)
-        if not question:
-            raise HTTPException(status_code=404, detail='Question not found')
-        
-        score = 0
+        answer_key = await answer_key_cache.get_for_attempt(attempt, answer_data.question_id)
+        if not answer_key:
+            # Вопроса нет в ключе квиза (добавлен после загрузки или из другого квиза)
+            question = await Question.get(answer_data.question_id)
+            if not question:
+                raise HTTPException(status_code=404, detail='Question not found')
+            answer_key = AnswerKey.from_question(question)
         
-        if question.type == QuestionType.SINGLE_CHOICE:
-            correct_option = next((opt for opt in question.options if opt.is_correct), None)
-            score = 1 if correct_option and correct_option.label in answer_data.option_labels else 0
-        
-        elif question.type == QuestionType.MULTIPLE_CHOICE:
-            correct_options = {opt.label for opt in question.options if opt.is_correct}
-            selected_options = set(answer_data.option_labels)
-            correct_selected = selected_options & correct_options
-            
-            if len(correct_selected) == len(correct_options):
-                score = 2 
-            elif len(correct_selected) > 0:
-                score = 1  
-            else:
-                score = 0 
-        if (question.type == QuestionType.SINGLE_CHOICE and score == 0) or \
-            (question.type == QuestionType.MULTIPLE_CHOICE and score < 2):
-            mistake = MistakeBankQuiz(
-                user_id=attempt.user_id,
-                question_id=answer_data.question_id,
-                added_at=datetime.utcnow(),
-                quiz_id=attempt.quiz_id,  
-                question_text=question.question_text, 
-                options=[{"label": opt.label,"option_text":opt.option_text,'is_correct':opt.is_correct} for opt in question.options]   # Add options here
-            )
-            await mistake.insert()
+        selected = scoring.encode(answer_data.option_labels)
+        score = scoring.score(selected, answer_key.correct_mask, answer_key.type)
+        mistake = None
+        if score < scoring.max_score(answer_key.type):
+            mistake = self._make_mistake(attempt, answer_data.question_id, answer_key)
 
-    
         user_answer = UserAnswer(
             attempt_id=attempt_id,
             question_id=answer_data.question_id,
             selected_options=answer_data.option_labels,
             score=score,
+            subject=answer_key.subject,
         )
+        await self._count_answers(attempt, [user_answer])
+        if answer_buffer.enabled:
+            await answer_buffer.add(user_answer, mistake)
+            return user_answer
+
+        if mistake:
+            await mistake.insert()
         await user_answer.insert()
 
         return user_answer
     
-    async def submit_quiz_attempt(self, attempt_id: PydanticObjectId, user_id: PydanticObjectId):
-        """Завершение квиза с автоматическим расчетом балла"""
+    async def submit_answers(self, attempt_id: PydanticObjectId, answers: List[AnswerCreate], user_id: PydanticObjectId):
+        """Сохраняет пачку ответов за один проход: один запрос на попытку, уже данные ответы и вопросы"""
         attempt = await UserQuizAttempt.get(attempt_id)
         if not attempt:
-            raise HTTPException(status_code=404, detail="Quiz Attempt not found")
+            raise HTTPException(status_code=404, detail='Quiz attempt not found')
         if attempt.user_id != user_id:
-            raise HTTPException(status_code=403, detail="You can't submit someone else's quiz attempt")
+            raise HTTPException(status_code=403, detail="You can't rewrite someone's quiz attempt")
+        self._check_attempt_open(attempt)
 
-        user_answers = await UserAnswer.find({"attempt_id": attempt_id}).to_list()
-        total_score = sum(answer.score for answer in user_answers)
-        attempt.score = total_score
-        attempt.ended_at = datetime.utcnow()
-        attempt.is_completed = True
+        # Повторы внутри пачки и уже сохраненные ответы пропускаем (клиент может переотправить чанк)
+        unique_answers = {}
+        for answer_data in answers:
+            self._check_variant_question(attempt, answer_data.question_id)
+            unique_answers.setdefault(answer_data.question_id, answer_data)
 
-        user = await User.get(user_id)
-        if not user:
+        existing_answers = await UserAnswer.find(
+            {"attempt_id": attempt_id, "question_id": {"$in": list(unique_answers)}}
+        ).to_list()
+        skipped = {ua.question_id for ua in existing_answers}
+        skipped.update(qid for qid in unique_answers if answer_buffer.has_answer(attempt_id, qid))
+        pending = [a for qid, a in unique_answers.items() if qid not in skipped]
+
+        answer_keys = {}
+        for answer_data in pending:
+            answer_key = await answer_key_cache.get_for_attempt(attempt, answer_data.question_id)
+            if answer_key:
+                answer_keys[answer_data.question_id] = answer_key
+
+        missing_ids = [a.question_id for a in pending if a.question_id not in answer_keys]
+        if missing_ids:
+            questions = await Question.find({"_id": {"$in": missing_ids}}).to_list()
+            answer_keys.update({q.id: AnswerKey.from_question(q) for q in questions})
+            not_found = [str(qid) for qid in missing_ids if qid not in answer_keys]
+            if not_found:
+                raise HTTPException(status_code=404, detail=f"Questions not found: {', '.join(not_found)}")
+
+        user_answers = []
+        mistakes = []
+        buffered = []
+        for answer_data in pending:
+            answer_key = answer_keys[answer_data.question_id]
+            selected = scoring.encode(answer_data.option_labels)
+            score = scoring.score(selected, answer_key.correct_mask, answer_key.type)
+            mistake = None
+            if score < scoring.max_score(answer_key.type):
+                mistake = self._make_mistake(attempt, answer_data.question_id, answer_key)
+                mistakes.append(mistake)
+            user_answer = UserAnswer(
+                attempt_id=attempt_id,
+                question_id=answer_data.question_id,
+                selected_options=answer_data.option_labels,
+                score=score,
+                subject=answer_key.subject,
+            )
+            user_answers.append(user_answer)
+            buffered.append((user_answer, mistake))
+
+        await self._count_answers(attempt, user_answers)
+        if answer_buffer.enabled:
+            for user_answer, mistake in buffered:
+                await answer_buffer.add(user_answer, mistake)
+        else:
+            if mistakes:
+                await MistakeBankQuiz.insert_many(mistakes)
+            if user_answers:
+                result = await UserAnswer.insert_many(user_answers)
+                for user_answer, inserted_id in zip(user_answers, result.inserted_ids):
+                    user_answer.id = inserted_id
+
+        return {
+            "answers": user_answers,
+            "skipped": [str(qid) for qid in skipped],
+        }
+
+    @staticmethod
+    def _make_mistake(attempt: UserQuizAttempt, question_id: PydanticObjectId, answer_key: AnswerKey) -> MistakeBankQuiz:
+        return MistakeBankQuiz(
+            user_id=attempt.user_id,
+            question_id=question_id,
+            added_at=datetime.utcnow(),
+            quiz_id=attempt.quiz_id,  
+            question_text=answer_key.question_text, 
+            options=answer_key.options
+        )
+
+    async def _count_answers(self, attempt: UserQuizAttempt, user_answers: List[UserAnswer]):
+        """Засчитывает ответы в score попытки одним условным апдейтом, пока она открыта.
+
+        Закрытие попытки - условный апдейт того же документа, поэтому ответ либо попадает
+        в итоговый балл, либо получает 400: принятый ответ не может потеряться при /finish.
+        """
+        if not user_answers or attempt.answered_question_ids is None:
+            return
+        inc = defaultdict(float)
+        for user_answer in user_answers:
+            inc["score"] += user_answer.score
+            if user_answer.subject:
+                inc[f"subject_scores.{QuizSubject(user_answer.subject).value}"] += user_answer.score
+        question_ids = [user_answer.question_id for user_answer in user_answers]
+        result = await UserQuizAttempt.get_motor_collection().update_one(
+            {"_id": attempt.id, "is_completed": False, "answered_question_ids": {"$nin": question_ids}},
+            {"$inc": dict(inc), "$push": {"answered_question_ids": {"$each": question_ids}}},
+        )
+        if result.modified_count:
+            return
+        attempt_doc = await UserQuizAttempt.get_motor_collection().find_one({"_id": attempt.id}, {"is_completed": 1})
+        if attempt_doc and attempt_doc["is_completed"]:
+            raise HTTPException(status_code=400, detail="Quiz attempt already finished")
+        raise HTTPException(status_code=400, detail="You have already answered this question")
+
+    async def submit_quiz_attempt(self, attempt_id: PydanticObjectId, user_id: PydanticObjectId):
+        """Завершение квиза с автоматическим расчетом балла"""
+        # Попытка закрывается условным апдейтом: повторный /finish не пройдет фильтр
+        # is_completed=False и не начислит баллы дважды. Балл и баллы по предметам
+        # копились в том же документе, поэтому читаются атомарно вместе с закрытием.
+        # Буфер дописывается до закрытия: если он упадет, попытка останется открытой
+        if answer_buffer.enabled:
+            await answer_buffer.flush_attempt(attempt_id)
+        attempt_doc = await UserQuizAttempt.get_motor_collection().find_one_and_update(
+            {"_id": attempt_id, "user_id": user_id, "is_completed": False},
+            {"$set": {"ended_at": datetime.utcnow(), "is_completed": True}},
+            projection={"quiz_id": 1, "score": 1, "subject_scores": 1, "answered_question_ids": {"$slice": 0}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not attempt_doc:
+            attempt = await UserQuizAttempt.get(attempt_id)
+            if not attempt:
+                raise HTTPException(status_code=404, detail="Quiz Attempt not found")
+            if attempt.user_id != user_id:
+                raise HTTPException(status_code=403, detail="You can't submit someone else's quiz attempt")
+            raise HTTPException(status_code=400, detail="Quiz attempt already finished")
+
+        if attempt_doc.get("answered_question_ids") is None:
+            # Попытка без счетчиков: балл по сохраненным ответам после закрытия.
+            # Ответы, попавшие в буфер между дозаписью и закрытием, дописываем без права уронить начисление
+            if answer_buffer.enabled:
+                try:
+                    await answer_buffer.flush_attempt(attempt_id)
+                except Exception as e:
+                    logging.error(f"Answer buffer flush failed for finished attempt {attempt_id}: {e}")
+            by_subject = (await self._sum_answer_scores_by_subject([attempt_id])).get(attempt_id, {})
+            total_score = sum(by_subject.values())
+            await UserQuizAttempt.get_motor_collection().update_one({"_id": attempt_id}, {"$set": {"score": total_score}})
+        else:
+            by_subject = attempt_doc.get("subject_scores", {})
+            total_score = attempt_doc["score"]
+
+        if not await ScoreService().credit_user(user_id, total_score, by_subject):
             raise HTTPException(status_code=404, detail="User not found")
         
-        user.total_score = (user.total_score or 0) + total_score
-        
-        await attempt.save()
-        await user.save()
-        
         return {
-            "attempt_id": str(attempt.id),
-            "quiz_id": str(attempt.quiz_id),
+            "attempt_id": str(attempt_id),
+            "quiz_id": str(attempt_doc["quiz_id"]),
             "total_score": total_score,
         }
     
@@ -139,109 +422,285 @@ class QuizService:
             {"quiz_id": quiz_id,}  
         ).to_list()
         
-        return [
-            QuestionResponse(
-                id=str(q.id),
-                quiz_id=str(q.quiz_id),
-                type=q.type,
-                subject=q.subject,
-                question_text=q.question_text,
-                options=[
-                    OptionResponse(label=o.label, option_text=o.option_text) 
-                    for o in q.options
-                ]
-            )
-            for q in questions
-        ]
+        return [self._question_response(q) for q in questions]
+
+    @staticmethod
+    def _question_response(q: Question) -> QuestionResponse:
+        return QuestionResponse(
+            id=str(q.id),
+            quiz_id=str(q.quiz_id),
+            type=q.type,
+            subject=q.subject,
+            question_text=q.question_text,
+            options=[
+                OptionResponse(label=o.label, option_text=o.option_text) 
+                for o in q.options
+            ]
+        )
+
+    async def get_quiz_questions_payload(self, quiz_id: PydanticObjectId) -> Tuple[bytes, str]:
+        """Список вопросов квиза, сериализованный в JSON один раз на квиз, и его ETag"""
+        async def build() -> bytes:
+            return QUESTION_LIST_ADAPTER.dump_json(await self.get_quiz_questions(quiz_id))
+
+        return await question_payload_cache.get(quiz_id, build)
     
 
 
-    async def get_user_quiz_attempts(self, user_id: PydanticObjectId):
-        """Возвращает список попыток пользователя с полной информацией о квизах и вопросах."""
-        attempts = await UserQuizAttempt.find({"user_id": user_id}).to_list()
-        if not attempts:
+    async def get_user_quiz_attempts(
+        self,
+        user_id: PydanticObjectId,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        summary: bool = False,
+    ):
+        """Возвращает страницу истории попыток пользователя и курсор следующей страницы."""
+        response = []
+        last_position = None
+        async for position, attempt_data in self._history_iterator(user_id, limit, cursor, summary):
+            response.append(attempt_data)
+            last_position = position
+
+        if not response and not cursor:
             raise HTTPException(status_code=404, detail="No attempts found")
 
-        # Собираем quiz_id и attempt_id
-        quiz_ids = {attempt.quiz_id for attempt in attempts}
-        attempt_ids = {attempt.id for attempt in attempts}
+        next_cursor = None
+        if limit is not None and len(response) == limit:
+            next_cursor = _encode_history_cursor(*last_position)
+        return response, next_cursor
+
+    def stream_user_quiz_attempts(
+        self,
+        user_id: PydanticObjectId,
+        cursor: Optional[str] = None,
+        summary: bool = False,
+    ) -> AsyncIterator[dict]:
+        """Отдает историю попыток по одной, не держа в памяти всю историю."""
+        if cursor:
+            # Невалидный курсор должен дать 400 до начала стрима
+            _decode_history_cursor(cursor)
+
+        async def attempts():
+            async for _, attempt_data in self._history_iterator(user_id, None, cursor, summary):
+                yield attempt_data
+
+        return attempts()
+
+    def _history_iterator(self, user_id, limit, cursor, summary):
+        if settings.ATTEMPT_HISTORY_BACKEND == "aggregation":
+            return self._iter_attempt_history_aggregated(user_id, limit, cursor, summary)
+        return self._iter_attempt_history(user_id, limit, cursor, summary)
+
+    async def _iter_attempt_history_aggregated(
+        self,
+        user_id: PydanticObjectId,
+        limit: Optional[int],
+        cursor: Optional[str],
+        summary: bool,
+    ):
+        """То же, что _iter_attempt_history, но join и подсчет баллов делает MongoDB"""
+        match = {"user_id": user_id}
+        if cursor:
+            match.update(_decode_history_cursor(cursor))
+        pipeline = attempt_history_pipeline(match, limit, summary)
+        async for attempt_data in UserQuizAttempt.get_motor_collection().aggregate(pipeline):
+            position = (attempt_data["started_at"], attempt_data["_id"])
+            attempt_data["_id"] = str(attempt_data["_id"])
+            yield position, jsonable_encoder(attempt_data)
+
+    async def _iter_attempt_history(
+        self,
+        user_id: PydanticObjectId,
+        limit: Optional[int],
+        cursor: Optional[str],
+        summary: bool,
+    ):
+        """Читает попытки страницами по (started_at, _id) от новых к старым.
+
+        Вопросы группируются по quiz_id один раз на квиз, поэтому каждая попытка
+        собирается из готового индекса, а не фильтрацией всех вопросов.
+        """
+        quiz_index = {}  # quiz_id -> данные квиза для истории
+        # remaining считает отданные попытки: попытки удаленных квизов пропускаются,
+        # и страница дочитывается дальше, чтобы не оборвать пагинацию раньше времени
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = HISTORY_PAGE_SIZE if remaining is None else min(remaining, HISTORY_PAGE_SIZE)
+            query = {"user_id": user_id}
+            if cursor:
+                query.update(_decode_history_cursor(cursor))
+            attempts = await UserQuizAttempt.find(query).sort("-started_at", "-_id").limit(page_size).to_list()
+            if not attempts:
+                return
+
+            await self._load_history_quizzes(quiz_index, {a.quiz_id for a in attempts}, summary)
+            variants = {}
+            if not summary:
+                variants = await self._load_history_variants(attempts, quiz_index)
+            attempt_ids = [a.id for a in attempts]
+            if summary:
+                scores = await self._sum_answer_scores(attempt_ids)
+            else:
+                user_answers = await UserAnswer.find({"attempt_id": {"$in": attempt_ids}}).to_list()
+                answers_by_attempt = defaultdict(dict)
+                for ua in user_answers:
+                    answers_by_attempt[ua.attempt_id][ua.question_id] = ua
+
+            for attempt in attempts:
+                quiz_data = quiz_index.get(attempt.quiz_id)
+                if not quiz_data:
+                    continue
+                if attempt.question_ids is not None:
+                    quiz_data = variants.get(attempt.id) or {**quiz_data, "max_score": attempt.max_score}
+                if summary:
+                    attempt_data = self._attempt_history_summary(attempt, quiz_data, scores.get(attempt.id, 0))
+                else:
+                    attempt_data = self._attempt_history_item(attempt, quiz_data, answers_by_attempt.get(attempt.id, {}))
+                yield (attempt.started_at, attempt.id), attempt_data
+                if remaining is not None:
+                    remaining -= 1
+                    if not remaining:
+                        return
+
+            cursor = _encode_history_cursor(attempts[-1].started_at, attempts[-1].id)
+            if len(attempts) < page_size:
+                return
+
+    async def _load_history_quizzes(self, quiz_index: dict, quiz_ids: set, summary: bool):
+        """Догружает в индекс квизы, которых в нем еще нет"""
+        missing = [quiz_id for quiz_id in quiz_ids if quiz_id not in quiz_index]
+        if not missing:
+            return
+        quizzes = await Quiz.find({"_id": {"$in": missing}}).to_list()
+
+        if summary:
+            # Для сводки хватает материализованного max_score, вопросы не грузим
+            for quiz in quizzes:
+                quiz_index[quiz.id] = {"quiz": quiz, "max_score": quiz.max_score}
+            return
+
+        questions_by_quiz = defaultdict(list)
+        for question in await Question.find({"quiz_id": {"$in": missing}}).to_list():
+            questions_by_quiz[question.quiz_id].append(question)
+        for quiz in quizzes:
+            quiz_index[quiz.id] = self._history_quiz_data(quiz, questions_by_quiz.get(quiz.id, []), quiz.max_score)
+
+    async def _load_history_variants(self, attempts: List[UserQuizAttempt], quiz_index: dict) -> dict:
+        """Данные для истории по собранным вариантам страницы: attempt_id -> данные как у квиза"""
+        variant_attempts = [a for a in attempts if a.question_ids is not None and a.quiz_id in quiz_index]
+        if not variant_attempts:
+            return {}
+        question_ids = list({qid for a in variant_attempts for qid in a.question_ids})
+        questions = {q.id: q for q in await Question.find({"_id": {"$in": question_ids}}).to_list()}
+        return {
+            a.id: self._history_quiz_data(
+                quiz_index[a.quiz_id]["quiz"],
+                [questions[qid] for qid in a.question_ids if qid in questions],
+                a.max_score,
+            )
+            for a in variant_attempts
+        }
 
-        # Загружаем данные из БД
-        user_answers = await UserAnswer.find({"attempt_id": {"$in": list(attempt_ids)}}).to_list()
-        quizzes = await Quiz.find({"_id": {"$in": list(quiz_ids)}}).to_list()
-        questions = await Question.find({"quiz_id": {"$in": list(quiz_ids)}}).to_list()
+    @staticmethod
+    def _history_quiz_data(quiz: Quiz, questions: List[Question], max_score: int) -> dict:
+        return {
+            "quiz": quiz,
+            "questions": questions,
+            "max_score": max_score,
+        }
 
-        # Создаем мапы для быстрого поиска
-        question_map = {question.id: question for question in questions}
-        quiz_map = {quiz.id: quiz for quiz in quizzes}
-        user_answers_map = {(ua.attempt_id, ua.question_id): ua for ua in user_answers}
+    async def _sum_answer_scores(self, attempt_ids: List[PydanticObjectId]) -> dict:
+        pipeline = [
+            {"$match": {"attempt_id": {"$in": attempt_ids}}},
+            {"$group": {"_id": "$attempt_id", "score": {"$sum": "$score"}}},
+        ]
+        return {
+            row["_id"]: row["score"]
+            async for row in UserAnswer.get_motor_collection().aggregate(pipeline)
+        }
 
-        response = []
-        for attempt in attempts:
-            quiz = quiz_map.get(attempt.quiz_id)
-            if not quiz:
-                continue
-
-            # Фильтруем вопросы текущего квиза
-            quiz_questions = [q for q in questions if q.quiz_id == quiz.id]
-
-            # Вычисляем максимальный балл
-            max_score = sum(2 if q.type == QuestionType.MULTIPLE_CHOICE else 1 for q in quiz_questions)
-
-            attempt_data = jsonable_encoder(attempt)
-            attempt_data["id"] = str(attempt.id)
-            attempt_data["quiz_id"] = str(attempt.quiz_id)
-            attempt_data["user_id"] = str(attempt.user_id)
-
-            attempt_data["quiz_title"] = quiz.title
-            attempt_data["quiz_variant"] = quiz.variant
-            attempt_data["quiz_year"] = quiz.year
-            attempt_data["max_score"] = max_score
-
-            attempt_data["answers"] = []
-            user_score = 0  # Баллы пользователя за попытку
-
-            for question in quiz_questions:
-                answer = user_answers_map.get((attempt.id, question.id))
-
-                correct_options = {opt.label for opt in question.options if opt.is_correct}
-                user_selected = set(answer.selected_options) if answer else set()
-
-                # Начисление баллов пользователю
-                if answer:
-                    if question.type == QuestionType.SINGLE_CHOICE:
-                        user_score += 1 if user_selected == correct_options else 0
-                    elif question.type == QuestionType.MULTIPLE_CHOICE:
-                        correct_selected = user_selected & correct_options
-                        if len(correct_selected) == len(correct_options):
-                            user_score += 2
-                        elif len(correct_selected) > 0:
-                            user_score += 1
-
-                attempt_data["answers"].append({
-                    "question_id": str(question.id),
-                    "question_text": question.question_text,
-                    "question_type": question.type,
-                    "selected_options": list(user_selected),  # [] если вопрос пропущен
-                    "correct_options": list(correct_options),
-                    "options": [
-                        {
-                            "label": opt.label,
-                            "text": opt.option_text,
-                            "is_correct": opt.is_correct
-                        }
-                        for opt in question.options
-                    ]
-                })
-
-            attempt_data["score"] = user_score
-            response.append(attempt_data)
+    async def _sum_answer_scores_by_subject(self, attempt_ids: List[PydanticObjectId]) -> dict:
+        """attempt_id -> {subject: балл}; ответы без subject (старые) попадают под None"""
+        pipeline = [
+            {"$match": {"attempt_id": {"$in": attempt_ids}}},
+            {"$group": {"_id": {"attempt_id": "$attempt_id", "subject": "$subject"}, "score": {"$sum": "$score"}}},
+        ]
+        scores = defaultdict(dict)
+        async for row in UserAnswer.get_motor_collection().aggregate(pipeline):
+            scores[row["_id"]["attempt_id"]][row["_id"].get("subject")] = row["score"]
+        return scores
+
+    @staticmethod
+    def _attempt_history_base(attempt: UserQuizAttempt, quiz_data: dict) -> dict:
+        quiz = quiz_data["quiz"]
+        attempt_data = jsonable_encoder(attempt)
+        attempt_data["id"] = str(attempt.id)
+        attempt_data["quiz_id"] = str(attempt.quiz_id)
+        attempt_data["user_id"] = str(attempt.user_id)
+
+        attempt_data["quiz_title"] = quiz.title
+        attempt_data["quiz_variant"] = quiz.variant
+        attempt_data["quiz_year"] = quiz.year
+        attempt_data["max_score"] = quiz_data["max_score"]
+        return attempt_data
+
+    def _attempt_history_summary(self, attempt: UserQuizAttempt, quiz_data: dict, score: float) -> dict:
+        attempt_data = self._attempt_history_base(attempt, quiz_data)
+        attempt_data["score"] = score
+        return attempt_data
+
+    def _attempt_history_item(self, attempt: UserQuizAttempt, quiz_data: dict, answers_map: dict) -> dict:
+        attempt_data = self._attempt_history_base(attempt, quiz_data)
+        quiz_questions = quiz_data["questions"]
+
+        answers = [answers_map.get(question.id) for question in quiz_questions]
+
+        # Балл - сумма сохраненных баллов ответов, как в сводке и при завершении попытки
+        user_score = sum(answer.score for answer in answers_map.values())
+
+        attempt_data["answers"] = []
+        for question, answer in zip(quiz_questions, answers):
+            attempt_data["answers"].append({
+                "question_id": str(question.id),
+                "question_text": question.question_text,
+                "question_type": question.type,
+                "selected_options": list(set(answer.selected_options)) if answer else [],  # [] если вопрос пропущен
+                "correct_options": [opt.label for opt in question.options if opt.is_correct],
+                "options": [
+                    {
+                        "label": opt.label,
+                        "text": opt.option_text,
+                        "is_correct": opt.is_correct
+                    }
+                    for opt in question.options
+                ]
+            })
 
-        return response
+        attempt_data["score"] = user_score
+        return attempt_data
 
 
+    async def get_attempt_details_aggregated(self, attempt_id: PydanticObjectId, user_id: PydanticObjectId):
+        """То же, что get_attempt_details, но одним aggregation-пайплайном"""
+        results = await UserQuizAttempt.get_motor_collection().aggregate(
+            attempt_details_pipeline(attempt_id)
+        ).to_list(length=1)
+        if not results:
+            # Различаем отсутствие попытки и отсутствие квиза, как и в обычной версии
+            if not await UserQuizAttempt.get(attempt_id):
+                raise HTTPException(status_code=404, detail="Quiz attempt not found")
+            raise HTTPException(status_code=404, detail="Quiz not found")
+
+        response = results[0]
+        if response["user_id"] != str(user_id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        return response
+
     async def get_attempt_details(self, attempt_id: PydanticObjectId, user_id: PydanticObjectId):
         """Возвращает подробную информацию о конкретной попытке пользователя, включая неотвеченные вопросы."""
+        if settings.ATTEMPT_DETAILS_BACKEND == "aggregation":
+            return await self.get_attempt_details_aggregated(attempt_id, user_id)
+
         attempt = await UserQuizAttempt.get(attempt_id)
         if not attempt:
             raise HTTPException(status_code=404, detail="Quiz attempt not found")
@@ -253,9 +712,11 @@ class QuizService:
         if not quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
-        # Загружаем все вопросы квиза
-        questions = await Question.find({"quiz_id": quiz.id}).to_list()
-        question_map = {q.id: q for q in questions}
+        # Загружаем все вопросы квиза (или собранного варианта)
+        if attempt.question_ids is not None:
+            questions = await self._load_variant_questions(attempt.question_ids)
+        else:
+            questions = await Question.find({"quiz_id": quiz.id}).to_list()
 
         # Загружаем все ответы пользователя
         user_answers = await UserAnswer.find({"attempt_id": attempt_id}).to_list()
@@ -266,10 +727,13 @@ class QuizService:
         ended_at = attempt.ended_at or datetime.utcnow()
         time_taken = (ended_at - started_at).total_seconds()
 
-        # Вычисляем максимальный балл
-        max_score = sum(2 if q.type == QuestionType.MULTIPLE_CHOICE else 1 for q in questions)
+        if attempt.question_ids is not None:
+            max_score = attempt.max_score
+            questions_count = len(attempt.question_ids)
+        else:
+            max_score = quiz.max_score
+            questions_count = quiz.questions_count
         score = attempt.score
-        questions_count = len(questions)
 
         # Формируем ответ
         response = {
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+
+from src.core.settings import settings
+from src.helpers.generation_cache import generation_key
+from src.helpers.metrics import metrics
+from src.models.enums import QuizSubject
+from src.models.generated_quiz import GeneratedQuiz
+
+
+def parse_hours(value: str) -> Tuple[int, int]:
+    """"1-7" -> (1, 7); окно может переходить через полночь: "22-6" """
+    start, end = value.split("-")
+    return int(start) % 24, int(end) % 24
+
+
+# Сколько после выдачи тема считается востребованной и пополняется вне часов низкой нагрузки
+REFILL_WINDOW = timedelta(hours=24)
+
+
+class GeneratedQuizPool:
+    """Пул заранее сгенерированных квизов по предметам и популярным темам.
+
+    Заготовки - обычные GeneratedQuiz без user_id с pool_key = generation_key
+    темы. generate_quiz в любом процессе забирает одну через
+    find_one_and_update, помечая ее pooled_from и claimed_at. Прогрев (в
+    одном процессе, warmer_enabled) доводит запас до target_stock в часы
+    низкой нагрузки, а в остальное время пополняет темы, из которых брали за
+    последние REFILL_WINDOW - всё в пределах rate_per_hour генераций в час.
+    """
+
+    def __init__(
+        self,
+        warmer_enabled: bool,
+        topics: List[str],
+        target_stock: int,
+        rate_per_hour: int,
+        offpeak_hours: str,
+        interval: float,
+    ):
+        self.warmer_enabled = warmer_enabled
+        self.topics = {generation_key(topic): topic for topic in topics}
+        self.target_stock = target_stock
+        self.rate_per_hour = rate_per_hour
+        self.offpeak = parse_hours(offpeak_hours)
+        self.interval = interval
+        self._stock: Dict[str, int] = {}
+        self._refill: Set[str] = set()
+        self._generated_at: Deque[float] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.warmer_enabled or not self.topics:
+            return
+        self._task = asyncio.create_task(self._warm_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def claim(self, user_prompt: str, user_id: PydanticObjectId) -> Optional[GeneratedQuiz]:
+        """Выдает пользователю готовый квиз из пула, если запрос совпал с темой пула"""
+        key = generation_key(user_prompt)
+        if key not in self.topics:
+            metrics.inc("generation_pool.misses")
+            self._update_hit_rate()
+            return None
+
+        doc = await GeneratedQuiz.get_motor_collection().find_one_and_update(
+            # $type повторяет условие частичного индекса pool_key, иначе планировщик его не возьмет
+            {"pool_key": {"$eq": key, "$type": "string"}},
+            # pooled_from и claimed_at - сигнал прогреву в другом процессе, какие темы пополнить
+            {"$set": {"user_id": user_id, "pooled_from": key, "claimed_at": datetime.utcnow()}, "$unset": {"pool_key": ""}},
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        self._wakeup.set()
+        if not doc:
+            metrics.inc("generation_pool.empty")
+            self._update_hit_rate()
+            return None
+
+        self._stock[key] = max(self._stock.get(key, 1) - 1, 0)
+        metrics.inc("generation_pool.hits")
+        self._update_hit_rate()
+        self._publish_stock()
+        return GeneratedQuiz.model_validate(doc)
+
+    async def warm(self) -> int:
+        """Один проход прогрева; возвращает число сгенерированных квизов"""
+        await self._refresh_stock()
+        generated = 0
+        while True:
+            key = self._next_key()
+            if key is None or not self._budget_left():
+                break
+            if not await self._generate(key):
+                break  # не тратим бюджет на повторы - следующая попытка в следующем проходе
+            generated += 1
+        return generated
+
+    def _next_key(self) -> Optional[str]:
+        """Тема с наименьшим запасом: вне окна низкой нагрузки - только из запрошенных пополнений"""
+        candidates = self.topics if self._is_offpeak() else self._refill
+        short = [key for key in candidates if self._stock.get(key, 0) < self.target_stock]
+        if not short:
+            return None
+        return min(short, key=lambda key: self._stock.get(key, 0))
+
+    async def _generate(self, key: str) -> bool:
+        # Импорт здесь: сервис генерации сам обращается к пулу
+        from src.services.generated_quiz import QuizGeneratorService
+
+        topic = self.topics[key]
+        self._generated_at.append(time.monotonic())
+        started = time.perf_counter()
+        try:
+            quiz_data = await QuizGeneratorService()._generate_quiz_data(topic)
+        except Exception as e:
+            metrics.inc("generation_pool.errors")
+            logging.error(f"Quiz pool generation for {topic!r} failed: {e}")
+            return False
+        if quiz_data.get("partial"):
+            metrics.inc("generation_pool.partial_discarded")
+            return False
+
+        quiz = GeneratedQuiz(
+            title=quiz_data["title"],
+            subject=quiz_data["subject"],
+            questions=[QuizGeneratorService._build_question(question) for question in quiz_data["questions"]],
+            pool_key=key,
+        )
+        await quiz.insert()
+        self._stock[key] = self._stock.get(key, 0) + 1
+        metrics.inc("generation_pool.generated")
+        metrics.observe("generation_pool.generation_latency", time.perf_counter() - started)
+        self._publish_stock()
+        return True
+
+    async def _refresh_stock(self):
+        collection = GeneratedQuiz.get_motor_collection()
+        # Заготовки от старой модели или промпта и темы, убранные из настроек, больше не выдаются
+        await collection.delete_many({"pool_key": {"$type": "string", "$nin": list(self.topics)}})
+        pipeline = [
+            {"$match": {"pool_key": {"$in": list(self.topics), "$type": "string"}}},
+            {"$group": {"_id": "$pool_key", "count": {"$sum": 1}}},
+        ]
+        self._stock = {row["_id"]: row["count"] async for row in collection.aggregate(pipeline)}
+        # Темы, из которых недавно брали квизы (в том числе другие процессы)
+        self._refill = set(await collection.distinct(
+            "pooled_from",
+            {
+                "claimed_at": {"$gte": datetime.utcnow() - REFILL_WINDOW, "$type": "date"},
+                "pooled_from": {"$in": list(self.topics)},
+            },
+        ))
+        self._publish_stock()
+
+    def _budget_left(self) -> bool:
+        hour_ago = time.monotonic() - 3600
+        while self._generated_at and self._generated_at[0] < hour_ago:
+            self._generated_at.popleft()
+        return len(self._generated_at) < self.rate_per_hour
+
+    def _is_offpeak(self) -> bool:
+        start, end = self.offpeak
+        hour = datetime.now().hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def _publish_stock(self):
+        for key, topic in self.topics.items():
+            metrics.set_gauge(f"generation_pool.stock.{topic}", self._stock.get(key, 0))
+        metrics.set_gauge("generation_pool.stock_total", sum(self._stock.values()))
+
+    @staticmethod
+    def _update_hit_rate():
+        hits = metrics.counter("generation_pool.hits")
+        total = hits + metrics.counter("generation_pool.misses") + metrics.counter("generation_pool.empty")
+        metrics.set_gauge("generation_pool.hit_rate", hits / total if total else 0)
+
+    async def _warm_loop(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                generated = await self.warm()
+                if generated:
+                    logging.info(f"Quiz pool generated {generated} quizzes")
+            except Exception as e:
+                metrics.inc("generation_pool.errors")
+                logging.error(f"Quiz pool warm-up failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+generated_quiz_pool = GeneratedQuizPool(
+    warmer_enabled=settings.GENERATION_POOL_WARMER,
+    topics=[subject.value for subject in QuizSubject] + settings.GENERATION_POOL_TOPICS,
+    target_stock=settings.GENERATION_POOL_TARGET_STOCK,
+    rate_per_hour=settings.GENERATION_POOL_RATE_PER_HOUR,
+    offpeak_hours=settings.GENERATION_POOL_OFFPEAK_HOURS,
+    interval=settings.GENERATION_POOL_INTERVAL,
+)
@@ -0,0 +1,74 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from src.helpers.metrics import metrics
+from src.helpers.rank_index import leaderboard_ranks
+from src.helpers.user_cache import user_cache
+from src.models.leaderboard import ALL_PERIOD, ALL_SUBJECTS, LeaderboardBucket
+from src.models.user import User
+
+SubjectScores = Dict[Optional[str], float]
+
+
+class ScoreService:
+    """Начисление баллов пользователю при завершении попыток"""
+
+    async def credit_user(self, user_id: PydanticObjectId, delta: float, by_subject: Optional[SubjectScores] = None) -> bool:
+        """Атомарно прибавляет delta к total_score (один $inc, без чтения документа)"""
+        result = await User.get_motor_collection().update_one(
+            {"_id": user_id},
+            {"$inc": {"total_score": delta}},
+        )
+        if result.matched_count:
+            leaderboard_ranks.index.add_score(user_id, delta)
+            user_cache.invalidate(user_id)
+            await self._record_buckets({user_id: delta}, {user_id: by_subject or {}})
+        return result.matched_count > 0
+
+    async def credit_users(
+        self,
+        deltas: Dict[PydanticObjectId, float],
+        by_subject: Optional[Dict[PydanticObjectId, SubjectScores]] = None,
+    ):
+        """Начисляет баллы нескольким пользователям одним bulk_write ($inc на каждого)"""
+        if not deltas:
+            return
+        await User.get_motor_collection().bulk_write(
+            [UpdateOne({"_id": user_id}, {"$inc": {"total_score": delta}}) for user_id, delta in deltas.items()],
+            ordered=False,
+        )
+        for user_id, delta in deltas.items():
+            leaderboard_ranks.index.add_score(user_id, delta)
+            user_cache.invalidate(user_id)
+        await self._record_buckets(deltas, by_subject or {})
+
+    async def _record_buckets(self, deltas: Dict[PydanticObjectId, float], by_subject: Dict[PydanticObjectId, SubjectScores]):
+        """Дописывает начисления в корзины лидербордов: день по всем предметам и по каждому, все время - по каждому предмету"""
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        operations = []
+        for user_id, delta in deltas.items():
+            rows = {ALL_SUBJECTS: delta}
+            rows.update({subject: score for subject, score in by_subject.get(user_id, {}).items() if subject})
+            for subject, score in rows.items():
+                if not score:
+                    continue
+                # Общий зачет за все время читается из users.total_score, его корзина не нужна
+                periods = (day,) if subject == ALL_SUBJECTS else (day, ALL_PERIOD)
+                for period in periods:
+                    operations.append(UpdateOne(
+                        {"period": period, "subject": subject, "user_id": user_id},
+                        {"$inc": {"score": score}},
+                        upsert=True,
+                    ))
+        if not operations:
+            return
+        try:
+            await LeaderboardBucket.get_motor_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            # total_score уже начислен; корзины - производные данные и не должны ронять завершение попытки
+            metrics.inc("leaderboard_buckets.errors")
+            logging.error(f"Leaderboard bucket update failed: {e}")
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from src.core.database import DOCUMENT_MODELS
+
+TEST_DB_NAME = "unt_cs_test"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def mongo_url():
+    """Адрес mongod (TEST_DB_URL или DB_URL); тесты с базой пропускаются, если он недоступен"""
+    url = os.getenv("TEST_DB_URL") or os.getenv("DB_URL") or "mongodb://localhost:27017"
+    client = MongoClient(url, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except Exception:
+        pytest.skip("mongod is not reachable")
+    finally:
+        client.close()
+    return url
+
+
+@pytest.fixture
+async def mongo(mongo_url):
+    """Чистая тестовая база, инициализированная моделями приложения"""
+    client = AsyncIOMotorClient(mongo_url)
+    await client.drop_database(TEST_DB_NAME)
+    database = client[TEST_DB_NAME]
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+    yield database
+    await client.drop_database(TEST_DB_NAME)
+    client.close()
@@ -0,0 +1,48 @@
+import pytest
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from src.models.user_answer import UserAnswer
+from src.services.answer_buffer import AnswerBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+def make_buffer() -> AnswerBuffer:
+    return AnswerBuffer(enabled=True, flush_size=100, flush_interval=60, durability="memory", journal_path="")
+
+
+class FailingModel:
+    def __init__(self, codes):
+        self.codes = codes
+
+    async def insert_many(self, documents, ordered=True):
+        assert ordered is False
+        raise BulkWriteError({"writeErrors": [{"code": code, "index": i} for i, code in enumerate(self.codes)]})
+
+
+async def test_insert_new_ignores_duplicates():
+    await AnswerBuffer._insert_new(FailingModel([11000, 11000]), [object(), object()])
+
+
+async def test_insert_new_raises_other_errors():
+    with pytest.raises(BulkWriteError):
+        await AnswerBuffer._insert_new(FailingModel([11000, 121]), [object(), object()])
+
+
+async def test_flush_after_partial_write_drains_buffer(mongo):
+    buffer = make_buffer()
+    attempt_id = PydanticObjectId()
+    answers = [
+        UserAnswer(attempt_id=attempt_id, question_id=PydanticObjectId(), selected_options=["A"], score=1)
+        for _ in range(3)
+    ]
+    for answer in answers:
+        await buffer.add(answer)
+    # Прошлый flush успел записать первый ответ и упал
+    await UserAnswer.insert_many(answers[:1])
+
+    await buffer.flush_attempt(attempt_id)
+
+    assert not buffer.has_answer(attempt_id, answers[1].question_id)
+    assert await UserAnswer.find(UserAnswer.attempt_id == attempt_id).count() == 3
@@ -0,0 +1,39 @@
+import pytest
+from beanie import PydanticObjectId
+
+from src.helpers.answer_key_cache import AnswerKeyCache
+from src.helpers.metrics import metrics
+from src.models.enums import QuestionType, QuizSubject
+from src.models.question import Question, QuestionOption
+from src.models.quiz_session import UserQuizAttempt
+
+pytestmark = pytest.mark.anyio
+
+
+async def make_question(quiz_id: PydanticObjectId) -> Question:
+    question = Question(
+        quiz_id=quiz_id,
+        type=QuestionType.SINGLE_CHOICE,
+        subject=QuizSubject.PHYSICS,
+        question_text="Вопрос",
+        options=[QuestionOption(label=label, option_text=label, is_correct=label == "B") for label in "ABCD"],
+    )
+    await question.insert()
+    return question
+
+
+async def test_variant_attempt_hits_cache(mongo):
+    # Вопросы варианта из разных квизов, ни один не из quiz_id попытки
+    questions = [await make_question(PydanticObjectId()) for _ in range(3)]
+    attempt = UserQuizAttempt(
+        quiz_id=PydanticObjectId(), user_id=PydanticObjectId(), score=0, question_ids=[q.id for q in questions],
+    )
+    await attempt.insert()
+    cache = AnswerKeyCache(max_bytes=1024 * 1024)
+
+    loads, misses = metrics.counter("answer_key_cache.loads"), metrics.counter("answer_key_cache.misses")
+    for question in questions * 2:
+        answer_key = await cache.get_for_attempt(attempt, question.id)
+        assert answer_key.correct_mask == 0b10
+    assert metrics.counter("answer_key_cache.loads") - loads == 1
+    assert metrics.counter("answer_key_cache.misses") == misses
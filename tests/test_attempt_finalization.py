@@ -0,0 +1,251 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+from src.models.enums import QuestionType, QuizSubject
+from src.models.generated_quiz import GeneratedQuestion, GeneratedQuiz, UserGeneratedQuizAttempt
+from src.models.generated_quiz import QuestionOption as GeneratedOption
+from src.models.leaderboard import ALL_SUBJECTS, LeaderboardBucket
+from src.models.question import Question, QuestionOption
+from src.models.quiz import Quiz
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user import User
+from src.models.user_answer import AnswerCreate, UserAnswer
+from src.schemas.req.generated_quiz import UserAnswerRequest
+from src.services.answer_buffer import answer_buffer
+from src.services.attempt_sweeper import AttemptSweeper
+from src.services.generated_quiz import QuizGeneratorService
+from src.services.quiz import QuizService
+
+pytestmark = pytest.mark.anyio
+
+QUESTIONS = 30
+
+
+@pytest.fixture(autouse=True)
+def no_answer_buffer(monkeypatch):
+    monkeypatch.setattr(answer_buffer, "enabled", False)
+
+
+class FakeAttempts:
+    """Коллекция попыток в памяти: $inc/$push по точечным путям и условное закрытие"""
+
+    def __init__(self, doc: dict):
+        self.doc = doc
+        self.closed = False
+
+    async def update_one(self, query, update):
+        for path, value in update.get("$inc", {}).items():
+            *parents, leaf = path.split(".")
+            target = self.doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = target.get(leaf, 0) + value
+        for path, value in update.get("$push", {}).items():
+            self.doc.setdefault(path, []).extend(value["$each"])
+        return type("Result", (), {"modified_count": 1})()
+
+    async def find_one_and_update(self, *args, **kwargs):
+        self.closed = True
+        return None
+
+
+@pytest.fixture
+def fake_attempts(monkeypatch):
+    """Попытка без mongod: Document-модели можно создавать, запросы идут в FakeAttempts"""
+    attempts = FakeAttempts({
+        "_id": PydanticObjectId(), "quiz_id": PydanticObjectId(), "user_id": PydanticObjectId(),
+        "score": 0, "answered_question_ids": [], "subject_scores": {},
+    })
+    monkeypatch.setattr(UserQuizAttempt, "get_motor_collection", classmethod(lambda cls: attempts))
+    monkeypatch.setattr(UserAnswer, "get_motor_collection", classmethod(lambda cls: None))
+    return attempts
+
+
+async def test_subject_scores_are_keyed_by_subject_value(fake_attempts):
+    attempt = UserQuizAttempt.model_validate(fake_attempts.doc)
+    answers = [
+        UserAnswer(attempt_id=attempt.id, question_id=PydanticObjectId(), selected_options=["A"], score=score, subject=subject)
+        for score, subject in ((1, QuizSubject.PHYSICS), (2, QuizSubject.PHYSICS), (1, QuizSubject.CHEMISTRY), (1, None))
+    ]
+    await QuizService()._count_answers(attempt, answers)
+
+    assert fake_attempts.doc["subject_scores"] == {QuizSubject.PHYSICS.value: 3, QuizSubject.CHEMISTRY.value: 1}
+    assert fake_attempts.doc["score"] == 5
+    # Документ после $inc по-прежнему читается моделью (Dict[str, float])
+    assert UserQuizAttempt.model_validate(fake_attempts.doc).subject_scores == {"Физика": 3, "Химия": 1}
+
+
+async def test_failed_buffer_flush_keeps_attempt_open(fake_attempts, monkeypatch):
+    async def flush_attempt(attempt_id):
+        raise RuntimeError("journal is not writable")
+
+    monkeypatch.setattr(answer_buffer, "enabled", True)
+    monkeypatch.setattr(answer_buffer, "flush_attempt", flush_attempt)
+
+    with pytest.raises(RuntimeError):
+        await QuizService().submit_quiz_attempt(fake_attempts.doc["_id"], fake_attempts.doc["user_id"])
+    # Попытка не закрыта - повторный /finish или sweeper начислят баллы
+    assert not fake_attempts.closed
+
+
+async def make_user() -> User:
+    user = User(first_name="Тест", last_name="Тестов", email=f"{PydanticObjectId()}@test.kz", password="x")
+    await user.insert()
+    return user
+
+
+async def make_quiz() -> list:
+    quiz = Quiz(variant="1", year="2024", title="ЕНТ")
+    await quiz.insert()
+    questions = [
+        Question(
+            quiz_id=quiz.id,
+            type=QuestionType.SINGLE_CHOICE,
+            subject=QuizSubject.HISTORY_KZ if i % 2 else QuizSubject.MATHEMATICS,
+            question_text=f"Вопрос {i}",
+            options=[QuestionOption(label=label, option_text=label, is_correct=label == "A") for label in "ABCD"],
+        )
+        for i in range(QUESTIONS)
+    ]
+    await Question.insert_many(questions)
+    return quiz, await Question.find({"quiz_id": quiz.id}).to_list()
+
+
+async def gather_with_jitter(calls):
+    async def run(call):
+        await asyncio.sleep(random.random() * 0.01)
+        return await call()
+
+    return await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
+
+
+async def test_answers_racing_finish_are_counted_or_rejected(mongo):
+    user = await make_user()
+    quiz, questions = await make_quiz()
+    service = QuizService()
+    attempt = await service.start_quiz_attempt(quiz.id, user.id)
+
+    answer_calls = [
+        (lambda q=q: service.submit_answer(attempt.id, AnswerCreate(question_id=q.id, option_labels=["A"]), user.id))
+        for q in questions
+    ]
+    # Повтор первого вопроса и несколько параллельных /finish
+    answer_calls.append(answer_calls[0])
+    finish_calls = [lambda: service.submit_quiz_attempt(attempt.id, user.id) for _ in range(5)]
+    results = await gather_with_jitter(answer_calls + finish_calls)
+
+    for result in results:
+        if isinstance(result, Exception):
+            assert isinstance(result, HTTPException) and result.status_code == 400
+    accepted = [r for r in results[:len(answer_calls)] if isinstance(r, UserAnswer)]
+    finished = [r for r in results[len(answer_calls):] if isinstance(r, dict)]
+    assert len(finished) == 1
+    assert len({a.question_id for a in accepted}) == len(accepted)
+
+    # Каждый принятый ответ засчитан, отклоненный - нет, пользователю начислено ровно один раз
+    stored = await UserQuizAttempt.get(attempt.id)
+    expected = sum(a.score for a in accepted)
+    assert finished[0]["total_score"] == stored.score == expected
+    assert sorted(stored.answered_question_ids) == sorted(a.question_id for a in accepted)
+    assert (await User.get(user.id)).total_score == expected
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    bucket = await LeaderboardBucket.find_one({"period": today, "subject": ALL_SUBJECTS, "user_id": user.id})
+    assert (bucket.score if bucket else 0) == expected
+
+
+async def test_batch_answers_racing_finish(mongo):
+    user = await make_user()
+    quiz, questions = await make_quiz()
+    service = QuizService()
+    attempt = await service.start_quiz_attempt(quiz.id, user.id)
+
+    chunks = [questions[i:i + 5] for i in range(0, QUESTIONS, 5)]
+    calls = [
+        (lambda chunk=chunk: service.submit_answers(
+            attempt.id, [AnswerCreate(question_id=q.id, option_labels=["A"]) for q in chunk], user.id,
+        ))
+        for chunk in chunks
+    ]
+    calls.append(lambda: service.submit_quiz_attempt(attempt.id, user.id))
+    results = await gather_with_jitter(calls)
+
+    accepted = [a for r in results[:-1] if isinstance(r, dict) for a in r["answers"]]
+    assert isinstance(results[-1], dict)
+    assert results[-1]["total_score"] == sum(a.score for a in accepted)
+    assert (await User.get(user.id)).total_score == results[-1]["total_score"]
+
+
+async def test_generated_answers_racing_finish(mongo):
+    user = await make_user()
+    quiz = GeneratedQuiz(
+        user_id=user.id,
+        title="Химия",
+        subject="Химия",
+        questions=[
+            GeneratedQuestion(
+                id=PydanticObjectId(),
+                type="single_choice",
+                question_text=f"Вопрос {i}",
+                options=[GeneratedOption(label=label, option_text=label, is_correct=label == "A") for label in "ABCD"],
+            )
+            for i in range(QUESTIONS)
+        ],
+    )
+    await quiz.insert()
+    service = QuizGeneratorService()
+    attempt = await service.start_quiz_attempt(user.id, quiz.id)
+
+    answer_calls = [
+        (lambda q=q: service.answer_question(attempt.id, UserAnswerRequest(question_id=q.id, selected_options=["A"])))
+        for q in quiz.questions
+    ]
+    finish_calls = [lambda: service.submit_quiz_attempt(attempt.id) for _ in range(5)]
+    results = await gather_with_jitter(answer_calls + finish_calls)
+
+    accepted = [r for r in results[:len(answer_calls)] if isinstance(r, dict)]
+    finished = [r for r in results[len(answer_calls):] if isinstance(r, dict)]
+    assert len(finished) == 1
+    stored = await UserGeneratedQuizAttempt.get(attempt.id)
+    assert len(stored.answers) == len(accepted)
+    assert finished[0]["total_score"] == stored.score == sum(a["score"] for a in accepted)
+    assert (await User.get(user.id)).total_score == stored.score
+
+
+async def test_concurrent_finishes_and_sweeper_have_no_lost_updates(mongo):
+    # 1000 попыток 50 пользователей завершаются одновременно: через /finish (дважды) и sweeper
+    users = [await make_user() for _ in range(50)]
+    quiz = Quiz(variant="1", year="2024", title="ЕНТ")
+    await quiz.insert()
+    now = datetime.utcnow()
+    attempts = [
+        UserQuizAttempt(
+            quiz_id=quiz.id,
+            user_id=users[i % len(users)].id,
+            score=i % 7,
+            started_at=now,
+            expires_at=now - timedelta(seconds=1),
+            answered_question_ids=[],
+        )
+        for i in range(1000)
+    ]
+    await UserQuizAttempt.insert_many(attempts)
+    attempts = await UserQuizAttempt.find({"quiz_id": quiz.id}).to_list()
+
+    service = QuizService()
+    sweeper = AttemptSweeper(enabled=True, interval=60, batch_size=100, default_limit_minutes=60)
+    calls = [
+        (lambda a=a: service.submit_quiz_attempt(a.id, a.user_id))
+        for a in attempts for _ in range(2)
+    ]
+    calls.append(sweeper.sweep)
+    await gather_with_jitter(calls)
+
+    for user in users:
+        expected = sum(a.score for a in attempts if a.user_id == user.id)
+        assert (await User.get(user.id)).total_score == expected
+    assert await UserQuizAttempt.find({"quiz_id": quiz.id, "is_completed": False}).count() == 0
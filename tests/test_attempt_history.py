@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from src.core.settings import settings
+from src.models.enums import QuestionType, QuizSubject
+from src.models.question import Question, QuestionOption
+from src.models.quiz import Quiz
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user_answer import UserAnswer
+from src.services.quiz import QuizService
+
+pytestmark = [pytest.mark.anyio, pytest.mark.parametrize("backend", ["python", "aggregation"])]
+
+
+async def seed(user_id: PydanticObjectId) -> list:
+    quiz = Quiz(variant="1", year="2024", title="ЕНТ", questions_count=1, max_score=1)
+    await quiz.insert()
+    question = Question(
+        quiz_id=quiz.id,
+        type=QuestionType.SINGLE_CHOICE,
+        subject=QuizSubject.HISTORY_KZ,
+        question_text="Вопрос",
+        options=[QuestionOption(label=label, option_text=label, is_correct=label == "A") for label in "ABCD"],
+    )
+    await question.insert()
+
+    now = datetime.utcnow()
+    expected = []
+    for i in range(6):
+        # Каждая вторая попытка ссылается на удаленный квиз
+        quiz_id = quiz.id if i % 2 == 0 else PydanticObjectId()
+        attempt = UserQuizAttempt(quiz_id=quiz_id, user_id=user_id, score=0, started_at=now - timedelta(minutes=i))
+        await attempt.insert()
+        await UserAnswer(attempt_id=attempt.id, question_id=question.id, selected_options=["A"], score=1).insert()
+        if quiz_id == quiz.id:
+            expected.append(str(attempt.id))
+    return expected
+
+
+async def test_pagination_skips_attempts_of_deleted_quizzes(mongo, monkeypatch, backend):
+    monkeypatch.setattr(settings, "ATTEMPT_HISTORY_BACKEND", backend)
+    user_id = PydanticObjectId()
+    expected = await seed(user_id)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await QuizService().get_user_quiz_attempts(user_id, limit=2, cursor=cursor)
+        seen += [attempt["id"] for attempt in page]
+        if not cursor:
+            break
+    assert seen == expected
+
+
+async def test_summary_and_full_scores_match(mongo, monkeypatch, backend):
+    monkeypatch.setattr(settings, "ATTEMPT_HISTORY_BACKEND", backend)
+    user_id = PydanticObjectId()
+    await seed(user_id)
+
+    full, _ = await QuizService().get_user_quiz_attempts(user_id)
+    summary, _ = await QuizService().get_user_quiz_attempts(user_id, summary=True)
+    assert [a["score"] for a in full] == [a["score"] for a in summary] == [1, 1, 1]
+
+
+async def test_details_score_matches_history(mongo, monkeypatch, backend):
+    monkeypatch.setattr(settings, "ATTEMPT_HISTORY_BACKEND", backend)
+    monkeypatch.setattr(settings, "ATTEMPT_DETAILS_BACKEND", backend)
+    user_id = PydanticObjectId()
+    expected = await seed(user_id)
+
+    details = await QuizService().get_attempt_details(PydanticObjectId(expected[0]), user_id)
+    assert details["score"] == 1 and len(details["answers"]) == 1
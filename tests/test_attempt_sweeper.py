@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from src.models.quiz_session import UserQuizAttempt
+from src.services import attempt_sweeper
+from src.services.score import ScoreService
+from src.models.user import User
+from src.services.answer_buffer import answer_buffer
+from src.services.attempt_sweeper import AttemptSweeper
+
+pytestmark = pytest.mark.anyio
+
+
+def make_sweeper() -> AttemptSweeper:
+    return AttemptSweeper(enabled=True, interval=60, batch_size=10, default_limit_minutes=60)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = doc.get(key)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+        elif "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+            return False
+        elif "$in" in condition and value not in condition["$in"]:
+            return False
+        elif "$nin" in condition and value in condition["$nin"]:
+            return False
+    return True
+
+
+class FakeAttempts:
+    """Коллекция попыток в памяти: ровно те запросы, что делает sweeper"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        docs = [doc for doc in self.docs if matches(doc, query)]
+
+        class Cursor:
+            def sort(self, key, direction):
+                docs.sort(key=lambda doc: doc[key])
+                return self
+
+            def limit(self, n):
+                del docs[n:]
+                return self
+
+            async def to_list(self, length=None):
+                return [dict(doc) for doc in docs]
+
+        return Cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            for doc in self.docs:
+                if matches(doc, operation._filter):
+                    doc.update(operation._doc["$set"])
+
+
+async def test_failing_batch_does_not_block_later_attempts(monkeypatch):
+    now = datetime.utcnow()
+    docs = [
+        {
+            "_id": PydanticObjectId(), "user_id": PydanticObjectId(), "score": 1, "subject_scores": {},
+            "answered_question_ids": [], "is_completed": False, "expires_at": now - timedelta(minutes=10 - i),
+        }
+        for i in range(5)
+    ]
+    collection = FakeAttempts(docs)
+    # Две самые старые попытки - целая пачка - не дописываются
+    broken = {docs[0]["_id"], docs[1]["_id"]}
+    flushed = []
+    credited = []
+
+    async def flush_attempt(attempt_id):
+        flushed.append(attempt_id)
+        if attempt_id in broken:
+            raise RuntimeError("journal is not writable")
+
+    async def credit_users(self, deltas, by_subject=None):
+        credited.extend(deltas)
+
+    monkeypatch.setattr(UserQuizAttempt, "get_motor_collection", classmethod(lambda cls: collection))
+    monkeypatch.setattr(answer_buffer, "enabled", True)
+    monkeypatch.setattr(answer_buffer, "flush_attempt", flush_attempt)
+    monkeypatch.setattr(ScoreService, "credit_users", credit_users)
+    clock = [1000.0]
+    monkeypatch.setattr(attempt_sweeper.time, "monotonic", lambda: clock[0])
+    sweeper = AttemptSweeper(enabled=True, interval=60, batch_size=2, default_limit_minutes=60)
+
+    assert await sweeper.sweep() == 3
+    assert sorted(credited) == sorted(doc["user_id"] for doc in docs[2:])
+
+    # Следующий тик до истечения задержки: сломанные попытки не выбираются и flush не повторяется
+    flushed.clear()
+    clock[0] += 30
+    assert await sweeper.sweep() == 0
+    assert flushed == []
+    assert set(collection.queries[-1]["_id"]["$nin"]) == broken
+
+    # После задержки попытки пробуются снова; повторная неудача удваивает задержку
+    clock[0] += 31
+    assert await sweeper.sweep() == 0
+    assert set(flushed) == broken
+    assert all(failures == 2 and retry_at == clock[0] + 120 for failures, retry_at in sweeper._flush_backoff.values())
+
+    broken.clear()
+    clock[0] += 121
+    assert await sweeper.sweep() == 2
+    assert sweeper._flush_backoff == {}
+    assert all(doc["is_completed"] for doc in docs)
+
+
+async def test_flush_failure_skips_only_that_attempt(mongo, monkeypatch):
+    user = User(first_name="Тест", last_name="Тестов", email="t@test.kz", password="x")
+    await user.insert()
+    now = datetime.utcnow()
+    attempts = [
+        UserQuizAttempt(
+            quiz_id=PydanticObjectId(), user_id=user.id, score=2, started_at=now,
+            expires_at=now - timedelta(minutes=1), answered_question_ids=[],
+        )
+        for _ in range(3)
+    ]
+    for attempt in attempts:
+        await attempt.insert()
+    broken = attempts[1].id
+
+    async def flush_attempt(attempt_id):
+        if attempt_id == broken:
+            raise RuntimeError("journal is not writable")
+
+    monkeypatch.setattr(answer_buffer, "enabled", True)
+    monkeypatch.setattr(answer_buffer, "flush_attempt", flush_attempt)
+
+    assert await make_sweeper().sweep() == 2
+    assert not (await UserQuizAttempt.get(broken)).is_completed
+    assert (await User.get(user.id)).total_score == 4
+
+    # На следующем проходе буфер дописался - попытка закрывается и начисляется один раз
+    broken = None
+    assert await make_sweeper().sweep() == 1
+    assert (await User.get(user.id)).total_score == 6
+
+
+async def test_stop_waits_for_the_loop(monkeypatch):
+    sweeper = make_sweeper()
+    cancelled = asyncio.Event()
+
+    async def backfill():
+        pass
+
+    async def sweep():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(sweeper, "_backfill_expires_at", backfill)
+    monkeypatch.setattr(sweeper, "sweep", sweep)
+    await sweeper.start()
+    await asyncio.sleep(0)
+    task = sweeper._task
+
+    await sweeper.stop()
+    assert cancelled.is_set() and task.done() and sweeper._task is None
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from src.helpers.generation_cache import GenerationCache
+
+pytestmark = pytest.mark.anyio
+
+QUIZ = {"title": "Физика", "subject": "Физика", "questions": []}
+
+
+async def test_cancelled_leader_does_not_cancel_waiters():
+    cache = GenerationCache(max_size=10, ttl=60)
+    release = asyncio.Event()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await release.wait()
+        return dict(QUIZ)
+
+    leader = asyncio.create_task(cache.get_or_generate("k", generate))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(cache.get_or_generate("k", generate)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [QUIZ] * 3
+    assert leader.cancelled()
+    assert calls == [1]
+    assert cache.get("k") == QUIZ
+
+
+async def test_failed_generation_reaches_every_waiter_and_is_not_cached():
+    cache = GenerationCache(max_size=10, ttl=60)
+    release = asyncio.Event()
+
+    async def generate():
+        await release.wait()
+        raise RuntimeError("model is down")
+
+    tasks = [asyncio.create_task(cache.get_or_generate("k", generate)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("k") is None and cache._in_flight == {}
@@ -0,0 +1,72 @@
+import json
+import uuid
+
+import pytest
+
+from src.helpers.generation_fanout import dedupe_questions, is_valid_question, split_counts
+from src.services.generated_quiz import QuizGeneratorService
+
+pytestmark = pytest.mark.anyio
+
+
+def question(text: str) -> dict:
+    return {
+        "type": "single_choice",
+        "question_text": text,
+        "options": [
+            {"label": label, "option_text": label, "is_correct": label == "A"} for label in "ABCD"
+        ],
+    }
+
+
+def response(texts) -> str:
+    return json.dumps({"title": "Физика", "subject": "Физика", "questions": [question(t) for t in texts]})
+
+
+def test_split_counts():
+    assert split_counts(20, 4) == [5, 5, 5, 5]
+    assert split_counts(22, 4) == [6, 6, 5, 5]
+
+
+def test_dedupe_drops_near_identical():
+    questions = [question("Какой газ нужен для горения?"), question("какой  газ нужен для горения"), question("Что такое масса?")]
+    assert len(dedupe_questions(questions, 0.8)) == 2
+
+
+def test_invalid_single_choice_with_two_correct():
+    data = question("Вопрос")
+    data["options"][1]["is_correct"] = True
+    assert not is_valid_question(data)
+
+
+async def test_fanout_complete(monkeypatch):
+    async def generate(user_prompt, count, hint):
+        return response(f"{hint}: {uuid.uuid4().hex} {uuid.uuid4().hex}" for _ in range(count))
+
+    monkeypatch.setattr("src.services.generated_quiz.llm_client.generate_response", generate)
+    quiz_data = await QuizGeneratorService()._generate_fanout("физика", 4)
+    assert len(quiz_data["questions"]) == 20
+    assert not quiz_data["partial"]
+
+
+async def test_fanout_short_after_dedupe_is_partial(monkeypatch):
+    async def generate(user_prompt, count, hint):
+        return response("один и тот же вопрос" for _ in range(count))
+
+    monkeypatch.setattr("src.services.generated_quiz.llm_client.generate_response", generate)
+    quiz_data = await QuizGeneratorService()._generate_fanout("физика", 4)
+    assert len(quiz_data["questions"]) == 1
+    assert quiz_data["partial"]
+
+
+async def test_fanout_keeps_chunks_when_one_fails(monkeypatch):
+    async def generate(user_prompt, count, hint):
+        if "ошибки" in hint:
+            raise RuntimeError("chunk failed")
+        return response(f"{hint}: {uuid.uuid4().hex} {uuid.uuid4().hex}" for _ in range(count))
+
+    monkeypatch.setattr("src.helpers.generation_fanout.SUBTOPIC_HINTS", ["понятия", "факты", "ошибки", "задачи"])
+    monkeypatch.setattr("src.services.generated_quiz.llm_client.generate_response", generate)
+    quiz_data = await QuizGeneratorService()._generate_fanout("физика", 4)
+    assert len(quiz_data["questions"]) == 15
+    assert quiz_data["partial"]
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from src.models.generation_job import GenerationJob, GenerationJobStatus
+from src.services.generation_jobs import GenerationJobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def make_queue() -> GenerationJobQueue:
+    return GenerationJobQueue(
+        workers=1, per_user_limit=2, max_depth=10, job_timeout=60, poll_interval=0.1, max_attempts=2,
+    )
+
+
+async def insert_stale_job(attempts: int) -> GenerationJob:
+    job = GenerationJob(
+        user_id=PydanticObjectId(),
+        prompt="физика",
+        status=GenerationJobStatus.RUNNING,
+        created_at=datetime.utcnow(),
+        lease_until=datetime.utcnow() - timedelta(seconds=1),
+        attempts=attempts,
+    )
+    await job.insert()
+    return job
+
+
+async def test_expired_lease_is_reclaimed(mongo):
+    job = await insert_stale_job(attempts=1)
+    claimed = await make_queue()._claim()
+    assert claimed.id == job.id
+    assert claimed.attempts == 2
+
+
+async def test_job_over_max_attempts_fails(mongo):
+    job = await insert_stale_job(attempts=2)
+    assert await make_queue()._claim() is None
+    job = await GenerationJob.get(job.id)
+    assert job.status == GenerationJobStatus.FAILED
+
+
+async def test_stale_worker_does_not_overwrite_reclaimed_job(mongo, monkeypatch):
+    job = await insert_stale_job(attempts=0)
+    queue = make_queue()
+    stale = await queue._claim()
+    # Аренда истекла, задачу забрал другой воркер
+    await GenerationJob.get_motor_collection().update_one(
+        {"_id": job.id}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+    fresh = await queue._claim()
+    assert fresh.attempts == stale.attempts + 1
+
+    async def fail(self, prompt, user_id):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("src.services.generated_quiz.QuizGeneratorService.generate_quiz", fail)
+    await queue._run(stale)
+    job = await GenerationJob.get(job.id)
+    assert job.status == GenerationJobStatus.RUNNING
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from beanie import PydanticObjectId
+
+from src.models.enums import QuizSubject
+from src.models.leaderboard import ALL_PERIOD, LeaderboardBucket
+from src.models.quiz_session import UserQuizAttempt
+from src.models.user import User
+from src.models.user_answer import UserAnswer
+from src.helpers.leaderboard_snapshot import LeaderboardSnapshots
+from src.services import leaderboard
+from src.services.leaderboard import LeaderboardService
+from src.services.score import ScoreService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def clear_window_cache():
+    leaderboard._window_cache.clear()
+    yield
+    leaderboard._window_cache.clear()
+
+
+async def make_user(total_score: int) -> User:
+    user = User(first_name="Тест", last_name=str(total_score), email=f"{PydanticObjectId()}@test.kz", password="x", total_score=total_score)
+    await user.insert()
+    return user
+
+
+async def test_all_window_matches_total_score_without_buckets(mongo):
+    # Баллы начислены до появления корзин: корзины "all" для них нет
+    legacy = [await make_user(score) for score in (50, 30, 30)]
+    fresh = await make_user(0)
+    await ScoreService().credit_user(fresh.id, 40, {QuizSubject.PHYSICS.value: 40})
+
+    response = await LeaderboardService().get_window_leaderboard("all")
+
+    assert [(u["id"], u["score"], u["rank"]) for u in response["users"]] == [
+        (str(legacy[0].id), 50, 1),
+        (str(fresh.id), 40, 2),
+        (str(legacy[1].id), 30, 3),
+        (str(legacy[2].id), 30, 3),
+    ]
+    week = await LeaderboardService().get_window_leaderboard("week")
+    assert [u["id"] for u in week["users"]] == [str(fresh.id)]
+
+
+async def test_rebuild_all_time_subject_buckets(mongo):
+    user = await make_user(0)
+    for completed in (True, False):
+        attempt = UserQuizAttempt(quiz_id=PydanticObjectId(), user_id=user.id, score=0, started_at=datetime.utcnow(), is_completed=completed)
+        await attempt.insert()
+        for subject, score in ((QuizSubject.PHYSICS.value, 1), (QuizSubject.PHYSICS.value, 1), (QuizSubject.CHEMISTRY.value, 1)):
+            await UserAnswer(attempt_id=attempt.id, question_id=PydanticObjectId(), selected_options=["A"], score=score, subject=subject).insert()
+    # Устаревшее значение перезаписывается, а не дополняется
+    await LeaderboardBucket(period=ALL_PERIOD, subject=QuizSubject.PHYSICS.value, user_id=user.id, score=1).insert()
+
+    assert await LeaderboardService().rebuild_all_time_buckets() == 2
+    assert await LeaderboardService().rebuild_all_time_buckets() == 2
+
+    physics = await LeaderboardService().get_window_leaderboard("all", QuizSubject.PHYSICS.value)
+    chemistry = await LeaderboardService().get_window_leaderboard("all", QuizSubject.CHEMISTRY.value)
+    assert [u["score"] for u in physics["users"]] == [2]
+    assert [u["score"] for u in chemistry["users"]] == [1]
+
+
+async def test_snapshot_stop_waits_for_the_rebuild(monkeypatch):
+    snapshots = LeaderboardSnapshots(refresh_interval=0, max_age=60, size=10)
+    rebuilding, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def rebuild():
+        rebuilding.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(snapshots, "rebuild", rebuild)
+    snapshots._task = asyncio.create_task(snapshots._refresh_loop())
+    await rebuilding.wait()
+    task = snapshots._task
+
+    await snapshots.stop()
+    assert cancelled.is_set() and task.done() and snapshots._task is None
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from src.helpers.llm import LLMClient
+
+pytestmark = pytest.mark.anyio
+
+
+def make_client(max_concurrency: int) -> LLMClient:
+    return LLMClient(
+        api_key="fake", base_url="http://127.0.0.1:1/v1", connect_timeout=1, read_timeout=1,
+        max_connections=10, max_retries=0, backoff_base=0, backoff_max=0, max_concurrency=max_concurrency,
+    )
+
+
+async def test_slot_caps_concurrent_requests():
+    client = make_client(3)
+    running, peak = 0, 0
+
+    async def request():
+        nonlocal running, peak
+        async with client._slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(request() for _ in range(20)))
+    assert peak == 3
@@ -0,0 +1,186 @@
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+from beanie import PydanticObjectId
+
+from src.helpers.generation_cache import generation_cache, generation_key
+from src.helpers.generation_fanout import is_valid_question
+from src.helpers.json_stream import QuizStreamParser
+from src.helpers.llm import LLMClient, llm_client
+from src.services.generated_quiz import QuizGeneratorService
+from src.services.quiz_pool import generated_quiz_pool
+
+QUIZ = {
+    "title": "Скобки { и } в \"строках\"",
+    "subject": "Физика",
+    "questions": [
+        {
+            "type": "single_choice",
+            "question_text": f"Вопрос {i}: чему равно {{x}} и [y]? \\ \"цитата\"",
+            "options": [
+                {"label": label, "option_text": f"Ответ {label} }}]", "is_correct": label == "A"} for label in "ABCD"
+            ],
+        }
+        for i in range(5)
+    ],
+}
+
+
+def random_chunks(text: str, rng: random.Random):
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        yield text[i:i + size]
+        i += size
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_parser_handles_random_splits(seed):
+    text = "```json\n" + json.dumps(QUIZ, ensure_ascii=False, indent=seed % 3 or None) + "\n```"
+    parser = QuizStreamParser()
+    questions = []
+    for chunk in random_chunks(text, random.Random(seed)):
+        questions += parser.feed(chunk)
+    assert questions == QUIZ["questions"]
+    assert parser.meta == {"title": QUIZ["title"], "subject": QUIZ["subject"]}
+
+
+def test_document_only_when_closed():
+    text = json.dumps(QUIZ, ensure_ascii=False)
+    parser = QuizStreamParser()
+    parser.feed("```json\n" + text[:-1])
+    assert parser.document() is None
+    parser.feed(text[-1] + "\n```")
+    assert parser.document() == QUIZ
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """stream_quiz без Mongo и LLM: модель отдает заданные куски, квиз не сохраняется в базу"""
+    chunks = []
+
+    async def stream_response(user_prompt):
+        for chunk in chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def claim(user_prompt, user_id):
+        return None
+
+    async def save(self, quiz_data, user_id, questions=None):
+        return type("Quiz", (), {"id": PydanticObjectId(), "questions": questions})()
+
+    monkeypatch.setattr(llm_client, "stream_response", stream_response)
+    monkeypatch.setattr(generated_quiz_pool, "claim", claim)
+    monkeypatch.setattr(QuizGeneratorService, "_save_generated_quiz", save)
+    monkeypatch.setattr(generation_cache, "max_size", 10)
+    monkeypatch.setattr(generation_cache, "_entries", type(generation_cache._entries)())
+    return chunks
+
+
+async def collect(prompt: str, stop_after: int = None) -> list:
+    stream = QuizGeneratorService().stream_quiz(prompt, PydanticObjectId())
+    events = []
+    async for event in stream:
+        events.append(event.split("\n", 1)[0])
+        if stop_after and len(events) == stop_after:
+            await stream.aclose()
+            break
+    return events
+
+
+@pytest.mark.anyio
+async def test_stream_caches_only_complete_quiz(streamed):
+    text = json.dumps(QUIZ, ensure_ascii=False)
+    streamed.extend(random_chunks(text, random.Random(0)))
+    assert (await collect("физика"))[-1] == "event: done"
+    assert generation_cache.get(generation_key("физика"))["questions"] == QUIZ["questions"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("case", ["truncated", "error", "disconnect"])
+async def test_stream_does_not_cache_partial_quiz(streamed, case):
+    text = json.dumps(QUIZ, ensure_ascii=False)
+    # Обрыв после третьего вопроса: вопросы уже ушли клиенту, но JSON не закрыт
+    cut = text.index('{"type"', text.index("Вопрос 3"))
+    streamed.extend(random_chunks(text[:cut] if case != "disconnect" else text, random.Random(0)))
+    if case == "error":
+        streamed.append(RuntimeError("connection reset"))
+
+    events = await collect("физика", stop_after=3 if case == "disconnect" else None)
+
+    assert events.count("event: question") >= 2
+    assert events[-1] == {"truncated": "event: done", "error": "event: error", "disconnect": "event: question"}[case]
+    assert generation_cache.get(generation_key("физика")) is None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def fake_llm_url():
+    port = free_port()
+    env = {**os.environ, "FAKE_LLM_TOKEN_DELAY": "0", "FAKE_LLM_FAIL_RATE": "0"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.commands.fake_llm", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    pytest.skip("fake LLM server did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def make_client(base_url: str, max_connections: int = 2) -> LLMClient:
+    return LLMClient(
+        api_key="fake", base_url=base_url, connect_timeout=5, read_timeout=3,
+        max_connections=max_connections, max_retries=0, backoff_base=0, backoff_max=0, max_concurrency=2,
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_against_fake_llm(fake_llm_url):
+    client = make_client(fake_llm_url)
+    parser = QuizStreamParser()
+    questions = []
+    async for chunk in client.stream_response("физика"):
+        questions += parser.feed(chunk)
+    await client.stop()
+
+    assert len(questions) == 20
+    assert all(is_valid_question(question) for question in questions)
+    assert parser.meta["title"]
+
+
+@pytest.mark.anyio
+async def test_stream_released_when_client_goes_away(fake_llm_url):
+    # Одно соединение в пуле: если поток его не вернул, следующий запрос упрется в таймаут пула
+    client = make_client(fake_llm_url, max_connections=1)
+    stream = client.stream_response("физика")
+    await stream.__anext__()
+    await stream.aclose()
+
+    assert client._in_flight == 0
+    # Соединение и место в пределе освобождены - следующий запрос проходит
+    assert "questions" in await client.generate_response("химия")
+    await client.stop()
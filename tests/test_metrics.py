@@ -0,0 +1,37 @@
+import httpx
+import pytest
+from beanie import PydanticObjectId
+
+from main import make_app
+from src.core.auth_middleware import Principal, get_current_user
+from src.helpers.user_cache import CachedUser, user_cache
+from src.models.user import UserRoleEnum
+
+pytestmark = pytest.mark.anyio
+
+URL = "/api/v1/metrics/"
+
+
+def as_user(monkeypatch, role):
+    async def get(requested_id):
+        return CachedUser(
+            id=requested_id, email="a@b.kz", first_name="А", last_name="Б",
+            role=role, total_score=0, profile_photo=None,
+        ) if role else None
+
+    monkeypatch.setattr(user_cache, "get", get)
+    return lambda: Principal(user_id=PydanticObjectId(), payload={})
+
+
+async def test_metrics_require_admin(monkeypatch):
+    app = make_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        anonymous = await client.get(URL)
+        app.dependency_overrides[get_current_user] = as_user(monkeypatch, UserRoleEnum.STUDENT.value)
+        student = await client.get(URL)
+        app.dependency_overrides[get_current_user] = as_user(monkeypatch, UserRoleEnum.ADMIN.value)
+        admin = await client.get(URL)
+
+    assert anonymous.status_code in (401, 403)
+    assert student.status_code == 403
+    assert admin.status_code == 200 and isinstance(admin.json(), dict)
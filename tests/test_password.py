@@ -0,0 +1,17 @@
+import pytest
+
+from src.helpers.password import PasswordHandler
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_pooled_verify_and_shutdown():
+    hashed = PasswordHandler.hash("secret")
+    assert await PasswordHandler.verify_async(hashed, "secret")
+    assert not await PasswordHandler.verify_async(hashed, "wrong")
+
+    PasswordHandler.shutdown()
+    assert PasswordHandler._executor is None
+    # После остановки пул создается заново по первому требованию
+    assert await PasswordHandler.verify_async(hashed, "secret")
+    PasswordHandler.shutdown()
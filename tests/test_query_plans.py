@@ -0,0 +1,77 @@
+"""explain() горячих запросов сервисов: каждый должен идти по индексу, а не COLLSCAN"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from src.helpers.generation_cache import generation_key
+from src.models.leaderboard import ALL_PERIOD, ALL_SUBJECTS
+from src.services.leaderboard import window_periods
+
+pytestmark = pytest.mark.anyio
+
+OID = ObjectId()
+NOW = datetime.utcnow()
+POOL_KEYS = [generation_key("Физика")]
+
+# (коллекция, фильтр, сортировка) - как их строят сервисы
+HOT_QUERIES = {
+    "answer_by_attempt_question": ("user_answers", {"attempt_id": OID, "question_id": OID}, None),
+    "answers_by_attempts": ("user_answers", {"attempt_id": {"$in": [OID]}}, None),
+    "questions_by_quiz": ("questions", {"quiz_id": OID}, None),
+    "questions_by_subject": ("questions", {"subject": "Физика"}, None),
+    "mistake_by_user_question": ("mistake_bank", {"user_id": OID, "question_id": OID}, None),
+    "mistake_session_in_progress": ("mistake_quiz_sessions", {"user_id": OID, "status": "in_progress"}, None),
+    "user_by_email": ("users", {"email": "user@example.com"}, None),
+    "leaderboard_page": ("users", {}, {"total_score": -1, "_id": 1}),
+    "leaderboard_rank_count": ("users", {"total_score": {"$gt": 10}}, None),
+    "attempt_history_page": (
+        "user_quiz_attempts",
+        {"user_id": OID, "$or": [{"started_at": {"$lt": NOW}}, {"started_at": NOW, "_id": {"$lt": OID}}]},
+        {"started_at": -1, "_id": -1},
+    ),
+    "expired_attempts": ("user_quiz_attempts", {"is_completed": False, "expires_at": {"$lte": NOW}}, {"expires_at": 1}),
+    "generated_quizzes_by_user": ("generated_quizzes", {"user_id": OID}, None),
+    "generated_attempts_by_user": ("user_generated_quiz_attempts", {"user_id": OID}, None),
+    "pool_claim": ("generated_quizzes", {"pool_key": {"$eq": POOL_KEYS[0], "$type": "string"}}, {"_id": 1}),
+    "pool_stock": ("generated_quizzes", {"pool_key": {"$in": POOL_KEYS, "$type": "string"}}, None),
+    "pool_refills": (
+        "generated_quizzes",
+        {"claimed_at": {"$gte": NOW, "$type": "date"}, "pooled_from": {"$in": POOL_KEYS}},
+        None,
+    ),
+    "generation_queue_depth": ("generation_jobs", {"status": "queued"}, {"created_at": 1}),
+    "generation_jobs_by_user": ("generation_jobs", {"user_id": OID, "status": {"$in": ["queued", "running"]}}, None),
+    "window_leaderboard": ("leaderboard_buckets", {"period": {"$in": window_periods("week", NOW)}, "subject": ALL_SUBJECTS}, None),
+    "bucket_upsert": ("leaderboard_buckets", {"period": ALL_PERIOD, "subject": "Физика", "user_id": OID}, None),
+}
+
+
+def plan_stages(explain: dict) -> set:
+    stages = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain["queryPlanner"]["winningPlan"])
+    return stages
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_query_uses_index(mongo, name):
+    collection, query, sort = HOT_QUERIES[name]
+    command = {"find": collection, "filter": query}
+    if sort:
+        command["sort"] = sort
+    explain = await mongo.command({"explain": command, "verbosity": "queryPlanner"})
+
+    stages = plan_stages(explain)
+    assert "COLLSCAN" not in stages, f"{name}: {stages}"
+    assert "IXSCAN" in stages, f"{name}: {stages}"
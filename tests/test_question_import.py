@@ -0,0 +1,185 @@
+import json
+
+import httpx
+import pytest
+from beanie import PydanticObjectId
+
+from main import make_app
+from src.core.auth_middleware import Principal, get_current_user
+from src.helpers.user_cache import CachedUser, user_cache
+from src.models.enums import QuizSubject
+from src.models.question import Question
+from src.models.quiz import Quiz
+from src.models.user import UserRoleEnum
+from src.services.question_import import QuestionImportService, iter_csv_records, iter_lines, validate_rows
+
+pytestmark = pytest.mark.anyio
+
+URL = "/api/v1/quiz/questions/import"
+
+
+def question_row(quiz_id=None, **overrides) -> str:
+    row = {
+        "type": "single_choice",
+        "subject": QuizSubject.PHYSICS.value,
+        "question_text": "Единица силы?",
+        "options": [
+            {"label": "A", "option_text": "Ньютон", "is_correct": True},
+            {"label": "B", "option_text": "Джоуль", "is_correct": False},
+        ],
+    }
+    if quiz_id:
+        row["quiz_id"] = str(quiz_id)
+    row.update(overrides)
+    return json.dumps(row, ensure_ascii=False)
+
+
+def as_user(monkeypatch, role):
+    user_id = PydanticObjectId()
+
+    async def get(requested_id):
+        return CachedUser(
+            id=requested_id, email="a@b.kz", first_name="А", last_name="Б",
+            role=role, total_score=0, profile_photo=None,
+        ) if role else None
+
+    monkeypatch.setattr(user_cache, "get", get)
+    return lambda: Principal(user_id=user_id, payload={})
+
+
+@pytest.fixture
+def import_calls(monkeypatch):
+    """Подменяет импорт: записывает прочитанные строки вместо записи в Mongo"""
+    calls = []
+
+    async def import_questions(self, lines, fmt="jsonl", default_quiz_id=None):
+        calls.append([line async for line in lines])
+        return {"inserted": len(calls[-1]), "failed": 0, "errors": []}
+
+    monkeypatch.setattr(QuestionImportService, "import_questions", import_questions)
+    return calls
+
+
+@pytest.mark.parametrize("role", [None, UserRoleEnum.STUDENT.value])
+async def test_import_requires_admin(monkeypatch, import_calls, role):
+    app = make_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        anonymous = await client.post(URL, content=question_row())
+        app.dependency_overrides[get_current_user] = as_user(monkeypatch, role)
+        forbidden = await client.post(URL, content=question_row())
+
+    assert anonymous.status_code in (401, 403)
+    assert forbidden.status_code == 403
+    assert import_calls == []
+
+
+async def test_admin_import_streams_body(monkeypatch, import_calls):
+    app = make_app()
+    app.dependency_overrides[get_current_user] = as_user(monkeypatch, UserRoleEnum.ADMIN.value)
+    body = "\n".join(question_row() for _ in range(3))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(URL, content=body)
+
+    assert response.status_code == 200 and response.json()["inserted"] == 3
+    assert len(import_calls) == 1 and len(import_calls[0]) == 3
+
+
+async def test_iter_lines_across_chunk_boundaries():
+    text = "первая строка\nвторая\n\nтретья"
+    data = ("﻿" + text).encode()
+
+    async def chunks():
+        for i in range(0, len(data), 3):
+            yield data[i:i + 3]
+
+    assert [line async for line in iter_lines(chunks())] == text.split("\n")
+
+
+def test_validate_rows_reports_errors_per_row():
+    quiz_id = PydanticObjectId()
+    rows = [
+        (1, question_row()),
+        (2, "{not json"),
+        (3, question_row(options=[{"label": "A", "option_text": "x", "is_correct": False}])),
+        (4, question_row(quiz_id="bad")),
+    ]
+    valid, errors = validate_rows("jsonl", None, rows, str(quiz_id))
+
+    assert [row for row, _ in valid] == [1]
+    assert valid[0][1]["quiz_id"] == quiz_id
+    assert [error["row"] for error in errors] == [2, 3, 4]
+
+
+def test_validate_csv_rows():
+    header = ["type", "subject", "question_text", "correct", "A", "B", "C"]
+    line = f'multiple_choice,{QuizSubject.CHEMISTRY.value},"Металлы, да?","A;C",Железо,Неон,Медь'
+    valid, errors = validate_rows("csv", header, [(1, line)], str(PydanticObjectId()))
+
+    assert errors == []
+    options = valid[0][1]["options"]
+    assert [(opt["label"], opt["is_correct"]) for opt in options] == [("A", True), ("B", False), ("C", True)]
+
+
+async def test_csv_quoted_fields_keep_newlines():
+    header = "type,subject,question_text,correct,A,B"
+    rows = [
+        f'single_choice,{QuizSubject.PHYSICS.value},"Формула:\r\n\r\nF = ""m·a"", верно?",A,"Да,\nверно",Нет',
+        f"single_choice,{QuizSubject.PHYSICS.value},Обычная строка,B,Да,Нет",
+    ]
+    data = ("\ufeff" + "\r\n".join([header, *rows]) + "\r\n\r\n").encode()
+
+    async def chunks():
+        for i in range(0, len(data), 5):
+            yield data[i:i + 5]
+
+    records = [record async for record in iter_csv_records(iter_lines(chunks()))]
+    assert records == [header, *(row.replace("\r\n", "\n") for row in rows)]
+
+    valid, errors = validate_rows("csv", header.split(","), list(enumerate(records[1:], 1)), str(PydanticObjectId()))
+    assert errors == []
+    first = valid[0][1]
+    assert first["question_text"] == 'Формула:\n\nF = "m·a", верно?'
+    assert [opt["option_text"] for opt in first["options"]] == ["Да,\nверно", "Нет"]
+    assert valid[1][1]["question_text"] == "Обычная строка"
+
+
+async def test_csv_import_counts_records_not_lines(monkeypatch):
+    written = []
+
+    async def write_batch(self, docs, known_quizzes, added, report):
+        written.extend(docs)
+        report["inserted"] += len(docs)
+
+    monkeypatch.setattr(QuestionImportService, "_write_batch", write_batch)
+
+    async def lines():
+        yield "type,subject,question_text,correct,A,B"
+        yield f'single_choice,{QuizSubject.PHYSICS.value},"Первая'
+        yield ""
+        yield 'строка",A,Да,Нет'
+        yield "single_choice,Нет такого предмета,?,A,Да,Нет"
+
+    report = await QuestionImportService().import_questions(lines(), "csv", PydanticObjectId())
+
+    assert report["rows"] == 2 and report["inserted"] == 1 and report["failed"] == 1
+    assert [error["row"] for error in report["errors"]] == [2]
+    assert written[0][1]["question_text"] == "Первая\n\nстрока"
+
+
+async def test_import_writes_valid_rows_and_reports_the_rest(mongo):
+    quiz = Quiz(variant="1", year="2024", title="ЕНТ")
+    await quiz.insert()
+
+    async def lines():
+        for i in range(250):
+            yield question_row(question_text=f"Вопрос {i}")
+        yield question_row(quiz_id=PydanticObjectId())
+        yield "{broken"
+
+    report = await QuestionImportService().import_questions(lines(), "jsonl", quiz.id)
+
+    assert report["rows"] == 252 and report["inserted"] == 250 and report["failed"] == 2
+    assert sorted(error["row"] for error in report["errors"]) == [251, 252]
+    assert await Question.find({"quiz_id": quiz.id}).count() == 250
+    quiz = await Quiz.get(quiz.id)
+    assert quiz.questions_count == 250 and quiz.question_counts[QuizSubject.PHYSICS.value] == 250
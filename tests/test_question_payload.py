@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from beanie import PydanticObjectId
+
+from main import make_app
+from src.core.auth_middleware import Principal, get_current_user
+from src.helpers.question_payload_cache import etag_matches, question_payload_cache
+from src.schemas.res.question import OptionResponse, QuestionResponse
+from src.services.quiz import QuizService
+
+pytestmark = pytest.mark.anyio
+
+
+def make_questions(quiz_id: PydanticObjectId, count: int = 120) -> list:
+    return [
+        QuestionResponse(
+            id=PydanticObjectId(),
+            quiz_id=quiz_id,
+            type="single_choice",
+            subject="Физика",
+            question_text=f"Вопрос {i}",
+            options=[OptionResponse(label=label, option_text=label) for label in "ABCD"],
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def quiz(monkeypatch):
+    """Квиз из 120 вопросов без Mongo: считает, сколько раз список собирался заново"""
+    quiz_id = PydanticObjectId()
+    state = {"questions": make_questions(quiz_id), "builds": 0}
+
+    async def get_quiz_questions(self, requested_id):
+        assert requested_id == quiz_id
+        state["builds"] += 1
+        await asyncio.sleep(0.01)
+        return state["questions"]
+
+    monkeypatch.setattr(QuizService, "get_quiz_questions", get_quiz_questions)
+    question_payload_cache.invalidate(quiz_id)
+    yield quiz_id, state
+    question_payload_cache.invalidate(quiz_id)
+
+
+@pytest.fixture
+async def client():
+    app = make_app()
+    app.dependency_overrides[get_current_user] = lambda: Principal(user_id=PydanticObjectId(), payload={})
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_concurrent_requests_build_payload_once(client, quiz):
+    quiz_id, state = quiz
+    responses = await asyncio.gather(*(client.get(f"/api/v1/quiz/{quiz_id}/questions") for _ in range(500)))
+
+    assert state["builds"] == 1
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.headers["etag"] for r in responses}) == 1
+    body = json.loads(responses[0].content)
+    assert len(body) == 120 and "is_correct" not in body[0]["options"][0]
+
+
+async def test_if_none_match_returns_304_until_invalidated(client, quiz):
+    quiz_id, state = quiz
+    url = f"/api/v1/quiz/{quiz_id}/questions"
+    etag = (await client.get(url)).headers["etag"]
+
+    cached = await client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+    assert (await client.get(url, headers={"If-None-Match": f'W/{etag}, "other"'})).status_code == 304
+
+    # add_question сбрасывает запись: новый вопрос - новый ETag
+    state["questions"] = state["questions"] + make_questions(quiz_id, 1)
+    question_payload_cache.invalidate(quiz_id)
+    changed = await client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert len(json.loads(changed.content)) == 121 and state["builds"] == 2
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches(None, '"a"')
+    assert not etag_matches('"a"', '"b"')
@@ -0,0 +1,43 @@
+import pytest
+from beanie import PydanticObjectId
+
+from src.helpers.generation_cache import generation_key
+from src.models.generated_quiz import GeneratedQuiz
+from src.services.quiz_pool import GeneratedQuizPool
+
+pytestmark = pytest.mark.anyio
+
+
+def make_pool(warmer_enabled: bool) -> GeneratedQuizPool:
+    # Окно "0-0" - часов низкой нагрузки нет, прогрев только пополняет выданные темы
+    return GeneratedQuizPool(
+        warmer_enabled=warmer_enabled, topics=["Физика", "Химия"], target_stock=2,
+        rate_per_hour=10, offpeak_hours="0-0", interval=60,
+    )
+
+
+async def stock(topic: str):
+    await GeneratedQuiz(title=topic, subject=topic, questions=[], pool_key=generation_key(topic)).insert()
+
+
+async def test_claim_without_local_warmer_signals_refill(mongo, monkeypatch):
+    await stock("Физика")
+    user_id = PydanticObjectId()
+
+    quiz = await make_pool(warmer_enabled=False).claim("  физика ", user_id)
+    assert quiz.user_id == user_id and quiz.pool_key is None
+    assert await make_pool(warmer_enabled=False).claim("физика", user_id) is None
+    assert await make_pool(warmer_enabled=False).claim("оптика", user_id) is None
+
+    # Прогрев в другом процессе видит выдачу через Mongo и пополняет только Физику
+    warmer = make_pool(warmer_enabled=True)
+    generated = []
+
+    async def generate(key):
+        generated.append(warmer.topics[key])
+        warmer._stock[key] = warmer._stock.get(key, 0) + 1
+        return True
+
+    monkeypatch.setattr(warmer, "_generate", generate)
+    assert await warmer.warm() == 2
+    assert generated == ["Физика", "Физика"]
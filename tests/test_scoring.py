@@ -0,0 +1,65 @@
+from itertools import combinations
+
+import pytest
+
+from src import scoring
+from src.models.enums import QuestionType
+
+LABELS = "ABCDEFGH"
+
+
+def reference_score(selected: set, correct: set, question_type: str) -> int:
+    """Правила из docstring src.scoring на множествах меток"""
+    if not correct or not selected:
+        return 0
+    if selected == correct:
+        return 2 if question_type == QuestionType.MULTIPLE_CHOICE else 1
+    if question_type == QuestionType.MULTIPLE_CHOICE and selected <= correct:
+        return 1
+    return 0
+
+
+def subsets(labels: str):
+    for size in range(len(labels) + 1):
+        yield from (set(combo) for combo in combinations(labels, size))
+
+
+def test_encode_decode_roundtrip():
+    assert scoring.encode(["c", " A "]) == 0b101
+    assert scoring.decode(0b101) == ["A", "C"]
+
+
+def test_unknown_label_is_wrong():
+    assert scoring.score(scoring.encode(["A", "?"]), scoring.encode(["A"]), QuestionType.SINGLE_CHOICE) == 0
+
+
+@pytest.mark.parametrize("question_type,labels", [
+    (QuestionType.SINGLE_CHOICE, LABELS[:4]),
+    (QuestionType.MULTIPLE_CHOICE, LABELS[:6]),
+])
+def test_score_matches_reference_for_all_answers(question_type, labels):
+    for correct in subsets(labels):
+        correct_mask = scoring.encode(correct)
+        for selected in subsets(labels):
+            expected = reference_score(selected, correct, question_type)
+            assert scoring.score(scoring.encode(selected), correct_mask, question_type) == expected
+
+
+def test_select_all_is_not_full_score():
+    correct = scoring.correct_mask([{"label": "A", "is_correct": True}, {"label": "B", "is_correct": False}])
+    assert scoring.score(scoring.encode(["A", "B"]), correct, QuestionType.MULTIPLE_CHOICE) == 0
+    assert not scoring.is_full_score(scoring.encode(["A", "B"]), correct)
+
+
+def test_score_batch_matches_score():
+    selected, correct, types = [], [], []
+    for question_type, labels in ((QuestionType.SINGLE_CHOICE, LABELS[:4]), ("multiple_choice", LABELS[:6]), ("unknown", LABELS[:3])):
+        for c in subsets(labels):
+            for s in subsets(labels):
+                selected.append(scoring.encode(s))
+                correct.append(scoring.encode(c))
+                types.append(question_type)
+
+    assert scoring.score_batch(selected, correct, types) == [
+        scoring.score(s, c, t) for s, c, t in zip(selected, correct, types)
+    ]